@@ -49,6 +49,7 @@ api.interceptors.response.use(
     return {
       success: true,
       data: response.data,
+      headers: response.headers,
       message: 'success'
     }
   },
@@ -275,10 +276,23 @@ export default {
     return api.get('/conversations/')
   },
 
-  // 获取对话消息
-  getMessages(conversationId) {
+  // 获取对话消息（按响应头X-Next-Cursor逐页加载，直到取完全部消息）
+  async getMessages(conversationId) {
     console.log('💬 [API] 调用获取消息接口，对话ID:', conversationId)
-    return api.get(`/conversations/${conversationId}/messages`)
+    const messages = []
+    let cursor = null
+    do {
+      const response = await api.get(`/conversations/${conversationId}/messages`, {
+        params: { limit: 200, ...(cursor ? { cursor } : {}) }
+      })
+      messages.push(...response.data)
+      cursor = response.headers?.['x-next-cursor'] || null
+    } while (cursor)
+    return {
+      success: true,
+      data: messages,
+      message: 'success'
+    }
   },
 
   // 删除对话
@@ -89,13 +89,17 @@ def add_text_to_chroma(text: str, metadata: Dict[str, Any] | None = None):
         logger.info(f"元数据: {metadata}")
         
         # 使用add_texts方法添加文本
-        vectorstore.add_texts(
+        ids = vectorstore.add_texts(
             texts=[text],
             metadatas=[metadata]
         )
         
-        # 持久化数据库
+        # 持久化数据库，同步更新BM25倒排索引并递增集合版本号（使服务端检索缓存失效）
         vectorstore.persist()
+        from app.core.bm25_index import add_to_bm25_index
+        from app.core.collection_version import bump_collection_version
+        add_to_bm25_index(persist_directory, ids, [text])
+        bump_collection_version(persist_directory)
         logger.info("文本已成功添加到Chroma数据库")
         
         # 验证添加结果
@@ -12,13 +12,15 @@ import logging
 from datetime import datetime
 
 # 导入数据库相关模块
-from app.configs.database import get_db
+from app.configs.database import get_db, get_async_db
 from app.models.user import User
 from app.configs.settings import get_settings
 from app.utils.datetime_utils import beijing_now_naive
+from app.services.conversation_service import AsyncConversationService
 
 # 创建API路由器实例
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # 匿名用户类
 class AnonymousUser:
@@ -173,6 +175,44 @@ def get_current_user_optional(credentials: Optional[HTTPAuthorizationCredentials
     user.is_anonymous = False
     return user
 
+def _decode_user_id(token: str) -> Optional[str]:
+    """解析JWT中的user_id，无效时返回None"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        logger.debug(f"[Auth] JWT解析失败: {e}")
+        return None
+    return payload.get("sub")
+
+async def get_current_user_async(credentials: HTTPAuthorizationCredentials = Depends(security), db=Depends(get_async_db)):
+    """获取当前用户（异步版本，用于async端点，不阻塞事件循环）"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    user_id = _decode_user_id(credentials.credentials) if credentials else None
+    if user_id is None:
+        raise credentials_exception
+    
+    user = await AsyncConversationService(db).get_user(user_id)
+    if user is None:
+        raise credentials_exception
+    return user
+
+async def get_current_user_optional_async(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)), db=Depends(get_async_db)):
+    """获取当前用户（可选认证，异步版本），未登录或token无效时返回匿名用户"""
+    user_id = _decode_user_id(credentials.credentials) if credentials else None
+    if user_id is None:
+        return AnonymousUser()
+    
+    user = await AsyncConversationService(db).get_user(user_id)
+    if user is None:
+        return AnonymousUser()
+    # 为真实用户添加is_anonymous属性
+    user.is_anonymous = False
+    return user
+
 # API端点
 @router.post("/register", response_model=AuthResponse)
 def register(request: RegisterRequest, db: Session = Depends(get_db)):
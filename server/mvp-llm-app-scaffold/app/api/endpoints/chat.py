@@ -4,21 +4,32 @@ import asyncio
 import json
 import requests
 import traceback
-from typing import Dict, Any, Optional
+import uuid
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
 
 # 导入核心模块
 from app.core.tools.psychological_controller import psychological_controller
+from app.core.factories import get_llm_pool_stats
+from app.core.semantic_cache import semantic_cache
+from app.core.rerankers import get_reranker_stats
+from app.core.retrieval_cache import retrieval_cache
+from app.core.vector_store import get_embedding_cache_stats, get_embedding_batcher_stats, get_bm25_index_stats
 from app.core.memory.memory_manager import get_session_history, get_session_history_database, get_conversation_buffer_memory, _buffer_memories
-from app.configs.database import get_db
-from app.services.conversation_service import ConversationService
-from app.services.streaming_service import StreamingService
-from app.api.endpoints.auth import get_current_user_optional, get_current_user
+from app.services.persistence_queue import ChatTurn, get_chat_turn_writer
+from app.services.analysis_service import analysis_service
+from app.services.streaming_service import (
+    StreamingService,
+    SSEFrameCoalescer,
+    FLUSH_EVENT,
+    DEFAULT_FLUSH_INTERVAL_MS,
+    DEFAULT_MAX_FRAME_BYTES
+)
+from app.api.endpoints.auth import get_current_user_optional_async, get_current_user_async
 from app.models.user import User
 from app.configs.settings import api_settings
 import logging
@@ -30,6 +41,9 @@ logger = logging.getLogger(__name__)
 # 创建API路由器
 router = APIRouter()
 
+# 单次批量分析请求的最大消息数
+MAX_ANALYZE_BATCH_SIZE = 5000
+
 # 请求模型
 class ChatRequest(BaseModel):
     """聊天请求模型"""
@@ -37,13 +51,25 @@ class ChatRequest(BaseModel):
     conversation_id: Optional[str] = Field(None, description="会话ID")
     model: str = Field("deepseek-chat", description="模型名称")
     stream: bool = Field(True, description="是否流式响应")
+    flush_interval_ms: int = Field(DEFAULT_FLUSH_INTERVAL_MS, ge=0, le=1000, description="流式内容合并的最长等待时间（毫秒），0表示逐条发送")
+    max_frame_bytes: int = Field(DEFAULT_MAX_FRAME_BYTES, ge=1, le=65536, description="单个内容帧的最大字节数")
+
+def build_crisis_scope(current_user: Optional[Any], conversation_id: str, message_id: str) -> Optional[Dict[str, str]]:
+    """登录用户的对话会落库，危机风险状态随对话行保存；匿名对话不做累积检测"""
+    if not current_user or getattr(current_user, 'is_anonymous', False) or not getattr(current_user, 'user_id', None):
+        return None
+    return {
+        "conversation_id": conversation_id,
+        "user_id": str(current_user.user_id),
+        "message_id": message_id
+    }
 
 # 非流式响应处理函数
 async def handle_non_stream_response(
     request: ChatRequest,
-    db: Session,
     current_user: Optional[Any],
-    conversation_id: str
+    conversation_id: str,
+    message_id: str
 ) -> Dict[str, Any]:
     """处理非流式响应"""
     try:
@@ -52,10 +78,11 @@ async def handle_non_stream_response(
         # 使用ConversationBufferMemory获取包含历史上下文的对话记忆
         user_id = getattr(current_user, 'user_id', None) if current_user and not getattr(current_user, 'is_anonymous', False) else None
         
-        # 获取ConversationBufferMemory（自动加载历史上下文）
-        buffer_memory = get_conversation_buffer_memory(
-            session_id=conversation_id, 
-            user_id=user_id, 
+        # 获取ConversationBufferMemory（自动加载历史上下文，首次加载会查询数据库，放到线程中执行）
+        buffer_memory = await asyncio.to_thread(
+            get_conversation_buffer_memory,
+            session_id=conversation_id,
+            user_id=user_id,
             load_historical_context=True
         )
         
@@ -99,7 +126,8 @@ async def handle_non_stream_response(
         result = await psychological_controller.process_message(
             user_input=request.message,
             chat_history=formatted_history,
-            timeout=30
+            timeout=30,
+            crisis_scope=build_crisis_scope(current_user, conversation_id, message_id)
         )
         
         # 获取响应内容
@@ -110,30 +138,6 @@ async def handle_non_stream_response(
         # 保存对话到数据库（如果用户已登录）
         if current_user and hasattr(current_user, 'user_id') and not getattr(current_user, 'is_anonymous', False):
             try:
-                conversation_service = ConversationService(db)
-                
-                # 确保对话记录存在
-                conversation = conversation_service.get_conversation(conversation_id)
-                if not conversation:
-                    conversation = conversation_service.create_conversation(
-                        conversation_id=conversation_id,
-                        user_id=str(current_user.user_id),
-                        title=request.message[:30] + ('...' if len(request.message) > 30 else '')
-                    )
-                
-                # 保存用户消息和AI回复
-                conversation_service.add_message(
-                    conversation_id=conversation_id,
-                    role="human",
-                    content=request.message
-                )
-                conversation_service.add_message(
-                    conversation_id=conversation_id,
-                    role="assistant",
-                    content=response_content,
-                    metadata=result.get("metadata", {})
-                )
-                
                 # 更新ConversationBufferMemory缓存
                 try:
                     cache_key = f"{conversation_id}_{current_user.user_id or 'anonymous'}"
@@ -145,18 +149,30 @@ async def handle_non_stream_response(
                 except Exception as e:
                     logger.error(f"[NonStream] 更新ConversationBufferMemory缓存失败: {e}")
                 
-                # 更新用户情绪画像
+                # 消息和情绪画像交给后台写入器落库，不阻塞响应
                 emotion = result.get("emotion")
-                if emotion and emotion != "unknown":
-                    conversation_service.update_user_emotion_profile(
-                        user_id=str(current_user.user_id),
-                        emotion=emotion,
-                        confidence=result.get("confidence", 0.5),
-                        emotion_context={
+                turn = ChatTurn(
+                    conversation_id=conversation_id,
+                    user_id=str(current_user.user_id),
+                    title=request.message[:30] + ('...' if len(request.message) > 30 else ''),
+                    messages=[
+                        {"message_id": message_id, "role": "human", "content": request.message},
+                        {
+                            "role": "assistant",
+                            "content": response_content,
+                            "metadata": {**result.get("metadata", {}), "crisis_assessment": result.get("crisis_assessment")}
+                        }
+                    ],
+                    emotion={
+                        "emotion": emotion,
+                        "confidence": result.get("confidence", 0.5),
+                        "emotion_context": {
                             "conversation_id": conversation_id,
                             "message_content": request.message[:100]
                         }
-                    )
+                    } if emotion and emotion != "unknown" else None
+                )
+                await asyncio.to_thread(get_chat_turn_writer().submit, turn)
                     
             except Exception as e:
                 logger.error(f"[API] 保存对话失败: {e}")
@@ -207,6 +223,10 @@ class SystemStatusResponse(BaseModel):
     vector_store_active: bool = Field(True, description="向量存储状态")
     system_status: str = Field("healthy", description="系统状态")
 
+class AnalyzeBatchRequest(BaseModel):
+    """批量分析请求模型"""
+    messages: List[str] = Field(..., min_length=1, max_length=MAX_ANALYZE_BATCH_SIZE, description="待分析的消息列表")
+
 class AnalysisResponse(BaseModel):
     """消息分析响应模型"""
     intent: str = Field(..., description="意图识别")
@@ -221,8 +241,7 @@ class AnalysisResponse(BaseModel):
 @router.post("/chat")
 async def psychological_chat(
     request: ChatRequest,
-    db: Session = Depends(get_db),
-    current_user: Optional[Any] = Depends(get_current_user_optional)
+    current_user: Optional[Any] = Depends(get_current_user_optional_async)
 ):
     """心理咨询聊天接口 - 基于LangChain Tools，支持流式和非流式响应"""
     
@@ -232,17 +251,20 @@ async def psychological_chat(
     # 生成会话ID
     user_id = getattr(current_user, 'user_id', 'anonymous')
     conversation_id = request.conversation_id or f"user_{user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    # 用户消息ID在处理前确定，危机检测和落库使用同一个ID
+    message_id = str(uuid.uuid4())
     
     # 如果不是流式响应，直接处理并返回JSON
     if not request.stream:
-        return await handle_non_stream_response(request, db, current_user, conversation_id)
+        return await handle_non_stream_response(request, current_user, conversation_id, message_id)
     
-    async def generate_stream():
+    async def generate_events():
+        """生成流式事件，由SSEFrameCoalescer合并content事件后写出"""
         try:
             logger.info(f"[API] 开始流式响应生成，会话ID: {conversation_id}")
             
             # 发送处理状态
-            yield f"data: {{\"type\": \"status\", \"message\": \"Processing your message...\"}}"
+            yield {"type": "status", "message": "Processing your message..."}
             
             # 使用基于LangChain Tools的心理咨询控制器
             logger.info(f"[API] 开始心理咨询控制器处理")
@@ -259,10 +281,11 @@ async def psychological_chat(
                 # 使用ConversationBufferMemory获取包含历史上下文的对话记忆
                 user_id = getattr(current_user, 'user_id', None) if current_user and not getattr(current_user, 'is_anonymous', False) else None
                 
-                # 获取ConversationBufferMemory（自动加载历史上下文）
-                buffer_memory = get_conversation_buffer_memory(
-                    session_id=conversation_id, 
-                    user_id=user_id, 
+                # 获取ConversationBufferMemory（自动加载历史上下文，首次加载会查询数据库，放到线程中执行）
+                buffer_memory = await asyncio.to_thread(
+                    get_conversation_buffer_memory,
+                    session_id=conversation_id,
+                    user_id=user_id,
                     load_historical_context=True
                 )
                 
@@ -292,16 +315,64 @@ async def psychological_chat(
                     "tools": ["意图分析", "安全检查", "文档检索", "文档重排序", "答案生成"],
                     "status": "processing"
                 }
-                yield f"data: {json.dumps(tools_status, ensure_ascii=False)}"
+                yield tools_status
                 
-                # 使用基于LangChain Tools的控制器处理消息
-                logger.info(f"[Tools] 使用Tools控制器处理消息: {request.message[:50]}...")
+                # 使用基于LangChain Tools的控制器流式处理消息
+                logger.info(f"[Tools] 使用Tools控制器流式处理消息: {request.message[:50]}...")
                 
-                result = await psychological_controller.process_message(
+                response_started = False
+                intent_data: Dict[str, Any] = {}
+                
+                async for event in psychological_controller.process_message_stream(
                     user_input=request.message,
                     chat_history=formatted_history,  # formatted_history已包含历史上下文
-                    timeout=30
-                )
+                    timeout=30,
+                    crisis_scope=build_crisis_scope(current_user, conversation_id, message_id)
+                ):
+                    event_type = event.get("type")
+                    
+                    if event_type == "progress":
+                        # 发送真实的处理进度作为思考过程
+                        intent_data.update(event.get("data") or {})
+                        thinking_data = {
+                            "type": "thinking",
+                            "content": event.get("message", ""),
+                            "conversation_id": conversation_id,
+                            "timestamp": datetime.now().isoformat()
+                        }
+                        yield thinking_data
+                        continue
+                    
+                    if event_type == "final_response":
+                        result = event
+                        content = None if response_started else event.get("response")
+                    elif event_type == "token":
+                        content = event.get("content")
+                    else:
+                        continue
+                    
+                    if not content:
+                        continue
+                    
+                    if not response_started:
+                        # 发送回复开始标记
+                        response_started = True
+                        start_response_data = {
+                            "type": "response_start",
+                            "message": "💬 AI心理助手回复：",
+                            "conversation_id": conversation_id,
+                            "metadata": {
+                                "intent": intent_data.get("intent", "unknown"),
+                                "confidence": intent_data.get("confidence", 0.5)
+                            },
+                            "timestamp": datetime.now().isoformat()
+                        }
+                        yield start_response_data
+                        content = "\n" + content
+                    
+                    # 转发LLM输出的增量内容，由合并器按帧写出
+                    yield {"type": "content", "content": content}
+                
                 logger.info(f"[Tools] Tools控制器执行完成")
                 
                 # 记录详细的执行结果
@@ -312,7 +383,6 @@ async def psychological_chat(
                 logger.info(f"  - 危机等级: {result.get('crisis_level', 'unknown')}")
                 logger.info(f"  - 安全触发: {result.get('safety_triggered', False)}")
                 logger.info(f"  - 检索文档数: {result.get('documents_count', 0)}")
-                logger.info(f"  - 重排序文档数: {result.get('documents_count', 0)}")
                 logger.info(f"  - 执行时间: {result.get('execution_time', 0):.2f}秒")
                 
                 # 获取响应内容和元数据
@@ -327,57 +397,16 @@ async def psychological_chat(
                 logger.info(f"[MultiAgent] 最终响应长度: {len(response_content)} 字符")
                 logger.info(f"[MultiAgent] 执行成功: {success}")
                 
-                # 发送思考过程
-                thinking_steps = [
-                    "🤔 正在分析您的问题...",
-                    "📚 检索相关的心理健康知识...",
-                    "🧠 整合信息并组织回复...",
-                    "💡 准备为您提供专业建议..."
-                ]
-                
-                for step in thinking_steps:
-                    thinking_data = {
-                        "type": "thinking",
-                        "content": step,
-                        "conversation_id": conversation_id,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    yield f"data: {json.dumps(thinking_data, ensure_ascii=False)}\n\n"
-                    await asyncio.sleep(0.5)  # 思考过程稍慢一些
-                
-                # 发送回复开始标记
-                start_response_data = {
-                    "type": "response_start",
-                    "message": "💬 AI心理助手回复：",
-                    "conversation_id": conversation_id,
-                    "metadata": {
-                        "intent": result.get("intent", "unknown"),
-                        "emotion": result.get("emotion", "neutral"),
-                        "confidence": result.get("confidence", 0.5),
-                        "documents_used": result.get("retrieved_docs_count", 0),
-                        "processing_time": f"{result.get('execution_time', 0):.2f}秒"
-                    },
-                    "timestamp": datetime.now().isoformat()
-                }
-                yield f"data: {json.dumps(start_response_data, ensure_ascii=False)}\n\n"
-                
-                # 流式返回响应内容（美化格式）
-                formatted_response = f"\n{response_content}\n\n---\n\n📊 **分析结果**\n" \
+                # 发送分析结果
+                analysis_summary = f"\n\n---\n\n📊 **分析结果**\n" \
                                    f"• 意图识别: {result.get('intent', 'unknown')}\n" \
                                    f"• 情绪状态: {result.get('emotion', 'neutral')}\n" \
                                    f"• 置信度: {result.get('confidence', 0.5):.1%}\n" \
                                    f"• 参考文档: {result.get('documents_count', 0)}篇\n" \
                                    f"• 处理时间: {result.get('execution_time', 0):.2f}秒"
-                
-                for char in formatted_response:
-                    char_data = {
-                        "type": "content",
-                        "content": char,
-                        "conversation_id": conversation_id,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    yield f"data: {json.dumps(char_data, ensure_ascii=False)}\n\n"
-                    await asyncio.sleep(0.01)
+                yield {"type": "content", "content": analysis_summary}
+                # 保存数据库前先把缓冲的内容发送给客户端
+                yield FLUSH_EVENT
                     
             except Exception as e:
                 logger.error(f"[MultiAgent] 心理咨询控制器调用错误: {e}")
@@ -411,6 +440,7 @@ async def psychological_chat(
                     "agent_details": {
                         "intent": locals().get('result', {}).get('intent'),
                         "crisis_level": locals().get('result', {}).get('crisis_level'),
+                        "crisis_assessment": locals().get('result', {}).get('crisis_assessment'),
                         "safety_triggered": locals().get('result', {}).get('safety_triggered', False),
                         "retrieved_docs_count": locals().get('result', {}).get('documents_count', 0),
                         "reranked_docs_count": locals().get('result', {}).get('documents_count', 0),
@@ -431,41 +461,6 @@ async def psychological_chat(
             
             if current_user and hasattr(current_user, 'user_id') and not getattr(current_user, 'is_anonymous', False):
                 try:
-                    conversation_service = ConversationService(db)
-                    logger.debug(f"[MultiAgent] ConversationService实例创建成功")
-                    
-                    # 确保对话记录存在
-                    conversation = conversation_service.get_conversation(conversation_id)
-                    if not conversation:
-                        logger.info(f"[MultiAgent] 创建新对话: {conversation_id}")
-                        conversation = conversation_service.create_conversation(
-                            conversation_id=conversation_id,
-                            user_id=str(current_user.user_id),
-                            title=request.message[:30] + ('...' if len(request.message) > 30 else '')
-                        )
-                        logger.info(f"[MultiAgent] 对话创建成功: {conversation.conversation_id}")
-                    else:
-                        logger.debug(f"[MultiAgent] 使用现有对话: {conversation_id}")
-                    
-                    # 保存用户消息
-                    logger.debug(f"[MultiAgent] 保存用户消息到对话: {conversation_id}")
-                    conversation_service.add_message(
-                        conversation_id=conversation_id,
-                        role="human",
-                        content=request.message
-                    )
-                    logger.debug(f"[MultiAgent] 用户消息保存成功")
-                    
-                    # 保存AI回复
-                    logger.debug(f"[MultiAgent] 保存AI回复到对话: {conversation_id}")
-                    conversation_service.add_message(
-                        conversation_id=conversation_id,
-                        role="assistant",
-                        content=result["output"],
-                        metadata=result.get("metadata", {})
-                    )
-                    logger.info(f"[MultiAgent] 对话消息保存完成")
-                    
                     # 更新ConversationBufferMemory缓存
                     try:
                         cache_key = f"{conversation_id}_{current_user.user_id or 'anonymous'}"
@@ -477,28 +472,27 @@ async def psychological_chat(
                     except Exception as e:
                         logger.error(f"[MultiAgent] 更新ConversationBufferMemory缓存失败: {e}")
                     
-                    # 更新用户情绪画像
-                    if emotion and emotion != "unknown":
-                        logger.debug(f"[MultiAgent] 开始更新用户情绪画像: emotion={emotion}, confidence={confidence}")
-                        emotion_context = {
-                            "conversation_id": conversation_id,
-                            "message_content": request.message[:100],  # 只保存前100个字符
-                            "agent_details": result.get("metadata", {}).get("agent_details", {})
-                        }
-                        
-                        emotion_updated = conversation_service.update_user_emotion_profile(
-                            user_id=str(current_user.user_id),
-                            emotion=emotion,
-                            confidence=confidence,
-                            emotion_context=emotion_context
-                        )
-                        
-                        if emotion_updated:
-                            logger.info(f"[MultiAgent] 用户情绪画像更新成功: user_id={current_user.user_id}, emotion={emotion}")
-                        else:
-                            logger.warning(f"[MultiAgent] 用户情绪画像更新失败: user_id={current_user.user_id}")
-                    else:
-                        logger.debug(f"[MultiAgent] 跳过情绪画像更新，情绪状态为: {emotion}")
+                    # 消息和情绪画像交给后台写入器落库，[DONE]不再等待数据库
+                    turn = ChatTurn(
+                        conversation_id=conversation_id,
+                        user_id=str(current_user.user_id),
+                        title=request.message[:30] + ('...' if len(request.message) > 30 else ''),
+                        messages=[
+                            {"message_id": message_id, "role": "human", "content": request.message},
+                            {"role": "assistant", "content": result["output"], "metadata": result.get("metadata", {})}
+                        ],
+                        emotion={
+                            "emotion": emotion,
+                            "confidence": confidence,
+                            "emotion_context": {
+                                "conversation_id": conversation_id,
+                                "message_content": request.message[:100],  # 只保存前100个字符
+                                "agent_details": result.get("metadata", {}).get("agent_details", {})
+                            }
+                        } if emotion and emotion != "unknown" else None
+                    )
+                    submit_status = await asyncio.to_thread(get_chat_turn_writer().submit, turn)
+                    logger.info(f"[MultiAgent] 对话已提交落库: {submit_status}")
                     
                 except Exception as e:
                     logger.error(f"[MultiAgent] 保存对话失败: {e}")
@@ -508,14 +502,23 @@ async def psychological_chat(
             else:
                 logger.warning(f"[MultiAgent] 用户未登录或为匿名用户，跳过对话保存")
             
-            # 最终响应已在上面的逐字输出中发送，这里不需要再发送
-            yield "data: [DONE]\n\n"
-            
         except Exception as e:
             logger.error(f"[API] 流式响应生成异常: {e}")
             # 直接抛出异常，不返回错误响应
             raise
     
+    async def generate_stream():
+        coalescer = SSEFrameCoalescer(
+            conversation_id=conversation_id,
+            flush_interval_ms=request.flush_interval_ms,
+            max_frame_bytes=request.max_frame_bytes
+        )
+        async for frame in coalescer.coalesce(generate_events()):
+            yield frame
+        
+        # 最终响应已在上面的内容帧中发送，这里只发送结束标记
+        yield "data: [DONE]\n\n"
+    
     return StreamingResponse(
         generate_stream(),
         media_type="text/event-stream",
@@ -526,6 +529,46 @@ async def psychological_chat(
         }
     )
 
+@router.get("/llm/pool-stats")
+async def get_llm_pool_statistics():
+    """获取共享LLM客户端和HTTP连接池的统计信息"""
+    return get_llm_pool_stats()
+
+@router.get("/semantic-cache/stats")
+async def get_semantic_cache_statistics():
+    """获取语义回复缓存的命中统计"""
+    return semantic_cache.get_stats()
+
+@router.get("/embedding-cache/stats")
+async def get_embedding_cache_statistics():
+    """获取查询向量缓存的命中统计"""
+    return get_embedding_cache_stats()
+
+@router.get("/embedding-batcher/stats")
+async def get_embedding_batcher_statistics():
+    """获取查询向量微批处理的统计信息"""
+    return get_embedding_batcher_stats()
+
+@router.get("/bm25-index/stats")
+async def get_bm25_index_statistics():
+    """获取混合检索BM25索引的统计信息"""
+    return get_bm25_index_stats()
+
+@router.get("/retrieval-cache/stats")
+async def get_retrieval_cache_statistics():
+    """获取检索结果缓存的命中率和条目大小统计"""
+    return retrieval_cache.get_stats()
+
+@router.get("/persistence/stats")
+async def get_persistence_statistics():
+    """获取对话落库队列的深度、延迟和日志统计"""
+    return get_chat_turn_writer().get_stats()
+
+@router.get("/reranker/stats")
+async def get_reranker_statistics():
+    """获取当前重排序后端的缓存和超时统计"""
+    return get_reranker_stats()
+
 @router.get("/status", response_model=SystemStatusResponse)
 async def get_system_status():
     """获取系统状态"""
@@ -552,46 +595,21 @@ async def get_system_status():
 
 @router.post("/analyze")
 async def analyze_message(
-    request: ChatRequest,
-    current_user: User = Depends(get_current_user)
+    request: AnalyzeBatchRequest,
+    current_user: User = Depends(get_current_user_async)
 ):
-    """分析消息（仅分析，不生成回复）"""
-    try:
-        # 使用基于LangChain Tools的心理咨询控制器进行分析
-        # 具体实现请参考 app/core/tools/psychological_controller.py
-        
-        # 这里可以添加仅分析的逻辑
-        # 例如只运行意图分析和安全检测
-        
-        # 临时返回模拟数据，实际应使用 psychological_controller
-        route_result = {
-            "intent": "general_consultation",
-            "confidence": 0.8,
-            "explanation": "用户寻求一般心理咨询"
-        }
-        
-        crisis_assessment = {
-            "risk_level": "low",
-            "confidence": 0.9,
-            "explanation": "未检测到明显风险"
-        }
-        
-        return {
-            "intent": route_result["intent"],
-            "confidence": route_result["confidence"],
-            "explanation": route_result["explanation"],
-            "crisis_level": crisis_assessment["risk_level"],
-            "crisis_confidence": crisis_assessment["confidence"],
-            "crisis_explanation": crisis_assessment["explanation"],
-            "requires_intervention": crisis_assessment["risk_level"] in ["high", "medium"],
-            "timestamp": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"消息分析失败: {str(e)}"
-        )
+    """批量分析消息（仅分析，不生成回复）
+    
+    对每条消息执行意图、安全、危机和情绪分析，结果以NDJSON逐行返回，
+    每行包含输入中的序号index。
+    """
+    logger.info(f"[API] 收到批量分析请求: {len(request.messages)} 条消息")
+    
+    return StreamingResponse(
+        analysis_service.stream_ndjson(request.messages),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
 
 @router.get("/agents/info")
 async def get_agents_info():
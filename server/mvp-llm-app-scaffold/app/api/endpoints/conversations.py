@@ -6,7 +6,7 @@ from datetime import datetime
 from pathlib import Path
 
 # 导入FastAPI相关模块
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
@@ -15,7 +15,8 @@ from app.core.memory.memory_manager import get_session_history
 from app.configs.settings import get_settings
 # 导入数据库相关模块
 from app.configs.database import get_db
-from app.services.conversation_service import ConversationService
+from app.services.conversation_service import ConversationService, conversation_cursor, message_cursor, messages_after
+from app.utils.pagination import paginate
 # 导入认证相关模块
 from app.api.endpoints.auth import get_current_user
 from app.models.user import User
@@ -27,6 +28,9 @@ router = APIRouter()
 # 获取设置
 settings = get_settings()
 
+# 下一页游标的响应头（响应体保持列表格式，兼容现有客户端）
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 # 会话历史文件目录
 history_dir = Path("./data/chat_history")
 history_dir.mkdir(parents=True, exist_ok=True)
@@ -100,15 +104,26 @@ def get_conversation_metadata(conversation_id: str) -> Optional[dict]:
         return None
 
 @router.get("/", response_model=List[ConversationInfo])
-def get_conversations(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """获取当前用户的会话列表"""
+def get_conversations(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页响应头X-Next-Cursor中的游标"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取当前用户的会话列表（按最后消息时间倒序，游标分页）"""
     try:
-        # 从数据库获取当前用户的对话
+        # 从数据库获取当前用户的对话，多取一条判断是否还有下一页
         service = ConversationService(db)
-        conversations = service.get_user_conversations(str(current_user.user_id))
-
+        try:
+            conversations = service.get_user_conversations(str(current_user.user_id), limit=limit + 1, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        conversations, next_cursor = paginate(conversations, limit, conversation_cursor)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         
-        if conversations:
+        if conversations or cursor:
             return [
                 ConversationInfo(
                     id=conv.id,  # 添加主键ID
@@ -116,7 +131,7 @@ def get_conversations(db: Session = Depends(get_db), current_user: User = Depend
                     title=str(conv.title),
                     created_at=conv.created_at.isoformat(),
                     updated_at=conv.updated_at.isoformat(),
-                    message_count=len(conv.messages)
+                    message_count=conv.message_count or 0  # 使用维护的计数列，不加载消息集合
                 )
                 for conv in conversations
             ]
@@ -134,6 +149,8 @@ def get_conversations(db: Session = Depends(get_db), current_user: User = Depend
             # 按更新时间倒序排列
             conversations.sort(key=lambda x: x.updated_at, reverse=True)
             return conversations
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取会话列表失败: {str(e)}")
 
@@ -210,11 +227,16 @@ def update_conversation_title(conversation_id: str, request: UpdateTitleRequest,
         raise HTTPException(status_code=500, detail=f"更新标题失败: {str(e)}")
 
 @router.get("/{conversation_id}/messages", response_model=List[MessageInfo])
-def get_conversation_messages(conversation_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """根据会话conversation_id获取消息列表"""
+def get_conversation_messages(
+    conversation_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200, description="每页条数"),
+    cursor: Optional[str] = Query(None, description="上一页响应头X-Next-Cursor中的游标"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """根据会话conversation_id获取消息列表（按时间正序，游标分页）"""
     try:
-        service = ConversationService(db)
-        
         # 根据conversation_id UUID获取对话
         conversation = db.query(Conversation).filter(Conversation.conversation_id == conversation_id).first()
         if not conversation:
@@ -224,8 +246,18 @@ def get_conversation_messages(conversation_id: str, db: Session = Depends(get_db
         if str(conversation.user_id) != str(current_user.user_id):
             raise HTTPException(status_code=403, detail="无权限访问此对话")
         
-        # 获取消息列表
-        messages = db.query(Message).filter(Message.conversation_id == conversation_id).order_by(Message.created_at).all()
+        # 获取消息列表：按 (created_at, id) 定位游标之后的消息，不使用OFFSET
+        try:
+            after_cursor = messages_after(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        rows = db.query(Message).filter(
+            Message.conversation_id == conversation_id,
+            *after_cursor
+        ).order_by(Message.created_at, Message.id).limit(limit + 1).all()
+        messages, next_cursor = paginate(rows, limit, message_cursor)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         
         return [
             MessageInfo(
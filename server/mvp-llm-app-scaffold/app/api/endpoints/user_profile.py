@@ -1,11 +1,11 @@
 # 用户画像API端点
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any, Optional
-from app.configs.database import get_db
+from app.configs.database import get_async_db
 from app.models.user import User
-from app.services.conversation_service import ConversationService
-from app.api.endpoints.auth import get_current_user
+from app.services.conversation_service import AsyncConversationService
+from app.api.endpoints.auth import get_current_user_async
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,15 +13,15 @@ router = APIRouter()
 
 @router.get("/emotion-profile")
 async def get_user_emotion_profile(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """获取当前用户的情绪画像"""
     try:
         logger.info(f"[UserProfile] 获取用户情绪画像: user_id={current_user.user_id}")
         
-        conversation_service = ConversationService(db)
-        emotion_profile = conversation_service.get_user_emotion_profile(str(current_user.user_id))
+        conversation_service = AsyncConversationService(db)
+        emotion_profile = await conversation_service.get_user_emotion_profile(str(current_user.user_id))
         
         if not emotion_profile:
             return {
@@ -45,15 +45,15 @@ async def get_user_emotion_profile(
 
 @router.get("/emotion-stats")
 async def get_user_emotion_stats(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """获取用户情绪统计信息"""
     try:
         logger.info(f"[UserProfile] 获取用户情绪统计: user_id={current_user.user_id}")
         
-        conversation_service = ConversationService(db)
-        emotion_profile = conversation_service.get_user_emotion_profile(str(current_user.user_id))
+        conversation_service = AsyncConversationService(db)
+        emotion_profile = await conversation_service.get_user_emotion_profile(str(current_user.user_id))
         
         if not emotion_profile or not emotion_profile.get('emotion_history'):
             return {
@@ -96,24 +96,18 @@ async def get_user_emotion_stats(
 
 @router.delete("/emotion-profile")
 async def clear_user_emotion_profile(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """清空用户情绪画像数据"""
     try:
         logger.info(f"[UserProfile] 清空用户情绪画像: user_id={current_user.user_id}")
         
         # 直接更新用户的情绪相关字段
-        user = db.query(User).filter(User.user_id == str(current_user.user_id)).first()
-        if not user:
+        cleared = await AsyncConversationService(db).clear_user_emotion_profile(str(current_user.user_id))
+        if not cleared:
             raise HTTPException(status_code=404, detail="用户不存在")
         
-        user.current_emotion = None
-        user.emotion_history = None
-        user.emotion_updated_at = None
-        
-        db.commit()
-        
         logger.info(f"[UserProfile] 用户情绪画像清空成功: user_id={current_user.user_id}")
         return {
             "message": "用户情绪画像已清空",
@@ -122,7 +116,7 @@ async def clear_user_emotion_profile(
         
     except Exception as e:
         logger.error(f"[UserProfile] 清空用户情绪画像失败: user_id={current_user.user_id}, error={e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"清空用户情绪画像失败: {str(e)}"
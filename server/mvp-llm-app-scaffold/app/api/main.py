@@ -1,5 +1,12 @@
+# 导入异步上下文管理器，用于定义应用生命周期
+from contextlib import asynccontextmanager
+
+# 导入asyncio，用于在后台线程执行预热
+import asyncio
+
 # 导入FastAPI框架
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 # 导入聊天相关的端点模块
@@ -10,12 +17,57 @@ from app.api.endpoints import user_profile  # 导入用户画像模块
 
 # 导入设置配置
 from app.configs.settings import get_settings
+# 导入共享LLM客户端的预热和关闭函数
+from app.core.factories import warmup_llm_clients, close_llm_clients
+# 导入向量数据库预热函数
+from app.core.vector_store import warmup_vector_store, stop_vector_store_warmup, get_vector_store_warmup_status
+# 导入重排序模型预热函数
+from app.core.rerankers import warmup_reranker
+# 导入异步数据库引擎的关闭函数
+from app.configs.database import close_async_engine
+# 导入对话轮次异步写入器
+from app.services.persistence_queue import init_chat_turn_writer, shutdown_chat_turn_writer
+# 导入批量分析进程池的创建和关闭函数
+from app.services.analysis_service import start_process_pool, shutdown_process_pool
+# 导入模型配置
+from app.configs.settings import config as app_config
+
+
+# 应用生命周期：启动时预热共享LLM连接和向量数据库，关闭时释放连接池
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 批量分析进程池（forkserver启动子进程，工作进程在首次提交时创建）
+    start_process_pool()
+    warmup_tasks = []
+    if app_config.vector_store.warmup_on_startup:
+        # 预热在后台线程执行，失败时按退避重试，完成前 /ready 返回503
+        warmup_tasks.append(asyncio.create_task(asyncio.to_thread(warmup_vector_store)))
+    if app_config.reranker.warmup_on_startup:
+        # 重排序模型加载期间请求会超出时间预算并保持检索顺序，不影响就绪状态
+        warmup_tasks.append(asyncio.create_task(asyncio.to_thread(warmup_reranker)))
+    # 打开本进程的落库日志，启动落库线程，并在后台重放上次未落库的对话轮次
+    chat_turn_writer = init_chat_turn_writer()
+    warmup_tasks.append(asyncio.create_task(asyncio.to_thread(chat_turn_writer.start)))
+    await warmup_llm_clients()
+    yield
+    # 打断预热重试的等待，避免关闭时等待后台线程
+    stop_vector_store_warmup()
+    for warmup_task in warmup_tasks:
+        if not warmup_task.done():
+            warmup_task.cancel()
+    # 等待队列中的对话写完，未写完的保留在日志中，下次启动时重放
+    await asyncio.to_thread(shutdown_chat_turn_writer, app_config.persistence_queue.drain_timeout_seconds)
+    await close_async_engine()
+    await close_llm_clients()
+    await asyncio.to_thread(shutdown_process_pool)
+
 
 # 创建FastAPI应用实例，配置应用信息
 app = FastAPI(
     title="LLM Application Scaffold - Separated Endpoints",
     description="An API with distinct, stateful endpoints for Knowledge Base (RAG) chat and Agent (Tool-calling) chat.",
     version="2.2.0",
+    lifespan=lifespan,
 )
 
 # 获取设置实例
@@ -61,3 +113,15 @@ app.include_router(user_profile.router, prefix="/api/user", tags=["User Profile"
 def read_root():
     # 返回应用状态和欢迎信息
     return {"status": "ok", "message": "Welcome to the LLM Scaffold API!"}
+
+
+# 定义就绪检查端点，向量数据库预热完成后才返回就绪
+@app.get("/ready", tags=["Health Check"])
+def read_ready():
+    status = get_vector_store_warmup_status()
+    # 未开启启动预热时，直接视为就绪
+    ready = status["ready"] or not app_config.vector_store.warmup_on_startup
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "warming_up", "vector_store": status}
+    )
@@ -25,11 +25,19 @@ class DatabaseSettings(BaseModel):
     pool_timeout: int = Field(default=30, description="连接超时时间")
     pool_recycle: int = Field(default=3600, description="连接回收时间")
     
+    # 异步驱动配置
+    async_driver: str = Field(default="aiomysql", description="异步MySQL驱动（aiomysql或asyncmy）")
+    
     @property
     def database_url(self) -> str:
         """构建数据库连接URL"""
         return f"mysql+pymysql://{self.mysql_user}:{self.mysql_password}@{self.mysql_host}:{self.mysql_port}/{self.mysql_database}?charset=utf8mb4"
     
+    @property
+    def async_database_url(self) -> str:
+        """构建异步驱动的数据库连接URL"""
+        return f"mysql+{self.async_driver}://{self.mysql_user}:{self.mysql_password}@{self.mysql_host}:{self.mysql_port}/{self.mysql_database}?charset=utf8mb4"
+    
     @property
     def database_url_without_db(self) -> str:
         """构建不包含数据库名的连接URL（用于创建数据库）"""
@@ -70,6 +78,42 @@ def get_db() -> Session:
     finally:
         db.close()
 
+# 异步引擎在首次使用时创建，未安装异步驱动时不影响同步接口
+_async_engine = None
+_async_session_factory = None
+
+def get_async_session_factory():
+    """获取异步会话工厂（首次调用时创建异步引擎）"""
+    global _async_engine, _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+        
+        _async_engine = create_async_engine(
+            db_settings.async_database_url,
+            pool_size=db_settings.pool_size,
+            max_overflow=db_settings.max_overflow,
+            pool_timeout=db_settings.pool_timeout,
+            pool_recycle=db_settings.pool_recycle,
+            echo=False,
+            pool_pre_ping=True
+        )
+        # expire_on_commit=False: 提交后仍可直接读取对象属性，不会在异步上下文中触发隐式查询
+        _async_session_factory = sessionmaker(
+            bind=_async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return _async_session_factory
+
+# 异步数据库依赖注入函数
+async def get_async_db():
+    """获取异步数据库会话"""
+    async with get_async_session_factory()() as db:
+        yield db
+
+async def close_async_engine():
+    """释放异步引擎的连接池"""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
 # 数据库初始化函数
 def init_database():
     """初始化数据库表"""
@@ -1,5 +1,5 @@
 # 导入类型提示模块
-from typing import Optional
+from typing import Dict, List, Optional
 
 # 导入YAML配置文件处理模块
 import yaml
@@ -22,14 +22,40 @@ class ModelConfig(BaseModel):
     name: str
     # 生成温度参数，控制输出的随机性
     temperature: float
+    # 最大输出令牌数
+    max_tokens: int = 512
+    # 共享HTTP连接池的最大连接数
+    max_connections: int = 50
+    # 连接池中保持长连接的最大数量
+    max_keepalive_connections: int = 20
+    # 空闲长连接的保持时间（秒）
+    keepalive_expiry: float = 60.0
 
 
 # 定义嵌入模型配置数据模型
 class EmbeddingConfig(BaseModel):
-    # 嵌入模型提供商
+    # 嵌入模型提供商（openai、local或onnx）
     provider: str
     # 嵌入模型名称
     name: str
+    # ONNX模型文件路径，为空时使用模型目录下的 onnx/model.onnx 或 onnx/model.int8.onnx
+    onnx_path: Optional[str] = None
+    # 是否使用int8动态量化的ONNX模型
+    onnx_quantized: bool = True
+    # ONNX Runtime的intra-op线程数，为空时使用CPU核数
+    onnx_threads: Optional[int] = None
+    # 查询向量缓存的内存预算（字节），0表示不缓存
+    query_cache_max_bytes: int = 32 * 1024 * 1024
+    # 查询向量缓存的磁盘溢出文件（SQLite），为空时不写磁盘
+    query_cache_disk_path: Optional[str] = None
+    # 是否对并发的查询向量请求做微批处理
+    batching_enabled: bool = True
+    # 单批最大文本数
+    batch_max_size: int = 16
+    # 收集一批请求的最长等待时间（毫秒）
+    batch_max_wait_ms: float = 5.0
+    # 等待队列的最大长度，队列满时调用方直接编码
+    batch_max_queue_size: int = 256
 
 
 # 定义向量数据库配置数据模型
@@ -38,6 +64,22 @@ class VectorStoreConfig(BaseModel):
     persist_directory: str
     # 向量数据库集合名称
     collection_name: str
+    # HNSW索引参数：每个节点的邻居数（仅在创建集合时生效）
+    hnsw_m: int = 16
+    # HNSW索引参数：建索引时的候选队列大小（仅在创建集合时生效）
+    hnsw_construction_ef: int = 100
+    # HNSW索引参数：查询时的候选队列大小，越大召回越高、越慢
+    hnsw_search_ef: int = 64
+    # 启动时是否预热向量数据库
+    warmup_on_startup: bool = True
+    # 预热时执行的探测查询，用于把HNSW索引加载进内存
+    warmup_queries: List[str] = ["焦虑怎么办", "最近压力很大", "睡不着觉"]
+    # 预热失败后的首次重试间隔（秒），之后每次翻倍
+    warmup_retry_backoff_seconds: float = 2.0
+    # 预热重试间隔上限（秒）
+    warmup_retry_max_backoff_seconds: float = 60.0
+    # 预热最多尝试次数，0表示一直重试直到成功
+    warmup_max_attempts: int = 0
 
 
 # 定义文本分割器配置数据模型
@@ -48,6 +90,134 @@ class TextSplitterConfig(BaseModel):
     chunk_overlap: int
 
 
+# 定义语义回复缓存配置数据模型
+class SemanticCacheConfig(BaseModel):
+    # 是否启用语义缓存
+    enabled: bool = False
+    # 命中所需的最低余弦相似度
+    similarity_threshold: float = 0.92
+    # 缓存有效期（秒）
+    ttl_seconds: float = 3600
+    # 最大缓存条数，超出后按LRU淘汰
+    max_entries: int = 512
+    # 不使用缓存的意图（crisis始终排除）
+    excluded_intents: List[str] = ["crisis"]
+
+
+# 定义混合检索中各检索器的融合权重
+class HybridWeights(BaseModel):
+    # 向量检索权重
+    dense: float = 1.0
+    # BM25检索权重
+    bm25: float = 1.0
+
+
+# 定义混合检索（BM25 + 向量）配置数据模型
+class HybridSearchConfig(BaseModel):
+    # 是否启用混合检索，关闭时只使用向量检索
+    enabled: bool = True
+    # BM25词频饱和参数
+    bm25_k1: float = 1.5
+    # BM25文档长度归一化参数
+    bm25_b: float = 0.75
+    # RRF平滑常数，越大名次差异的影响越小
+    rrf_k: int = 60
+    # 每路检索取 k * candidate_multiplier 个候选参与融合
+    candidate_multiplier: int = 2
+    # 按意图配置的融合权重，未配置的意图使用default
+    intent_weights: Dict[str, HybridWeights] = {
+        "default": HybridWeights(),
+        "crisis": HybridWeights(dense=1.0, bm25=1.5),
+        "knowledge": HybridWeights(dense=1.0, bm25=1.2),
+    }
+
+
+# 定义检索元数据过滤配置数据模型
+class RetrievalFilterConfig(BaseModel):
+    # 是否按意图和情绪映射的知识分类过滤检索
+    enabled: bool = True
+    # 文档元数据中的分类字段
+    category_field: str = "category"
+    # 文档元数据中的情绪字段
+    emotion_field: str = "emotion"
+    # 过滤结果少于 k * min_results_ratio 时补充不过滤的检索结果
+    min_results_ratio: float = 0.5
+    # 知识检索时按质心相似度额外选取的分类数
+    centroid_top_n: int = 2
+    # 分类质心与查询的最低余弦相似度
+    centroid_min_similarity: float = 0.3
+    # 情绪映射的分类按相关程度依次获得的相似度加分
+    category_boosts: List[float] = [0.1, 0.06, 0.03]
+
+
+# 定义检索结果缓存配置数据模型
+class RetrievalCacheConfig(BaseModel):
+    # 是否缓存检索结果
+    enabled: bool = True
+    # 最大缓存条数，超出后按LRU淘汰
+    max_entries: int = 2048
+
+
+# 定义对话轮次异步落库配置数据模型
+class PersistenceQueueConfig(BaseModel):
+    # 是否由后台线程异步落库，关闭时在请求线程同步写入
+    enabled: bool = True
+    # 队列容量，已满时调用方等待后同步写入（反压）
+    max_queue_size: int = 1000
+    # 单批写入的最大轮次数
+    max_batch_size: int = 50
+    # 收集一批的最长等待时间（毫秒）
+    max_wait_ms: float = 50
+    # 队列已满时调用方的最长等待时间（毫秒）
+    enqueue_timeout_ms: float = 200
+    # 是否写本地日志，进程崩溃后重启时重放未落库的轮次
+    journal_enabled: bool = True
+    # 日志文件路径（相对于项目根目录）
+    journal_path: str = "data/chat_turn_journal.jsonl"
+    # 每次写日志后是否fsync
+    journal_fsync: bool = True
+    # 没有未确认轮次且日志超过该大小（字节）时清空
+    journal_compact_bytes: int = 1048576
+    # 批量写入失败后的重试次数
+    max_retries: int = 3
+    # 首次重试的等待时间（毫秒），之后指数退避
+    retry_backoff_ms: float = 500
+    # 单独写入仍失败的轮次的重试间隔（秒），成功前保留在日志中
+    failed_retry_interval_seconds: float = 30
+    # 关闭时等待队列写完的最长时间（秒）
+    drain_timeout_seconds: float = 10
+
+
+# 定义批量分析配置数据模型
+class AnalysisConfig(BaseModel):
+    # 批量分析进程池的最大进程数，0表示CPU核数减一
+    process_pool_max_workers: int = 0
+    # 子进程启动方式：forkserver或spawn（服务进程已有多个线程，不使用fork）
+    process_pool_start_method: str = "forkserver"
+
+
+# 定义文档重排序配置数据模型
+class RerankerConfig(BaseModel):
+    # 重排序后端：tfidf（语料级IDF）、cross_encoder（本地交叉编码器）或none（不重排序）
+    backend: str = "tfidf"
+    # 交叉编码器模型（本地路径或HuggingFace模型名）
+    model_name: str = "./models/bge-reranker-base"
+    # (查询, 文档) 对的最大token数，超出部分截断
+    max_length: int = 512
+    # 单批推理的文档数
+    batch_size: int = 16
+    # 重排序时间预算（毫秒），超出时保持检索顺序
+    time_budget_ms: float = 300
+    # 推理线程数，为空时使用PyTorch默认值
+    threads: Optional[int] = None
+    # (查询哈希, 文档id) 分数缓存的最大条数
+    cache_max_entries: int = 10000
+    # 重排序后保留的文档数
+    top_n: int = 5
+    # 启动时是否预加载重排序模型
+    warmup_on_startup: bool = True
+
+
 # 定义整体配置数据模型
 class Config(BaseModel):
     # LLM模型配置
@@ -58,6 +228,20 @@ class Config(BaseModel):
     vector_store: VectorStoreConfig
     # 文本分割器配置
     text_splitter: TextSplitterConfig
+    # 语义回复缓存配置
+    semantic_cache: SemanticCacheConfig = SemanticCacheConfig()
+    # 混合检索配置
+    hybrid_search: HybridSearchConfig = HybridSearchConfig()
+    # 检索元数据过滤配置
+    retrieval_filter: RetrievalFilterConfig = RetrievalFilterConfig()
+    # 检索结果缓存配置
+    retrieval_cache: RetrievalCacheConfig = RetrievalCacheConfig()
+    # 文档重排序配置
+    reranker: RerankerConfig = RerankerConfig()
+    # 对话轮次异步落库配置
+    persistence_queue: PersistenceQueueConfig = PersistenceQueueConfig()
+    # 批量分析配置
+    analysis: AnalysisConfig = AnalysisConfig()
     
 
 
@@ -0,0 +1,59 @@
+"""后台刷新 - 在后台线程重建耗时的索引，重建完成前继续使用旧索引"""
+
+from typing import Any, Callable
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundRefresher:
+    """同一时刻最多运行一次的后台刷新任务
+
+    请求路径上发现索引过期时调用 trigger()，立即返回；刷新函数在后台线程中
+    构建新索引并自行替换缓存。刷新失败后 retry_interval 秒内不再触发，
+    避免每个请求都重新扫描整个集合。预热等场景用 run() 同步刷新，
+    与后台刷新串行执行，不会同时扫描两次集合。
+    """
+
+    def __init__(self, name: str, refresh: Callable[[], Any], retry_interval: float = 60.0):
+        self.name = name
+        self.refresh = refresh
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._running = False
+        self._failed_at = None
+
+    def run(self) -> Any:
+        """在当前线程同步刷新，返回刷新函数的结果"""
+        with self._refresh_lock:
+            return self.refresh()
+
+    def trigger(self) -> bool:
+        """启动一次后台刷新，已在运行或处于失败冷却期时返回False"""
+        with self._lock:
+            if self._running:
+                return False
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_interval:
+                return False
+            self._running = True
+        threading.Thread(target=self._run, name=f"{self.name}-refresh", daemon=True).start()
+        return True
+
+    def _run(self) -> None:
+        failed_at = None
+        try:
+            self.run()
+        except Exception as e:
+            failed_at = time.monotonic()
+            logger.error(f"[BackgroundRefresher] {self.name} 后台刷新失败，{self.retry_interval}秒后重试: {e}")
+        finally:
+            with self._lock:
+                self._running = False
+                self._failed_at = failed_at
+
+    @property
+    def running(self) -> bool:
+        return self._running
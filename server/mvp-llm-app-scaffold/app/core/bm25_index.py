@@ -0,0 +1,286 @@
+"""BM25倒排索引 - 基于jieba分词的词法检索，与向量检索互补
+
+药物名、热线号码、具体疾病名称等术语，字面匹配往往比向量检索更准确。
+索引与Chroma集合使用相同的文档id，持久化在向量数据库目录下，由导入脚本同步更新。
+"""
+
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import heapq
+import logging
+import math
+import os
+import pickle
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# 索引文件名（位于向量数据库持久化目录下）
+BM25_INDEX_FILENAME = "bm25_index.pkl"
+# 索引文件格式版本，格式变化时旧文件会被丢弃并重建
+BM25_INDEX_FORMAT_VERSION = 1
+# 单个词频的上限（postings中以16位无符号整数存储）
+MAX_TERM_FREQUENCY = 0xFFFF
+# 已删除文档超过该比例时压缩postings
+COMPACT_DELETED_RATIO = 0.2
+
+
+def _is_meaningful_token(token: str) -> bool:
+    """过滤纯空白和纯标点的分词结果"""
+    return any(unicodedata.category(ch)[0] not in "PZC" for ch in token)
+
+
+def tokenize(text: str) -> List[str]:
+    """jieba搜索引擎模式分词（长词会再切出子词），统一转为小写"""
+    import jieba
+
+    tokens = []
+    for token in jieba.lcut_for_search(text.lower()):
+        token = token.strip()
+        if token and _is_meaningful_token(token):
+            tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """数组存储postings的BM25倒排索引
+
+    每个词的postings是两个紧凑数组：文档序号 array('I') 和词频 array('H')，
+    文档长度同样存放在 array('I') 中，百万级文本块也只占用少量内存。
+    更新或删除文档时只打删除标记，删除比例过高时再压缩。
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.doc_lengths = array("I")
+        self.deleted = bytearray()
+        self.vocabulary: Dict[str, int] = {}
+        self._posting_docs: List[array] = []
+        self._posting_freqs: List[array] = []
+        self._doc_numbers: Dict[str, int] = {}
+        self.total_length = 0
+        self.live_count = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self.live_count
+
+    @property
+    def average_length(self) -> float:
+        return self.total_length / self.live_count if self.live_count else 0.0
+
+    def add_documents(self, ids: Iterable[str], texts: Iterable[str]) -> int:
+        """添加文档，已存在的id视为更新；返回添加的文档数"""
+        added = 0
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self._doc_numbers:
+                    self._mark_deleted(self._doc_numbers[doc_id])
+                counts = Counter(tokenize(text or ""))
+                length = sum(counts.values())
+                number = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+                self._doc_numbers[doc_id] = number
+                self.doc_lengths.append(length)
+                self.deleted.append(0)
+                self.total_length += length
+                self.live_count += 1
+                for term, frequency in counts.items():
+                    term_id = self.vocabulary.get(term)
+                    if term_id is None:
+                        term_id = len(self._posting_docs)
+                        self.vocabulary[term] = term_id
+                        self._posting_docs.append(array("I"))
+                        self._posting_freqs.append(array("H"))
+                    self._posting_docs[term_id].append(number)
+                    self._posting_freqs[term_id].append(min(frequency, MAX_TERM_FREQUENCY))
+                added += 1
+        return added
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """删除文档，返回实际删除的数量"""
+        removed = 0
+        with self._lock:
+            for doc_id in ids:
+                number = self._doc_numbers.pop(doc_id, None)
+                if number is not None:
+                    self._mark_deleted(number)
+                    removed += 1
+            if len(self.doc_ids) and (len(self.doc_ids) - self.live_count) / len(self.doc_ids) > COMPACT_DELETED_RATIO:
+                self.compact()
+        return removed
+
+    def _mark_deleted(self, number: int) -> None:
+        if not self.deleted[number]:
+            self.deleted[number] = 1
+            self.total_length -= self.doc_lengths[number]
+            self.live_count -= 1
+
+    def compact(self) -> None:
+        """丢弃已删除文档，重新编号postings"""
+        with self._lock:
+            remap = array("i", [-1]) * len(self.doc_ids)
+            doc_ids: List[str] = []
+            doc_lengths = array("I")
+            for number, doc_id in enumerate(self.doc_ids):
+                if not self.deleted[number]:
+                    remap[number] = len(doc_ids)
+                    doc_ids.append(doc_id)
+                    doc_lengths.append(self.doc_lengths[number])
+
+            vocabulary: Dict[str, int] = {}
+            posting_docs: List[array] = []
+            posting_freqs: List[array] = []
+            for term, term_id in self.vocabulary.items():
+                docs, freqs = array("I"), array("H")
+                for number, frequency in zip(self._posting_docs[term_id], self._posting_freqs[term_id]):
+                    if remap[number] >= 0:
+                        docs.append(remap[number])
+                        freqs.append(frequency)
+                if docs:
+                    vocabulary[term] = len(posting_docs)
+                    posting_docs.append(docs)
+                    posting_freqs.append(freqs)
+
+            self.doc_ids = doc_ids
+            self.doc_lengths = doc_lengths
+            self.deleted = bytearray(len(doc_ids))
+            self.vocabulary = vocabulary
+            self._posting_docs = posting_docs
+            self._posting_freqs = posting_freqs
+            self._doc_numbers = {doc_id: number for number, doc_id in enumerate(doc_ids)}
+            logger.info(f"[BM25Index] 压缩完成: {len(doc_ids)}个文档, {len(vocabulary)}个词")
+
+    def document_frequency(self, term: str) -> int:
+        """包含该词的文档数（删除标记在压缩前仍计入）"""
+        term_id = self.vocabulary.get(term)
+        return len(self._posting_docs[term_id]) if term_id is not None else 0
+
+    def idf(self, term: str) -> float:
+        """BM25的IDF（非负形式）"""
+        df = self.document_frequency(term)
+        return math.log(1 + (self.live_count - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """按BM25分数返回前k个 (文档id, 分数)"""
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self.live_count:
+                return []
+            k1, b = self.k1, self.b
+            average_length = self.average_length or 1.0
+            deleted, doc_lengths = self.deleted, self.doc_lengths
+            scores: Dict[int, float] = defaultdict(float)
+            for term in terms:
+                term_id = self.vocabulary.get(term)
+                if term_id is None:
+                    continue
+                idf = self.idf(term)
+                for number, frequency in zip(self._posting_docs[term_id], self._posting_freqs[term_id]):
+                    if deleted[number]:
+                        continue
+                    norm = k1 * (1 - b + b * doc_lengths[number] / average_length)
+                    scores[number] += idf * frequency * (k1 + 1) / (frequency + norm)
+            top = heapq.nlargest(k, scores.items(), key=itemgetter(1))
+            return [(self.doc_ids[number], score) for number, score in top]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计信息"""
+        with self._lock:
+            postings = sum(len(docs) for docs in self._posting_docs)
+            return {
+                "documents": self.live_count,
+                "deleted": len(self.doc_ids) - self.live_count,
+                "terms": len(self.vocabulary),
+                "postings": postings,
+                "average_length": round(self.average_length, 2),
+                "postings_bytes": postings * 6 + len(self.doc_lengths) * 4,
+            }
+
+    def save(self, path: Path) -> None:
+        """原子写入索引文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            state = {
+                "version": BM25_INDEX_FORMAT_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "doc_ids": self.doc_ids,
+                "doc_lengths": self.doc_lengths,
+                "deleted": bytes(self.deleted),
+                "terms": list(self.vocabulary),
+                "posting_docs": self._posting_docs,
+                "posting_freqs": self._posting_freqs,
+            }
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["BM25Index"]:
+        """读取索引文件，文件不存在或格式不兼容时返回None"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"[BM25Index] 读取索引失败: {e}")
+            return None
+        if state.get("version") != BM25_INDEX_FORMAT_VERSION:
+            logger.info(f"[BM25Index] 索引格式版本不匹配，需要重建: {path}")
+            return None
+
+        index = cls(k1=state["k1"], b=state["b"])
+        index.doc_ids = state["doc_ids"]
+        index.doc_lengths = state["doc_lengths"]
+        index.deleted = bytearray(state["deleted"])
+        index.vocabulary = {term: term_id for term_id, term in enumerate(state["terms"])}
+        index._posting_docs = state["posting_docs"]
+        index._posting_freqs = state["posting_freqs"]
+        index._doc_numbers = {
+            doc_id: number for number, doc_id in enumerate(index.doc_ids) if not index.deleted[number]
+        }
+        index.live_count = len(index._doc_numbers)
+        index.total_length = sum(
+            length for number, length in enumerate(index.doc_lengths) if not index.deleted[number]
+        )
+        return index
+
+    @classmethod
+    def build_from_collection(cls, collection, batch_size: int = 1000, **kwargs) -> "BM25Index":
+        """分页读取Chroma集合中的全部文档构建索引"""
+        index = cls(**kwargs)
+        offset = 0
+        while True:
+            result = collection.get(include=["documents"], limit=batch_size, offset=offset)
+            ids = result.get("ids") or []
+            if not ids:
+                break
+            index.add_documents(ids, result.get("documents") or [""] * len(ids))
+            offset += len(ids)
+        logger.info(f"[BM25Index] 从集合构建索引完成: {index.live_count}个文档, {len(index.vocabulary)}个词")
+        return index
+
+
+def get_bm25_index_path(persist_directory) -> Path:
+    """向量数据库目录对应的BM25索引文件路径"""
+    return Path(persist_directory) / BM25_INDEX_FILENAME
+
+
+def add_to_bm25_index(persist_directory, ids: List[str], texts: List[str]) -> BM25Index:
+    """供导入脚本使用：把新写入Chroma的文档同步加入索引文件"""
+    path = get_bm25_index_path(persist_directory)
+    index = BM25Index.load(path) or BM25Index()
+    index.add_documents(ids, texts)
+    index.save(path)
+    return index
@@ -0,0 +1,169 @@
+"""知识分类质心索引 - 预先计算每个分类的平均向量，检索前在O(分类数)内选出相关分类"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from app.configs.settings import config, ROOT
+from app.core.vector_store import get_vector_store, get_collection_version
+from app.core.background_refresh import BackgroundRefresher
+
+logger = logging.getLogger(__name__)
+
+# 质心文件名（位于向量数据库持久化目录下）
+CATEGORY_INDEX_FILENAME = "category_centroids.json"
+
+
+class CategoryCentroidIndex:
+    """每个知识分类一个L2归一化的质心向量"""
+
+    def __init__(
+        self,
+        centroids: Dict[str, List[float]],
+        counts: Dict[str, int],
+        document_count: int,
+        collection_version: int = 0
+    ):
+        self.categories = list(centroids)
+        self.counts = counts
+        self.document_count = document_count
+        self.collection_version = collection_version
+        self._matrix = np.asarray([centroids[c] for c in self.categories], dtype=np.float32).reshape(len(self.categories), -1)
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def select(self, query_embedding: List[float], top_n: int = 2, min_similarity: float = 0.0) -> List[Tuple[str, float]]:
+        """返回与查询向量最接近的分类及其余弦相似度"""
+        if not self.categories:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        similarities = self._matrix @ (query / norm)
+        order = np.argsort(-similarities)[:top_n]
+        return [
+            (self.categories[i], float(similarities[i]))
+            for i in order if similarities[i] >= min_similarity
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "document_count": self.document_count,
+            "collection_version": self.collection_version,
+            "counts": self.counts,
+            "centroids": {c: self._matrix[i].tolist() for i, c in enumerate(self.categories)},
+        }
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["CategoryCentroidIndex"]:
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data["centroids"], data["counts"], data["document_count"], data.get("collection_version", 0))
+        except Exception as e:
+            logger.warning(f"[CategoryCentroidIndex] 读取质心文件失败: {e}")
+            return None
+
+    @classmethod
+    def build_from_collection(cls, collection, category_field: str, batch_size: int = 1000) -> "CategoryCentroidIndex":
+        """分页读取集合中的向量，按分类累加后归一化"""
+        sums: Dict[str, np.ndarray] = {}
+        counts: Dict[str, int] = {}
+        offset = 0
+        while True:
+            result = collection.get(include=["embeddings", "metadatas"], limit=batch_size, offset=offset)
+            ids = result.get("ids") or []
+            if not ids:
+                break
+            for embedding, metadata in zip(result["embeddings"], result["metadatas"]):
+                category = (metadata or {}).get(category_field)
+                if not category or embedding is None:
+                    continue
+                vector = np.asarray(embedding, dtype=np.float32)
+                vector_norm = np.linalg.norm(vector)
+                if vector_norm == 0:
+                    continue
+                if category in sums:
+                    sums[category] += vector / vector_norm
+                else:
+                    sums[category] = vector / vector_norm
+                counts[category] = counts.get(category, 0) + 1
+            offset += len(ids)
+
+        centroids = {}
+        for category, total in sums.items():
+            total_norm = np.linalg.norm(total)
+            if total_norm > 0:
+                centroids[category] = (total / total_norm).tolist()
+        logger.info(f"[CategoryCentroidIndex] 质心索引构建完成: {len(centroids)}个分类, {offset}个文档")
+        return cls(centroids, {c: counts[c] for c in centroids}, offset)
+
+
+_category_index: Optional[CategoryCentroidIndex] = None
+_category_index_lock = threading.Lock()
+
+
+def refresh_category_index() -> CategoryCentroidIndex:
+    """
+    按当前集合版本加载分类质心索引并替换缓存。
+
+    质心文件记录了构建时的集合版本号和文档数，导入脚本写入新文档后版本号变化，
+    此时重新检查文档数，不一致则遍历整个集合重建。只在预热和后台线程中调用。
+    """
+    global _category_index
+
+    collection_version = get_collection_version()
+    collection = get_vector_store()._collection
+    document_count = collection.count()
+    path = ROOT / config.vector_store.persist_directory / CATEGORY_INDEX_FILENAME
+    index = _category_index if _category_index is not None else CategoryCentroidIndex.load(path)
+    if index is None or index.document_count != document_count:
+        index = CategoryCentroidIndex.build_from_collection(
+            collection, config.retrieval_filter.category_field
+        )
+    index.collection_version = collection_version
+    index.save(path)
+    with _category_index_lock:
+        _category_index = index
+    return index
+
+
+_category_index_refresher = BackgroundRefresher("category_index", refresh_category_index)
+
+
+def get_category_index() -> Optional[CategoryCentroidIndex]:
+    """
+    获取分类质心索引（使用缓存）。
+
+    集合版本号变化时在后台线程刷新，完成前继续返回旧索引；
+    首次加载完成前返回None，调用方不做质心分类选择。
+    """
+    index = _category_index
+    if index is None or index.collection_version != get_collection_version():
+        _category_index_refresher.trigger()
+    return index
+
+
+def warmup_category_index() -> Optional[CategoryCentroidIndex]:
+    """在预热线程中同步加载质心索引，与后台刷新串行执行"""
+    try:
+        return _category_index_refresher.run()
+    except Exception as e:
+        logger.error(f"[CategoryCentroidIndex] 加载质心索引失败: {e}")
+        return None
@@ -0,0 +1,59 @@
+"""向量集合版本号 - 导入脚本每次写入集合后递增，检索缓存据此判断结果是否过期"""
+
+from pathlib import Path
+from typing import Optional, Tuple
+import os
+import threading
+
+# 版本号文件名（位于向量数据库持久化目录下）
+COLLECTION_VERSION_FILENAME = "collection_version"
+
+
+def get_collection_version_path(persist_directory) -> Path:
+    return Path(persist_directory) / COLLECTION_VERSION_FILENAME
+
+
+def read_collection_version(persist_directory) -> int:
+    """读取版本号，文件不存在时为0"""
+    try:
+        return int(get_collection_version_path(persist_directory).read_text(encoding="utf-8").strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_collection_version(persist_directory) -> int:
+    """递增版本号并原子写回，返回新版本号"""
+    path = get_collection_version_path(persist_directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    version = read_collection_version(persist_directory) + 1
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(str(version), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return version
+
+
+class CollectionVersionReader:
+    """进程内的版本号读取器，文件未变化时直接返回缓存的版本号
+
+    版本号文件通过os.replace整体替换，每次写入都会产生新的inode，
+    用 (inode, 修改时间) 判断文件是否变化，不受文件系统时间精度影响。
+    """
+
+    def __init__(self, persist_directory):
+        self.path = get_collection_version_path(persist_directory)
+        self._cached: Tuple[Optional[Tuple[int, int]], int] = (None, 0)
+        self._lock = threading.Lock()
+
+    def get(self) -> int:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return 0
+        signature = (stat.st_ino, stat.st_mtime_ns)
+        cached_signature, version = self._cached
+        if signature == cached_signature:
+            return version
+        with self._lock:
+            version = read_collection_version(self.path.parent)
+            self._cached = (signature, version)
+        return version
@@ -0,0 +1,122 @@
+"""查询向量微批处理 - 合并并发请求的查询文本，一次前向计算完成编码"""
+
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class BatchedEmbeddings(Embeddings):
+    """微批处理的嵌入模型包装器
+
+    并发调用方的 embed_query 请求进入队列，后台线程在 max_wait_ms 内
+    最多收集 max_batch_size 条文本，调用一次 embed_documents 完成编码后
+    分别写回各调用方的Future。队列已满时在调用方线程直接编码。
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 256
+    ):
+        self.embeddings = embeddings
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max(max_wait_ms, 0) / 1000
+        self.max_queue_size = max_queue_size
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue(maxsize=max_queue_size)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # 统计信息
+        self.batch_size_histogram: Counter = Counter()
+        self.batches = 0
+        self.texts_embedded = 0
+        self.overflow = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self) -> List[Tuple[str, Future, float]]:
+        """阻塞等待第一条请求，然后在等待窗口内继续收集"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            started = time.monotonic()
+            texts = [text for text, _, _ in batch]
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                logger.error(f"[BatchedEmbeddings] 批量编码失败: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+            waits = [started - enqueued for _, _, enqueued in batch]
+            with self._stats_lock:
+                self.batches += 1
+                self.texts_embedded += len(batch)
+                self.batch_size_histogram[len(batch)] += 1
+                self.total_wait_seconds += sum(waits)
+                self.max_wait_seconds = max(self.max_wait_seconds, max(waits))
+
+    def embed_query(self, text: str) -> List[float]:
+        """提交查询文本并等待批处理结果"""
+        self._ensure_worker()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((text, future, time.monotonic()))
+        except queue.Full:
+            with self._stats_lock:
+                self.overflow += 1
+            return self.embeddings.embed_query(text)
+        return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """文档编码本身已是批量调用，直接交给底层模型"""
+        return self.embeddings.embed_documents(texts)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批处理统计信息"""
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "max_queue_size": self.max_queue_size,
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "texts_embedded": self.texts_embedded,
+                "avg_batch_size": round(self.texts_embedded / self.batches, 2) if self.batches else 0.0,
+                "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+                "avg_wait_ms": round(self.total_wait_seconds / self.texts_embedded * 1000, 3) if self.texts_embedded else 0.0,
+                "max_wait_ms_observed": round(self.max_wait_seconds * 1000, 3),
+                "overflow": self.overflow
+            }
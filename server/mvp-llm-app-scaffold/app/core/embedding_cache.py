@@ -0,0 +1,157 @@
+"""查询向量缓存 - 在嵌入模型前缓存相同文本的查询向量"""
+
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import sqlite3
+import threading
+import unicodedata
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query_text(text: str) -> str:
+    """归一化查询文本：全半角统一、去除首尾空白、合并连续空白"""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+class CachedEmbeddings(Embeddings):
+    """带LRU缓存的嵌入模型包装器
+
+    embed_query 按 (模型名称, 归一化文本) 缓存向量，内存占用超过字节预算时按LRU淘汰；
+    配置了磁盘路径时，淘汰的向量写入SQLite，之后命中时重新载入内存。
+    embed_documents 直接调用底层模型，不做缓存。
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        max_bytes: int = 32 * 1024 * 1024,
+        disk_path: Optional[str] = None
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], array]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        if disk_path:
+            self._open_disk(disk_path)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _open_disk(self, disk_path: str) -> None:
+        try:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, text))"
+            )
+            self._disk.commit()
+        except Exception as e:
+            logger.error(f"[CachedEmbeddings] 打开磁盘缓存失败: {disk_path}, {e}")
+            self._disk = None
+
+    @staticmethod
+    def _entry_size(vector: array) -> int:
+        return vector.itemsize * len(vector)
+
+    def _put(self, key: Tuple[str, str], vector: array) -> None:
+        """写入内存缓存并按字节预算淘汰（调用方持有锁）"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = vector
+        self._bytes += self._entry_size(vector)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._bytes -= self._entry_size(evicted)
+            self.evictions += 1
+            self._spill(evicted_key, evicted)
+
+    def _spill(self, key: Tuple[str, str], vector: array) -> None:
+        """把淘汰的向量写入磁盘缓存"""
+        if self._disk is None:
+            return
+        try:
+            self._disk.execute(
+                "INSERT OR REPLACE INTO query_embeddings (model, text, vector) VALUES (?, ?, ?)",
+                (key[0], key[1], vector.tobytes())
+            )
+            self._disk.commit()
+        except Exception as e:
+            logger.warning(f"[CachedEmbeddings] 写入磁盘缓存失败: {e}")
+
+    def _load_from_disk(self, key: Tuple[str, str]) -> Optional[array]:
+        if self._disk is None:
+            return None
+        try:
+            row = self._disk.execute(
+                "SELECT vector FROM query_embeddings WHERE model = ? AND text = ?", key
+            ).fetchone()
+        except Exception as e:
+            logger.warning(f"[CachedEmbeddings] 读取磁盘缓存失败: {e}")
+            return None
+        if row is None:
+            return None
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector
+
+    def embed_query(self, text: str) -> List[float]:
+        """获取查询向量，命中缓存时不调用嵌入模型"""
+        key = (self.model_name, normalize_query_text(text))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector.tolist()
+            vector = self._load_from_disk(key)
+            if vector is not None:
+                self.disk_hits += 1
+                self._put(key, vector)
+                return vector.tolist()
+            self.misses += 1
+
+        # 在锁外调用模型，避免阻塞其他线程的缓存读取
+        embedding = self.embeddings.embed_query(key[1])
+        with self._lock:
+            self._put(key, array("f", embedding))
+        return list(embedding)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """文档向量不做缓存"""
+        return self.embeddings.embed_documents(texts)
+
+    def clear(self) -> None:
+        """清空内存缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "disk_enabled": self._disk is not None
+        }
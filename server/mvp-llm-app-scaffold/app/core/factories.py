@@ -1,24 +1,79 @@
 # 导入类型提示模块
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
+import importlib.util
+import logging
+import threading
 
+# 导入HTTP客户端，供所有LLM实例共享连接池
+import httpx
 # 导入LangChain工具基础类
 from langchain_core.tools import BaseTool
 # 导入OpenAI聊天模型
 from langchain_openai import ChatOpenAI
-# 导入向量存储相关模块
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
 
 # 导入应用配置和设置
 from app.configs.settings import api_settings, config as app_config
 # 导入天气工具
 from app.core.tools.weather_tool import get_current_weather
 
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
+
+logger = logging.getLogger(__name__)
+
 # 外部工具注册表，用于管理可用的工具
 EXTERNAL_TOOL_REGISTRY: Dict[str, BaseTool] = {
     "get_current_weather": get_current_weather,  # 注册天气查询工具
 }
 
+# 安装了h2时启用HTTP/2，多个并发请求可复用同一条TLS连接
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+# 进程级共享的HTTP客户端（同步/异步各一个），所有LLM实例复用其连接池
+_http_client: Optional[httpx.Client] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+# 进程级LLM实例注册表，键为 (model, temperature, max_tokens)
+_llm_registry: Dict[Tuple[str, float, int], ChatOpenAI] = {}
+_llm_registry_lock = threading.Lock()
+_llm_registry_stats = {"hits": 0, "misses": 0}
+
+
+def _get_http_limits() -> httpx.Limits:
+    """根据配置构建连接池限制"""
+    return httpx.Limits(
+        max_connections=app_config.llm.max_connections,
+        max_keepalive_connections=app_config.llm.max_keepalive_connections,
+        keepalive_expiry=app_config.llm.keepalive_expiry
+    )
+
+
+def get_shared_http_client() -> httpx.Client:
+    """获取共享的同步HTTP客户端"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        with _llm_registry_lock:
+            if _http_client is None or _http_client.is_closed:
+                _http_client = httpx.Client(
+                    http2=HTTP2_ENABLED,
+                    limits=_get_http_limits(),
+                    timeout=httpx.Timeout(60.0, connect=10.0)
+                )
+    return _http_client
+
+
+def get_shared_async_http_client() -> httpx.AsyncClient:
+    """获取共享的异步HTTP客户端"""
+    global _http_async_client
+    if _http_async_client is None or _http_async_client.is_closed:
+        with _llm_registry_lock:
+            if _http_async_client is None or _http_async_client.is_closed:
+                _http_async_client = httpx.AsyncClient(
+                    http2=HTTP2_ENABLED,
+                    limits=_get_http_limits(),
+                    timeout=httpx.Timeout(60.0, connect=10.0)
+                )
+    return _http_async_client
+
 
 # 创建LLM实例的工厂函数
 def create_llm_instance(llm_config: Dict[str, Any] = None) -> ChatOpenAI:
@@ -29,6 +84,9 @@ def create_llm_instance(llm_config: Dict[str, Any] = None) -> ChatOpenAI:
     config = {
         "model": app_config.llm.name,  # 从应用配置获取模型名称
         "temperature": app_config.llm.temperature,  # 从应用配置获取温度参数
+        "max_tokens": app_config.llm.max_tokens,  # 从应用配置获取最大令牌数
+        "timeout": 60,  # 设置60秒超时，支持并行工作流
+        "max_retries": 3,  # 增加重试次数到3次
         **user_config,  # 合并用户自定义配置
     }
     
@@ -36,20 +94,133 @@ def create_llm_instance(llm_config: Dict[str, Any] = None) -> ChatOpenAI:
     provider = app_config.llm.provider.lower()
     
     if provider in ["openai", "deepseek"]:
-        # OpenAI兼容的API（包括DeepSeek）
+        # OpenAI兼容的API（包括DeepSeek），底层复用共享连接池
         return ChatOpenAI(
             model=config["model"],  # 设置模型名称
             temperature=config["temperature"],  # 设置温度参数
             api_key=api_settings.OPENAI_API_KEY,  # 设置API密钥
             base_url=api_settings.OPENAI_BASE_URL,  # 设置基础URL
-            max_tokens=getattr(app_config.llm, 'max_tokens', 512),  # 限制最大令牌数
-            timeout=60,  # 设置60秒超时，支持并行工作流
-            max_retries=3  # 增加重试次数到3次
+            max_tokens=config["max_tokens"],  # 限制最大令牌数
+            timeout=config["timeout"],
+            max_retries=config["max_retries"],
+            http_client=get_shared_http_client(),
+            http_async_client=get_shared_async_http_client()
         )
     else:
         raise ValueError(f"Unsupported LLM provider: {provider}")
 
 
+def get_shared_llm(
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None
+) -> ChatOpenAI:
+    """
+    获取进程级共享的LLM实例
+    
+    相同 (model, temperature, max_tokens) 的调用返回同一个实例，
+    避免每次请求重新构建客户端并重新建立连接。
+    
+    Args:
+        model: 模型名称，默认使用配置文件中的模型
+        temperature: 温度参数，默认使用配置值
+        max_tokens: 最大令牌数，默认使用配置值
+        
+    Returns:
+        ChatOpenAI: 共享的LLM实例
+    """
+    key = (
+        model or app_config.llm.name,
+        app_config.llm.temperature if temperature is None else temperature,
+        max_tokens or app_config.llm.max_tokens
+    )
+    llm = _llm_registry.get(key)
+    if llm is not None:
+        _llm_registry_stats["hits"] += 1
+        return llm
+    
+    with _llm_registry_lock:
+        llm = _llm_registry.get(key)
+        if llm is None:
+            _llm_registry_stats["misses"] += 1
+            llm = create_llm_instance({
+                "model": key[0],
+                "temperature": key[1],
+                "max_tokens": key[2]
+            })
+            _llm_registry[key] = llm
+            logger.info(f"[LLMRegistry] 创建共享LLM实例: model={key[0]}, temperature={key[1]}, max_tokens={key[2]}")
+        else:
+            _llm_registry_stats["hits"] += 1
+    return llm
+
+
+def _get_pool_connection_count(client: Optional[Any]) -> Dict[str, int]:
+    """读取httpx客户端底层连接池的连接数"""
+    if client is None or client.is_closed:
+        return {"connections": 0, "idle_connections": 0}
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for connection in connections if getattr(connection, "is_idle", lambda: False)())
+    return {"connections": len(connections), "idle_connections": idle}
+
+
+def get_llm_pool_stats() -> Dict[str, Any]:
+    """获取共享LLM实例和HTTP连接池的统计信息"""
+    return {
+        "http2": HTTP2_ENABLED,
+        "registered_llms": [
+            {"model": model, "temperature": temperature, "max_tokens": max_tokens}
+            for model, temperature, max_tokens in _llm_registry
+        ],
+        "registry_hits": _llm_registry_stats["hits"],
+        "registry_misses": _llm_registry_stats["misses"],
+        "limits": {
+            "max_connections": app_config.llm.max_connections,
+            "max_keepalive_connections": app_config.llm.max_keepalive_connections,
+            "keepalive_expiry": app_config.llm.keepalive_expiry
+        },
+        "sync_pool": _get_pool_connection_count(_http_client),
+        "async_pool": _get_pool_connection_count(_http_async_client)
+    }
+
+
+async def warmup_llm_clients() -> None:
+    """
+    预热共享LLM客户端
+    
+    提前创建默认LLM实例，并向API发起一次轻量请求以建立TLS长连接，
+    使首个用户请求不再承担连接建立的开销。
+    """
+    get_shared_llm()
+    base_url = (api_settings.OPENAI_BASE_URL or "https://api.openai.com/v1").rstrip("/")
+    try:
+        await get_shared_async_http_client().get(
+            f"{base_url}/models",
+            headers={"Authorization": f"Bearer {api_settings.OPENAI_API_KEY}"},
+            timeout=10.0
+        )
+        logger.info(f"[LLMRegistry] LLM连接预热完成: {get_llm_pool_stats()['async_pool']}")
+    except Exception as e:
+        # 预热失败不影响服务启动，首个请求会重新建立连接
+        logger.warning(f"[LLMRegistry] LLM连接预热失败: {e}")
+
+
+async def close_llm_clients() -> None:
+    """关闭共享HTTP客户端并清空LLM注册表"""
+    global _http_client, _http_async_client
+    with _llm_registry_lock:
+        _llm_registry.clear()
+        sync_client, async_client = _http_client, _http_async_client
+        _http_client = None
+        _http_async_client = None
+    if sync_client is not None:
+        sync_client.close()
+    if async_client is not None:
+        await async_client.aclose()
+    logger.info("[LLMRegistry] 共享HTTP客户端已关闭")
+
+
 # 根据工具名称列表获取工具实例的函数
 def get_tools(tool_names: List[str]) -> List[BaseTool]:
     # 如果提供了工具名称列表
@@ -66,7 +237,7 @@ def get_tools(tool_names: List[str]) -> List[BaseTool]:
 
 
 # 创建向量存储实例的工厂函数
-def create_vector_store_instance(persist_directory: str = "./chroma_db") -> Chroma:
+def create_vector_store_instance(persist_directory: str = "./chroma_db") -> "Chroma":
     """
     创建ChromaDB向量存储实例
     
@@ -76,6 +247,9 @@ def create_vector_store_instance(persist_directory: str = "./chroma_db") -> Chro
     Returns:
         Chroma: ChromaDB向量存储实例
     """
+    from langchain_community.vectorstores import Chroma
+    from langchain_openai import OpenAIEmbeddings
+    
     # 创建OpenAI嵌入模型实例
     embeddings = OpenAIEmbeddings(
         api_key=api_settings.OPENAI_API_KEY,
@@ -0,0 +1,131 @@
+"""混合检索 - BM25与向量检索并行查询，用倒数排名融合（RRF）合并结果"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import logging
+
+from app.configs.settings import config, HybridWeights
+from app.core.bm25_index import BM25Index
+from app.core.retrieval_filters import MetadataFilter
+
+logger = logging.getLogger(__name__)
+
+# BM25查询在独立线程中执行，与向量检索同时进行
+_bm25_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="bm25-search")
+
+
+def get_hybrid_weights(intent: Optional[str]) -> Dict[str, float]:
+    """获取意图对应的检索器融合权重，未配置的意图使用default"""
+    intent_weights = config.hybrid_search.intent_weights
+    weights = intent_weights.get(intent or "") or intent_weights.get("default") or HybridWeights()
+    return {"dense": weights.dense, "bm25": weights.bm25}
+
+
+def rrf_score(retriever_ranks: Dict[str, int], weights: Dict[str, float]) -> float:
+    """加权倒数排名融合分数: sum(w / (rrf_k + rank))"""
+    rrf_k = config.hybrid_search.rrf_k
+    return sum(weights.get(name, 1.0) / (rrf_k + rank) for name, rank in retriever_ranks.items())
+
+
+def fuse_documents(documents: List[Dict[str, Any]], intent: Optional[str]) -> List[Dict[str, Any]]:
+    """按意图权重重新融合排序
+
+    预检索时意图未知，使用默认权重；意图确定后用文档上记录的各检索器名次重新计算。
+    没有名次信息的文档（纯向量检索结果）保持原顺序。
+    """
+    if not documents or not all(doc.get("retriever_ranks") for doc in documents):
+        return documents
+    weights = get_hybrid_weights(intent)
+    rescored = [{**doc, "score": rrf_score(doc["retriever_ranks"], weights)} for doc in documents]
+    rescored.sort(key=lambda doc: doc["score"], reverse=True)
+    for rank, doc in enumerate(rescored, start=1):
+        doc["rank"] = rank
+    return rescored
+
+
+def hybrid_search(
+    vector_store,
+    bm25_index: BM25Index,
+    query: str,
+    query_embedding: List[float],
+    k: int,
+    intent: Optional[str] = None,
+    metadata_filter: Optional[MetadataFilter] = None
+) -> List[Dict[str, Any]]:
+    """
+    并行执行向量检索和BM25检索，用RRF融合后返回前k个文档。
+
+    Args:
+        vector_store: Chroma向量数据库
+        bm25_index: 与集合同步的BM25索引
+        query: 查询文本
+        query_embedding: 已计算好的查询向量
+        k: 返回文档数
+        intent: 用户意图，决定两路检索的融合权重
+        metadata_filter: 元数据过滤条件，向量检索用where条件，BM25结果在内存中过滤
+
+    Returns:
+        List[Dict[str, Any]]: 文档字典列表，retriever_ranks记录各检索器中的名次
+    """
+    candidate_k = max(k * config.hybrid_search.candidate_multiplier, k)
+    # BM25索引不含元数据，过滤时多取一些候选，过滤后仍有足够的文档参与融合
+    bm25_k = candidate_k * 4 if metadata_filter else candidate_k
+    bm25_future = _bm25_executor.submit(bm25_index.search, query, bm25_k)
+
+    collection = vector_store._collection
+    dense = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=candidate_k,
+        where=metadata_filter.to_where() if metadata_filter else None,
+        include=["documents", "metadatas"]
+    )
+
+    candidates: Dict[str, Dict[str, Any]] = {}
+    for rank, (doc_id, content, metadata) in enumerate(
+        zip(dense["ids"][0], dense["documents"][0], dense["metadatas"][0]), start=1
+    ):
+        candidates[doc_id] = {"content": content, "metadata": metadata or {}, "retriever_ranks": {"dense": rank}}
+
+    try:
+        bm25_results = bm25_future.result()
+    except Exception as e:
+        logger.warning(f"[HybridSearch] BM25检索失败，仅使用向量检索结果: {e}")
+        bm25_results = []
+
+    missing_ids = [doc_id for doc_id, _ in bm25_results if doc_id not in candidates]
+    if missing_ids:
+        fetched = collection.get(ids=missing_ids, include=["documents", "metadatas"])
+        for doc_id, content, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+            if metadata_filter and not metadata_filter.matches(metadata):
+                continue
+            candidates[doc_id] = {"content": content, "metadata": metadata or {}, "retriever_ranks": {}}
+    # 索引中存在但集合里已删除、或不满足过滤条件的文档直接跳过，名次按保留下来的文档计算
+    bm25_ranked = [doc_id for doc_id, _ in bm25_results if doc_id in candidates][:candidate_k]
+    for rank, doc_id in enumerate(bm25_ranked, start=1):
+        candidates[doc_id]["retriever_ranks"]["bm25"] = rank
+    candidates = {doc_id: candidate for doc_id, candidate in candidates.items() if candidate["retriever_ranks"]}
+
+    weights = get_hybrid_weights(intent)
+    fused = sorted(
+        candidates.items(),
+        key=lambda item: rrf_score(item[1]["retriever_ranks"], weights),
+        reverse=True
+    )[:k]
+
+    documents = []
+    for rank, (doc_id, candidate) in enumerate(fused, start=1):
+        documents.append({
+            "id": doc_id,
+            "content": candidate["content"],
+            "metadata": candidate["metadata"],
+            "score": rrf_score(candidate["retriever_ranks"], weights),
+            "rank": rank,
+            "source": "hybrid_search",
+            "retriever_ranks": candidate["retriever_ranks"]
+        })
+
+    logger.info(
+        f"[HybridSearch] 融合完成: 向量{len(dense['ids'][0])}个, BM25{len(bm25_ranked)}个, "
+        f"返回{len(documents)}个, 权重={weights}"
+    )
+    return documents
@@ -0,0 +1,164 @@
+"""ONNX Runtime嵌入模型 - 在CPU上以ONNX图（可选int8量化）运行BGE模型"""
+
+from pathlib import Path
+from typing import List, Optional
+import json
+import logging
+import os
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# 导出的ONNX文件名
+ONNX_MODEL_FILENAME = "model.onnx"
+ONNX_QUANTIZED_FILENAME = "model.int8.onnx"
+
+
+def _read_pooling_mode(model_dir: Path) -> str:
+    """读取sentence-transformers的池化配置，BGE模型使用CLS向量"""
+    pooling_config = model_dir / "1_Pooling" / "config.json"
+    if pooling_config.exists():
+        try:
+            settings = json.loads(pooling_config.read_text(encoding="utf-8"))
+            if settings.get("pooling_mode_mean_tokens"):
+                return "mean"
+        except Exception as e:
+            logger.warning(f"[OnnxEmbeddings] 读取池化配置失败: {e}")
+    return "cls"
+
+
+def get_onnx_model_path(model_dir: Path, quantized: bool) -> Path:
+    """导出的ONNX文件路径（与模型放在同一目录的onnx子目录下）"""
+    return model_dir / "onnx" / (ONNX_QUANTIZED_FILENAME if quantized else ONNX_MODEL_FILENAME)
+
+
+def export_onnx_model(model_dir: str, quantize: bool = True, opset: int = 14) -> Path:
+    """
+    把本地的HuggingFace模型导出为ONNX图，并可选生成int8动态量化版本。
+
+    Args:
+        model_dir: 本地模型目录（如 ./models/bge-small-zh）
+        quantize: 是否额外生成int8动态量化模型
+        opset: ONNX算子集版本
+
+    Returns:
+        Path: 导出的ONNX文件路径（量化时为量化后的文件）
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    model_path = Path(model_dir)
+    output_path = get_onnx_model_path(model_path, quantized=False)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(str(model_path))
+    model = AutoModel.from_pretrained(str(model_path))
+    model.eval()
+
+    inputs = tokenizer(["导出示例文本"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    input_names = [name for name in input_names if name in inputs]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(inputs[name] for name in input_names),
+            str(output_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+    logger.info(f"[OnnxEmbeddings] ONNX模型已导出: {output_path}")
+
+    if not quantize:
+        return output_path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = get_onnx_model_path(model_path, quantized=True)
+    quantize_dynamic(str(output_path), str(quantized_path), weight_type=QuantType.QInt8)
+    logger.info(f"[OnnxEmbeddings] int8量化模型已导出: {quantized_path}")
+    return quantized_path
+
+
+class OnnxEmbeddings(Embeddings):
+    """基于ONNX Runtime的句向量模型
+
+    与 HuggingFaceEmbeddings(normalize_embeddings=True) 输出一致：
+    使用模型目录中配置的池化方式，并做L2归一化。
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        quantized: bool = True,
+        onnx_path: Optional[str] = None,
+        intra_op_threads: Optional[int] = None,
+        max_length: int = 512,
+        batch_size: int = 32
+    ):
+        import numpy as np
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self._np = np
+        self.model_dir = Path(model_dir)
+        self.onnx_path = Path(onnx_path) if onnx_path else get_onnx_model_path(self.model_dir, quantized)
+        if not self.onnx_path.exists():
+            raise FileNotFoundError(
+                f"ONNX模型不存在: {self.onnx_path}，请先运行 export_onnx_model.py 导出"
+            )
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.pooling = _read_pooling_mode(self.model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+
+        # 线程数默认等于CPU核数；inter_op只用1个线程，避免线程间争抢
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(self.onnx_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {item.name for item in self.session.get_inputs()}
+
+        logger.info(
+            f"[OnnxEmbeddings] 加载ONNX模型: {self.onnx_path}, 线程数={options.intra_op_num_threads}, "
+            f"池化={self.pooling}"
+        )
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        np = self._np
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            encoded = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self._input_names if name in encoded}
+            hidden = self.session.run(None, feeds)[0]
+
+            if self.pooling == "mean":
+                mask = encoded["attention_mask"][..., None].astype(hidden.dtype)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            else:
+                pooled = hidden[:, 0]
+
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            vectors.extend((pooled / np.clip(norms, 1e-12, None)).tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
@@ -0,0 +1,260 @@
+"""可插拔的文档重排序后端 - TF-IDF（语料级IDF）与本地交叉编码器"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import threading
+
+from app.configs.settings import config, ROOT
+from app.core.tfidf_reranker import TfidfReranker, tfidf_reranker
+from app.core.vector_store import get_bm25_index
+
+logger = logging.getLogger(__name__)
+
+
+class Reranker(ABC):
+    """重排序后端接口
+
+    score 返回与 documents 一一对应的相关性分数；返回None表示本次无法给出分数
+    （如超出时间预算），调用方应保持原有顺序。
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def score(self, query: str, documents: List[Dict[str, Any]]) -> Optional[List[float]]:
+        """返回与 documents 一一对应的分数，无法评分时返回None"""
+
+    def warmup(self) -> None:
+        """预加载模型，默认无需预热"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class TfidfBackend(Reranker):
+    """TF-IDF余弦重排序，IDF取自BM25索引的语料统计"""
+
+    name = "tfidf"
+
+    def score(self, query: str, documents: List[Dict[str, Any]]) -> Optional[List[float]]:
+        return tfidf_reranker.score(query, documents, get_bm25_index())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, **tfidf_reranker.get_stats()}
+
+
+class CrossEncoderReranker(Reranker):
+    """本地交叉编码器（如bge-reranker）重排序
+
+    (查询, 文档) 对按批在CPU上推理，输入截断到 max_length 个token。
+    推理在单独的工作线程中执行，超出时间预算时返回None让调用方保持原顺序，
+    后台推理完成后结果仍会写入 (查询哈希, 文档id) 分数缓存，供后续相同请求直接使用。
+    """
+
+    name = "cross_encoder"
+
+    def __init__(
+        self,
+        model_name: str,
+        max_length: int = 512,
+        batch_size: int = 16,
+        time_budget_ms: float = 300,
+        threads: Optional[int] = None,
+        cache_max_entries: int = 10000,
+        max_pending: int = 4
+    ):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.batch_size = max(batch_size, 1)
+        self.time_budget = time_budget_ms / 1000
+        self.threads = threads
+        self.cache_max_entries = cache_max_entries
+        self.max_pending = max_pending
+        self._model = None
+        self._tokenizer = None
+        self._load_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cross-encoder")
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = 0
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self.busy_rejections = 0
+        self.batches = 0
+
+    def _load(self) -> None:
+        if self._model is not None:
+            return
+        with self._load_lock:
+            if self._model is not None:
+                return
+            import torch
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+            if self.threads:
+                torch.set_num_threads(self.threads)
+            model_path = Path(self.model_name)
+            if not model_path.is_absolute() and (ROOT / model_path).exists():
+                model_path = ROOT / model_path
+            self._tokenizer = AutoTokenizer.from_pretrained(str(model_path))
+            model = AutoModelForSequenceClassification.from_pretrained(str(model_path))
+            model.eval()
+            self._model = model
+            logger.info(f"[CrossEncoderReranker] 加载交叉编码器: {model_path}")
+
+    def warmup(self) -> None:
+        self._load()
+        self._predict("预热", ["预热文本"])
+
+    def _predict(self, query: str, texts: List[str]) -> List[float]:
+        import torch
+
+        self._load()
+        scores: List[float] = []
+        with torch.inference_mode():
+            for start in range(0, len(texts), self.batch_size):
+                batch = texts[start:start + self.batch_size]
+                encoded = self._tokenizer(
+                    [query] * len(batch),
+                    batch,
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_length,
+                    return_tensors="pt"
+                )
+                logits = self._model(**encoded).logits.view(-1).float()
+                scores.extend(torch.sigmoid(logits).tolist())
+                self.batches += 1
+        return scores
+
+    def _score_missing(self, query: str, query_key: str, keys: List[str], texts: List[str]) -> List[float]:
+        try:
+            scores = self._predict(query, texts)
+            with self._lock:
+                for key, score in zip(keys, scores):
+                    self._cache[(query_key, key)] = score
+                while len(self._cache) > self.cache_max_entries:
+                    self._cache.popitem(last=False)
+            return scores
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def score(self, query: str, documents: List[Dict[str, Any]]) -> Optional[List[float]]:
+        query_key = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        keys = [TfidfReranker.document_key(document) for document in documents]
+
+        scores: List[Optional[float]] = []
+        with self._lock:
+            for key in keys:
+                score = self._cache.get((query_key, key))
+                if score is not None:
+                    self._cache.move_to_end((query_key, key))
+                scores.append(score)
+            missing = [i for i, score in enumerate(scores) if score is None]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+            if missing:
+                # 推理线程积压时直接放弃，避免排队请求全部超时
+                if self._pending >= self.max_pending:
+                    self.busy_rejections += 1
+                    return None
+                self._pending += 1
+
+        if missing:
+            future = self._executor.submit(
+                self._score_missing,
+                query,
+                query_key,
+                [keys[i] for i in missing],
+                [documents[i].get("content", "") for i in missing]
+            )
+            try:
+                new_scores = future.result(timeout=self.time_budget)
+            except FuturesTimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                logger.warning(
+                    f"[CrossEncoderReranker] 超出时间预算{self.time_budget * 1000:.0f}ms，保持原有顺序"
+                )
+                return None
+            for i, score in zip(missing, new_scores):
+                scores[i] = score
+        return scores
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "backend": self.name,
+                "model": self.model_name,
+                "loaded": self._model is not None,
+                "time_budget_ms": self.time_budget * 1000,
+                "cached_scores": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "timeouts": self.timeouts,
+                "busy_rejections": self.busy_rejections,
+                "pending": self._pending,
+                "batches": self.batches
+            }
+
+
+# 按后端名称缓存的重排序器实例
+_rerankers: Dict[str, Reranker] = {}
+_rerankers_lock = threading.Lock()
+
+
+def create_reranker(backend: str) -> Reranker:
+    """根据后端名称创建重排序器"""
+    if backend == "tfidf":
+        return TfidfBackend()
+    if backend == "cross_encoder":
+        reranker_config = config.reranker
+        return CrossEncoderReranker(
+            model_name=reranker_config.model_name,
+            max_length=reranker_config.max_length,
+            batch_size=reranker_config.batch_size,
+            time_budget_ms=reranker_config.time_budget_ms,
+            threads=reranker_config.threads,
+            cache_max_entries=reranker_config.cache_max_entries
+        )
+    raise ValueError(f"Unsupported reranker backend: {backend}")
+
+
+def get_reranker(backend: Optional[str] = None) -> Reranker:
+    """获取重排序器（单例），未指定时使用配置中的后端"""
+    backend = (backend or config.reranker.backend).lower()
+    reranker = _rerankers.get(backend)
+    if reranker is None:
+        with _rerankers_lock:
+            reranker = _rerankers.get(backend)
+            if reranker is None:
+                reranker = _rerankers[backend] = create_reranker(backend)
+    return reranker
+
+
+def warmup_reranker() -> None:
+    """预加载配置中的重排序模型"""
+    if config.reranker.backend == "none":
+        return
+    try:
+        get_reranker().warmup()
+        logger.info(f"[Reranker] 重排序后端预热完成: {config.reranker.backend}")
+    except Exception as e:
+        logger.error(f"[Reranker] 重排序后端预热失败: {e}")
+
+
+def get_reranker_stats() -> Dict[str, Any]:
+    """获取当前重排序后端的统计信息"""
+    if config.reranker.backend == "none":
+        return {"backend": "none"}
+    return get_reranker().get_stats()
@@ -0,0 +1,144 @@
+"""检索结果缓存 - 按 (规范化查询, 意图, k, 过滤条件) 复用检索结果，集合版本变化后自动失效"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import copy
+import json
+import logging
+import threading
+
+from app.configs.settings import config
+from app.core.embedding_cache import normalize_query_text
+from app.core.vector_store import get_collection_version
+
+logger = logging.getLogger(__name__)
+
+# 条目大小分布的分桶上限（字节）
+ENTRY_SIZE_BUCKETS = (1024, 4096, 16384, 65536)
+
+
+@dataclass
+class _RetrievalEntry:
+    """单条缓存记录"""
+    version: int
+    result: Dict[str, Any]
+    size_bytes: int
+
+
+class RetrievalCache:
+    """检索层LRU缓存
+
+    每条记录都带有写入时的集合版本号，读取时版本号与当前不一致即视为过期并丢弃，
+    导入脚本写入新文档后不会再返回旧的检索结果。
+    """
+
+    def __init__(self, version_getter: Callable[[], int], max_entries: int = 2048, enabled: bool = True):
+        self.version_getter = version_getter
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[Hashable, _RetrievalEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(user_input: str, intent: str, k: int, filters: Optional[Dict[str, Any]] = None) -> Tuple:
+        """缓存键：规范化查询 + 意图 + k + 过滤条件"""
+        return (
+            normalize_query_text(user_input),
+            intent,
+            k,
+            json.dumps(filters, sort_keys=True, ensure_ascii=False) if filters else None
+        )
+
+    @staticmethod
+    def _entry_size(result: Dict[str, Any]) -> int:
+        """估算条目大小（JSON序列化后的字节数）"""
+        return len(json.dumps(result, ensure_ascii=False, default=str).encode("utf-8"))
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size_bytes
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """命中且版本未过期时返回结果副本"""
+        if not self.enabled:
+            return None
+        version = self.version_getter()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.version != version:
+                self._remove(key)
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result = entry.result
+        # 调用方会修改文档字典（排名、分数），返回深拷贝
+        return copy.deepcopy(result)
+
+    def put(self, key: Hashable, result: Dict[str, Any], version: Optional[int] = None) -> None:
+        """写入结果，version应为检索开始前读取的集合版本号"""
+        if not self.enabled:
+            return
+        entry = _RetrievalEntry(
+            version=self.version_getter() if version is None else version,
+            result=copy.deepcopy(result),
+            size_bytes=self._entry_size(result)
+        )
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._total_bytes += entry.size_bytes
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中率和条目大小统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            sizes = [entry.size_bytes for entry in self._entries.values()]
+            histogram = {f"<{bucket // 1024}KB": 0 for bucket in ENTRY_SIZE_BUCKETS}
+            histogram[f">={ENTRY_SIZE_BUCKETS[-1] // 1024}KB"] = 0
+            for size in sizes:
+                bucket = next((b for b in ENTRY_SIZE_BUCKETS if size < b), None)
+                histogram[f"<{bucket // 1024}KB" if bucket else f">={ENTRY_SIZE_BUCKETS[-1] // 1024}KB"] += 1
+            return {
+                "enabled": self.enabled,
+                "collection_version": self.version_getter(),
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "total_bytes": self._total_bytes,
+                "avg_entry_bytes": round(self._total_bytes / len(sizes), 1) if sizes else 0.0,
+                "max_entry_bytes": max(sizes) if sizes else 0,
+                "entry_size_histogram": histogram
+            }
+
+
+# 全局检索结果缓存实例
+retrieval_cache = RetrievalCache(
+    get_collection_version,
+    max_entries=config.retrieval_cache.max_entries,
+    enabled=config.retrieval_cache.enabled
+)
@@ -0,0 +1,73 @@
+"""检索元数据过滤 - 把意图和情绪映射为知识分类，生成Chroma的where条件"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import math
+
+from app.configs.settings import config
+from app.core.tools.keyword_matcher import scan_keywords
+from app.core.tools.knowledge_retrieval_tool import EMOTION_TO_KNOWLEDGE_MAP, INTENT_TO_KNOWLEDGE_MAP
+
+
+@dataclass
+class MetadataFilter:
+    """按知识分类或情绪标签过滤文档，两者满足其一即可"""
+    categories: List[str] = field(default_factory=list)
+    emotions: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.categories or self.emotions)
+
+    def to_where(self) -> Optional[Dict[str, Any]]:
+        """转换为Chroma的where条件"""
+        clauses = []
+        if self.categories:
+            clauses.append({config.retrieval_filter.category_field: {"$in": self.categories}})
+        if self.emotions:
+            clauses.append({config.retrieval_filter.emotion_field: {"$in": self.emotions}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+    def matches(self, metadata: Optional[Dict[str, Any]]) -> bool:
+        """在内存中判断文档元数据是否满足过滤条件（用于BM25召回的文档）"""
+        metadata = metadata or {}
+        return (
+            metadata.get(config.retrieval_filter.category_field) in self.categories
+            or metadata.get(config.retrieval_filter.emotion_field) in self.emotions
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"categories": self.categories, "emotions": self.emotions}
+
+
+def detect_dominant_emotion(text: str) -> Optional[str]:
+    """按情绪关键词命中数选出有知识分类映射的主导情绪"""
+    keyword_hits = scan_keywords(text)
+    counts = {emotion: keyword_hits.count(f"emotion.{emotion}") for emotion in EMOTION_TO_KNOWLEDGE_MAP}
+    emotion, count = max(counts.items(), key=lambda item: item[1])
+    return emotion if count > 0 else None
+
+
+def build_metadata_filter(intent: Optional[str], user_input: str) -> Optional[MetadataFilter]:
+    """
+    根据意图和用户输入中的主导情绪构建元数据过滤条件。
+
+    Returns:
+        Optional[MetadataFilter]: 没有可用的分类映射时返回None（不过滤）
+    """
+    categories = list(INTENT_TO_KNOWLEDGE_MAP.get(intent or "", []))
+    emotions = []
+    dominant_emotion = detect_dominant_emotion(user_input)
+    if dominant_emotion:
+        emotions.append(dominant_emotion)
+        for category in EMOTION_TO_KNOWLEDGE_MAP[dominant_emotion]:
+            if category not in categories:
+                categories.append(category)
+    metadata_filter = MetadataFilter(categories=categories, emotions=emotions)
+    return metadata_filter or None
+
+
+def min_filtered_results(k: int) -> int:
+    """过滤检索结果少于该数量时视为稀疏，补充不过滤的检索结果"""
+    return max(1, math.ceil(k * config.retrieval_filter.min_results_ratio))
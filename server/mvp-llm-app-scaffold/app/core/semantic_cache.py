@@ -0,0 +1,144 @@
+"""语义回复缓存 - 基于查询向量复用相似问题的已生成回复"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+import threading
+import time
+
+import numpy as np
+
+from app.configs.settings import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CacheEntry:
+    """单条缓存记录"""
+    intent: str
+    query: str
+    embedding: np.ndarray
+    response: str
+    created_at: float
+
+
+class SemanticResponseCache:
+    """按 (意图, 查询向量) 缓存LLM回复
+
+    查询向量使用检索阶段已经计算好的BGE向量（已归一化），
+    同一意图下余弦相似度超过阈值的历史查询直接复用其回复。
+    记录超过TTL后失效，超过容量时按LRU淘汰。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        similarity_threshold: float = 0.92,
+        ttl_seconds: float = 3600,
+        max_entries: int = 512,
+        excluded_intents: Sequence[str] = ("crisis",)
+    ):
+        self.enabled = enabled
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # 危机类意图永远不走缓存
+        self.excluded_intents = set(excluded_intents) | {"crisis"}
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skips = 0
+
+    def is_cacheable(self, intent: str, query_embedding: Optional[Sequence[float]]) -> bool:
+        """判断本次请求是否可以使用缓存"""
+        return self.enabled and query_embedding is not None and intent not in self.excluded_intents
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, intent: str, query_embedding: Optional[Sequence[float]]) -> Optional[str]:
+        """查找相似查询的缓存回复，未命中返回None"""
+        if not self.is_cacheable(intent, query_embedding):
+            self.skips += 1
+            return None
+
+        vector = self._normalize(query_embedding)
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            keys = [key for key, entry in self._entries.items() if entry.intent == intent]
+            if keys:
+                matrix = np.stack([self._entries[key].embedding for key in keys])
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    entry = self._entries[keys[best]]
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    logger.info(
+                        f"[SemanticResponseCache] 缓存命中: 意图={intent}, 相似度={similarities[best]:.4f}, "
+                        f"原查询={entry.query[:30]}"
+                    )
+                    return entry.response
+            self.misses += 1
+        return None
+
+    def store(self, intent: str, query: str, query_embedding: Optional[Sequence[float]], response: str) -> None:
+        """写入一条缓存回复"""
+        if not response or not self.is_cacheable(intent, query_embedding):
+            return
+
+        entry = _CacheEntry(
+            intent=intent,
+            query=query,
+            embedding=self._normalize(query_embedding),
+            response=response,
+            created_at=time.monotonic()
+        )
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "skips": self.skips,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "similarity_threshold": self.similarity_threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+            "excluded_intents": sorted(self.excluded_intents)
+        }
+
+
+# 全局语义缓存实例
+semantic_cache = SemanticResponseCache(
+    enabled=config.semantic_cache.enabled,
+    similarity_threshold=config.semantic_cache.similarity_threshold,
+    ttl_seconds=config.semantic_cache.ttl_seconds,
+    max_entries=config.semantic_cache.max_entries,
+    excluded_intents=config.semantic_cache.excluded_intents
+)
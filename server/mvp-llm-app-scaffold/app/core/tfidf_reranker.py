@@ -0,0 +1,106 @@
+"""TF-IDF重排序 - 使用导入时统计的语料级IDF，文档稀疏向量按id缓存"""
+
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import math
+import threading
+
+from app.core.bm25_index import BM25Index, tokenize
+
+logger = logging.getLogger(__name__)
+
+SparseVector = Dict[str, float]
+
+
+@lru_cache(maxsize=1024)
+def _tokenize_query(text: str) -> Tuple[str, ...]:
+    return tuple(tokenize(text))
+
+
+class TfidfReranker:
+    """基于语料级IDF的TF-IDF余弦重排序
+
+    IDF直接取自导入时维护的BM25倒排索引中的文档频率（与sklearn的平滑IDF公式一致），
+    不再用5~8个候选文档临时拟合。每个文档分词后的L2归一化稀疏向量按文档id缓存，
+    查询阶段只需计算查询向量并与候选文档做稀疏点积。
+    索引重新加载（导入了新文档）后IDF发生变化，缓存随之清空。
+    """
+
+    def __init__(self, max_cached_documents: int = 20000):
+        self.max_cached_documents = max_cached_documents
+        self._vectors: "OrderedDict[str, SparseVector]" = OrderedDict()
+        self._index: Optional[BM25Index] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _idf(self, index: Optional[BM25Index], term: str) -> float:
+        # 没有语料统计时所有词权重相同，退化为词频余弦
+        if index is None:
+            return 1.0
+        return math.log((len(index) + 1) / (index.document_frequency(term) + 1)) + 1
+
+    def _vectorize(self, index: Optional[BM25Index], tokens) -> SparseVector:
+        weights = {term: count * self._idf(index, term) for term, count in Counter(tokens).items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {term: weight / norm for term, weight in weights.items()} if norm else {}
+
+    @staticmethod
+    def document_key(document: Dict[str, Any]) -> str:
+        """文档缓存键：优先使用集合中的文档id，否则使用内容哈希"""
+        doc_id = document.get("id")
+        if doc_id:
+            return str(doc_id)
+        return hashlib.sha1(document.get("content", "").encode("utf-8")).hexdigest()
+
+    def _document_vector(self, index: Optional[BM25Index], document: Dict[str, Any]) -> SparseVector:
+        key = self.document_key(document)
+        with self._lock:
+            if index is not self._index:
+                self._vectors.clear()
+                self._index = index
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        vector = self._vectorize(index, tokenize(document.get("content", "")))
+        with self._lock:
+            if index is self._index:
+                self._vectors[key] = vector
+                while len(self._vectors) > self.max_cached_documents:
+                    self._vectors.popitem(last=False)
+        return vector
+
+    def score(self, query: str, documents: List[Dict[str, Any]], index: Optional[BM25Index]) -> List[float]:
+        """计算查询与每个文档的余弦相似度"""
+        query_vector = self._vectorize(index, _tokenize_query(query))
+        scores = []
+        for document in documents:
+            document_vector = self._document_vector(index, document)
+            # 稀疏点积：遍历较短的向量
+            shorter, longer = sorted((query_vector, document_vector), key=len)
+            scores.append(sum(weight * longer.get(term, 0.0) for term, weight in shorter.items()))
+        return scores
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "cached_documents": len(self._vectors),
+                "max_cached_documents": self.max_cached_documents,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "corpus_documents": len(self._index) if self._index is not None else None
+            }
+
+
+# 全局TF-IDF重排序器实例
+tfidf_reranker = TfidfReranker()
@@ -1,10 +1,15 @@
 """危机检测工具 - 识别用户的心理危机状况"""
 
 import logging
+from dataclasses import dataclass, field, fields, asdict
+from datetime import datetime
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
 
+# 危机关键词库定义在lexicons中，由共享的关键词自动机统一匹配
+from app.core.tools.keyword_matcher import scan_keywords
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,6 +18,8 @@ class CrisisDetectionInput(BaseModel):
     message: str = Field(description="用户消息内容")
     user_id: str = Field(description="用户ID")
     conversation_history: Optional[List[str]] = Field(default=None, description="对话历史")
+    conversation_id: Optional[str] = Field(default=None, description="对话ID，提供时使用该对话累积的风险状态")
+    message_id: Optional[str] = Field(default=None, description="消息ID，同一条消息重复检测时不重复计入对话状态")
     context: Optional[Dict[str, Any]] = Field(default=None, description="上下文信息")
 
 
@@ -25,49 +32,16 @@ class CrisisLevel:
     CRITICAL = 4  # 极高风险
 
 
-# 危机关键词库
-CRITICAL_KEYWORDS = [
-    "自杀", "想死", "不想活", "结束生命", "了结自己", "自我了断",
-    "跳楼", "上吊", "割腕", "服毒", "安眠药", "煤气",
-    "死了算了", "活着没意思", "解脱", "一了百了",
-    "suicide", "kill myself", "end my life", "want to die"
-]
-
-HIGH_RISK_KEYWORDS = [
-    "绝望", "无助", "痛苦", "折磨", "煎熬", "崩溃",
-    "看不到希望", "没有未来", "活着痛苦", "生不如死",
-    "自残", "自伤", "伤害自己", "惩罚自己",
-    "hopeless", "helpless", "can't go on", "no point"
-]
-
-MEDIUM_RISK_KEYWORDS = [
-    "抑郁", "沮丧", "难过", "悲伤", "孤独", "空虚",
-    "失眠", "噩梦", "焦虑", "恐慌", "害怕",
-    "没有价值", "没用", "失败者", "废物",
-    "depression", "sad", "lonely", "anxious", "worthless"
-]
-
-LOW_RISK_KEYWORDS = [
-    "烦躁", "郁闷", "不开心", "心情不好", "压力大",
-    "疲惫", "累", "困扰", "担心", "紧张",
-    "upset", "tired", "stressed", "worried", "nervous"
-]
-
-
 def _analyze_message(message: str) -> int:
     """分析单条消息的危机等级"""
-    message_lower = message.lower()
+    keyword_hits = scan_keywords(message)
     
     # 检查极高风险关键词
-    for keyword in CRITICAL_KEYWORDS:
-        if keyword.lower() in message_lower:
-            return CrisisLevel.CRITICAL
+    if keyword_hits.has("crisis.critical"):
+        return CrisisLevel.CRITICAL
     
     # 检查高风险关键词
-    high_risk_count = 0
-    for keyword in HIGH_RISK_KEYWORDS:
-        if keyword.lower() in message_lower:
-            high_risk_count += 1
+    high_risk_count = keyword_hits.count("crisis.high")
     
     if high_risk_count >= 2:  # 多个高风险词汇
         return CrisisLevel.HIGH
@@ -75,10 +49,7 @@ def _analyze_message(message: str) -> int:
         return CrisisLevel.MEDIUM
     
     # 检查中等风险关键词
-    medium_risk_count = 0
-    for keyword in MEDIUM_RISK_KEYWORDS:
-        if keyword.lower() in message_lower:
-            medium_risk_count += 1
+    medium_risk_count = keyword_hits.count("crisis.medium")
     
     if medium_risk_count >= 3:  # 多个中等风险词汇
         return CrisisLevel.MEDIUM
@@ -86,32 +57,126 @@ def _analyze_message(message: str) -> int:
         return CrisisLevel.LOW
     
     # 检查低风险关键词
-    for keyword in LOW_RISK_KEYWORDS:
-        if keyword.lower() in message_lower:
-            return CrisisLevel.LOW
+    if keyword_hits.has("crisis.low"):
+        return CrisisLevel.LOW
     
     return CrisisLevel.NONE
 
 
+# 滚动窗口大小：历史风险只看最近的几条消息
+CRISIS_HISTORY_WINDOW = 5
+# 窗口内负面消息达到该数量时提升风险等级
+CRISIS_NEGATIVE_ESCALATION_COUNT = 3
+# 每条新消息后历史峰值风险的衰减系数
+CRISIS_LEVEL_DECAY = 0.8
+
+
+@dataclass
+class CrisisRiskState:
+    """单个对话累积的危机风险状态
+
+    每条新消息只做一次分析，分析结果折叠进滚动状态，
+    评估新消息的风险时不再重新扫描历史消息。
+    """
+    # 最近 CRISIS_HISTORY_WINDOW 条消息的危机等级
+    recent_levels: List[int] = field(default_factory=list)
+    # 最近折叠过的消息ID，重试或重新生成同一条消息时不重复计数
+    recent_message_ids: List[str] = field(default_factory=list)
+    # 随消息数衰减的历史峰值等级
+    decayed_level: float = 0.0
+    # 已折叠的消息总数
+    message_count: int = 0
+    updated_at: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CrisisRiskState":
+        """从持久化的字典恢复，忽略旧版本中已删除的字段"""
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+    def fold(self, level: int, message_id: Optional[str] = None) -> bool:
+        """
+        折叠一条新消息的危机等级。
+
+        Returns:
+            bool: 该消息已经折叠过时返回False，状态不变
+        """
+        if message_id is not None:
+            if message_id in self.recent_message_ids:
+                return False
+            self.recent_message_ids.append(message_id)
+            if len(self.recent_message_ids) > CRISIS_HISTORY_WINDOW:
+                del self.recent_message_ids[:-CRISIS_HISTORY_WINDOW]
+        self.recent_levels.append(level)
+        if len(self.recent_levels) > CRISIS_HISTORY_WINDOW:
+            del self.recent_levels[:-CRISIS_HISTORY_WINDOW]
+        self.decayed_level = max(float(level), self.decayed_level * CRISIS_LEVEL_DECAY)
+        self.message_count += 1
+        self.updated_at = datetime.now().isoformat()
+        return True
+
+    def history_level(self) -> int:
+        """根据累积状态计算历史危机等级"""
+        if not self.recent_levels:
+            return CrisisLevel.NONE
+        max_level = max(self.recent_levels)
+        
+        # 如果历史中持续出现负面情绪，提升风险等级
+        negative_count = sum(1 for level in self.recent_levels if level >= CrisisLevel.LOW)
+        if negative_count >= CRISIS_NEGATIVE_ESCALATION_COUNT and max_level < CrisisLevel.HIGH:
+            max_level = min(max_level + 1, CrisisLevel.HIGH)
+        
+        # 窗口之外的高风险消息按衰减后的等级继续生效
+        return max(max_level, int(self.decayed_level))
+
+
+def _build_crisis_state(history: List[str]) -> CrisisRiskState:
+    """从对话历史构建风险状态，每条消息只分析一次"""
+    state = CrisisRiskState()
+    for msg in history[-CRISIS_HISTORY_WINDOW:]:
+        state.fold(_analyze_message(msg))
+    return state
+
+
 def _analyze_conversation_history(history: List[str]) -> int:
     """分析对话历史的危机等级"""
-    max_level = CrisisLevel.NONE
-    
-    # 分析最近的几条消息
-    recent_messages = history[-5:] if len(history) > 5 else history
+    return _build_crisis_state(history).history_level()
+
+
+def _evaluate_with_conversation_state(conversation_id: str, message_level: int,
+                                      conversation_history: Optional[List[str]],
+                                      message_id: Optional[str] = None) -> int:
+    """使用对话累积状态评估危机等级，并把当前消息折叠进状态
+
+    状态只保存在对话行中，不在进程内缓存：每次在行锁内读取最新状态、折叠后写回，
+    多个worker处理同一对话时不会用旧副本覆盖升级记录。
+    对话行尚无状态时用传入的历史初始化；首轮时对话行还不存在（由后台写入器
+    在本轮回复后创建），下一轮会从历史重新构建。同一message_id重复评估时不再折叠。
+    """
+    from app.configs.database import SessionLocal
+    from app.services.conversation_service import ConversationService
     
-    for msg in recent_messages:
-        level = _analyze_message(msg)
-        max_level = max(max_level, level)
+    evaluated: Dict[str, int] = {}
     
-    # 如果历史中持续出现负面情绪，提升风险等级
-    negative_count = sum(1 for msg in recent_messages 
-                       if _analyze_message(msg) >= CrisisLevel.LOW)
+    def fold_message(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        state = CrisisRiskState.from_dict(data) if data is not None else _build_crisis_state(conversation_history or [])
+        evaluated["history_level"] = state.history_level()
+        return asdict(state) if state.fold(message_level, message_id) else None
     
-    if negative_count >= 3 and max_level < CrisisLevel.HIGH:
-        max_level = min(max_level + 1, CrisisLevel.HIGH)
+    try:
+        db = SessionLocal()
+        try:
+            stored = ConversationService(db).update_crisis_state(conversation_id, fold_message)
+        finally:
+            db.close()
+        if not stored:
+            logger.debug(f"[CrisisDetection] 对话尚未落库，本轮风险状态不保存: {conversation_id}")
+    except Exception as e:
+        logger.error(f"[CrisisDetection] 读写对话风险状态失败，改用对话历史评估: {conversation_id}, {e}")
     
-    return max_level
+    if "history_level" not in evaluated:
+        return _analyze_conversation_history(conversation_history or [])
+    return evaluated["history_level"]
 
 
 def _analyze_context(context: Dict[str, Any]) -> int:
@@ -142,16 +207,18 @@ def _analyze_context(context: Dict[str, Any]) -> int:
     return level
 
 
+# 危机等级名称
+CRISIS_LEVEL_NAMES = {
+    CrisisLevel.NONE: "无危机",
+    CrisisLevel.LOW: "低风险",
+    CrisisLevel.MEDIUM: "中等风险",
+    CrisisLevel.HIGH: "高风险",
+    CrisisLevel.CRITICAL: "极高风险"
+}
+
+
 def _generate_result(crisis_level: int, message: str, user_id: str) -> Dict[str, Any]:
     """生成检测结果"""
-    level_names = {
-        CrisisLevel.NONE: "无危机",
-        CrisisLevel.LOW: "低风险",
-        CrisisLevel.MEDIUM: "中等风险",
-        CrisisLevel.HIGH: "高风险",
-        CrisisLevel.CRITICAL: "极高风险"
-    }
-    
     # 生成建议措施
     recommendations = _get_recommendations(crisis_level)
     
@@ -163,7 +230,7 @@ def _generate_result(crisis_level: int, message: str, user_id: str) -> Dict[str,
     
     return {
         "crisis_level": crisis_level,
-        "level_name": level_names[crisis_level],
+        "level_name": CRISIS_LEVEL_NAMES[crisis_level],
         "requires_intervention": requires_intervention,
         "requires_human": requires_human,
         "recommendations": recommendations,
@@ -225,12 +292,16 @@ def _calculate_confidence(crisis_level: int, message: str) -> float:
 # 使用装饰器方式创建工具函数
 @tool(args_schema=CrisisDetectionInput)
 def detect_crisis(message: str, user_id: str, conversation_history: Optional[List[str]] = None, 
-                 context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                 context: Optional[Dict[str, Any]] = None,
+                 conversation_id: Optional[str] = None,
+                 message_id: Optional[str] = None) -> Dict[str, Any]:
     """
     检测用户消息中的心理危机信号。
     
     这个工具用于识别用户是否存在自杀、自伤等高危行为倾向，
     并根据危机等级提供相应的干预建议。
+    提供conversation_id时使用该对话累积的风险状态，不再重新分析历史消息；
+    同时提供message_id时，重试或重新生成同一条消息不会重复计入状态。
     """
     print(f"--- 执行危机检测工具，用户ID: {user_id} ---")
     
@@ -238,8 +309,13 @@ def detect_crisis(message: str, user_id: str, conversation_history: Optional[Lis
         # 基础文本分析
         crisis_level = _analyze_message(message)
         
-        # 历史对话分析（如果提供）
-        if conversation_history:
+        # 历史对话分析：优先使用对话累积的风险状态，否则分析传入的历史
+        if conversation_id:
+            history_level = _evaluate_with_conversation_state(
+                conversation_id, crisis_level, conversation_history, message_id
+            )
+            crisis_level = max(crisis_level, history_level)
+        elif conversation_history:
             history_level = _analyze_conversation_history(conversation_history)
             crisis_level = max(crisis_level, history_level)
         
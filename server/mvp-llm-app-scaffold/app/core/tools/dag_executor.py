@@ -0,0 +1,143 @@
+"""工具依赖图执行器 - 并发调度互不依赖的工具步骤"""
+
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DAGNode:
+    """依赖图中的单个步骤
+
+    Attributes:
+        name: 节点名称，同时作为结果字典的键
+        func: 异步执行函数，入参为已完成节点的结果字典
+        depends_on: 依赖的节点名称列表，全部完成后才会启动本节点
+        short_circuit: 可选判定函数，返回True时取消其余未完成节点并不再启动新节点
+        cancel_on_short_circuit: 为False时，短路发生后该节点仍会执行完毕（用于短路结果也需要的步骤）
+    """
+    name: str
+    func: Callable[[Dict[str, Any]], Awaitable[Any]]
+    depends_on: List[str] = field(default_factory=list)
+    short_circuit: Optional[Callable[[Any], bool]] = None
+    cancel_on_short_circuit: bool = True
+
+
+class DAGExecutor:
+    """基于asyncio的依赖图执行器
+
+    所有依赖已满足的节点会被同时调度，节点完成后按完成顺序产出结果。
+    某个节点触发short_circuit时，尚未启动的节点不再启动，正在运行的可取消节点会被取消。
+    """
+
+    def __init__(self, nodes: List[DAGNode]):
+        self.nodes: Dict[str, DAGNode] = {}
+        for node in nodes:
+            if node.name in self.nodes:
+                raise ValueError(f"重复的节点名称: {node.name}")
+            self.nodes[node.name] = node
+        for node in nodes:
+            missing = [dep for dep in node.depends_on if dep not in self.nodes]
+            if missing:
+                raise ValueError(f"节点 {node.name} 依赖了不存在的节点: {missing}")
+
+        self.results: Dict[str, Any] = {}
+        # 每个节点的墙钟耗时（秒）
+        self.node_timings: Dict[str, float] = {}
+        # 每个节点的最终状态: completed / cancelled / failed
+        self.node_status: Dict[str, str] = {}
+        self.short_circuited_by: Optional[str] = None
+
+    async def _run_node(self, node: DAGNode) -> Any:
+        """执行单个节点并记录耗时"""
+        start = time.perf_counter()
+        try:
+            result = await node.func(self.results)
+            self.node_status[node.name] = "completed"
+            return result
+        except asyncio.CancelledError:
+            self.node_status[node.name] = "cancelled"
+            raise
+        except Exception:
+            self.node_status[node.name] = "failed"
+            raise
+        finally:
+            self.node_timings[node.name] = round(time.perf_counter() - start, 4)
+
+    async def iterate(self) -> AsyncGenerator[Tuple[str, Any], None]:
+        """按完成顺序产出 (节点名称, 结果)"""
+        pending: Dict[asyncio.Task, str] = {}
+        started = set()
+
+        def launch_ready_nodes():
+            for name, node in self.nodes.items():
+                if name in started:
+                    continue
+                if all(dep in self.results for dep in node.depends_on):
+                    started.add(name)
+                    task = asyncio.create_task(self._run_node(node), name=f"dag:{name}")
+                    pending[task] = name
+
+        cancelled_tasks: List[asyncio.Task] = []
+
+        launch_ready_nodes()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = pending.pop(task)
+                    result = task.result()
+                    self.results[name] = result
+                    yield name, result
+
+                    node = self.nodes[name]
+                    if (self.short_circuited_by is None and node.short_circuit is not None
+                            and node.short_circuit(result)):
+                        self.short_circuited_by = name
+                        cancelled_tasks.extend(self._cancel_pending(pending))
+                if self.short_circuited_by is None:
+                    launch_ready_nodes()
+
+            unfinished = [name for name in self.nodes if name not in started]
+            if unfinished and self.short_circuited_by is None:
+                raise RuntimeError(f"依赖图存在无法满足的依赖: {unfinished}")
+        finally:
+            for task in pending:
+                task.cancel()
+            cancelled_tasks.extend(pending.keys())
+            if cancelled_tasks:
+                await asyncio.gather(*cancelled_tasks, return_exceptions=True)
+            for name in self.nodes:
+                if name not in started:
+                    self.node_status.setdefault(name, "cancelled")
+
+    def _cancel_pending(self, pending: Dict[asyncio.Task, str]) -> List[asyncio.Task]:
+        """短路时取消可取消的运行中节点，已完成的节点结果保留"""
+        cancelled = []
+        for task, name in list(pending.items()):
+            if task.done() or not self.nodes[name].cancel_on_short_circuit:
+                continue
+            task.cancel()
+            pending.pop(task)
+            self.node_status[name] = "cancelled"
+            cancelled.append(task)
+        logger.info(
+            f"[DAGExecutor] 节点 {self.short_circuited_by} 触发短路，"
+            f"取消运行中的节点: {[task.get_name() for task in cancelled]}"
+        )
+        return cancelled
+
+    async def run(self) -> Dict[str, Any]:
+        """执行整个依赖图并返回全部已完成节点的结果"""
+        async for _ in self.iterate():
+            pass
+        return self.results
+
+    @property
+    def cancelled_nodes(self) -> List[str]:
+        """被取消（含未启动）的节点列表"""
+        return [name for name, status in self.node_status.items() if status == "cancelled"]
@@ -5,6 +5,10 @@ from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
 
+# 情绪关键词库（定义在lexicons中，由共享的关键词自动机统一匹配）
+from app.core.tools.lexicons import EMOTION_KEYWORDS
+from app.core.tools.keyword_matcher import scan_keywords
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,60 +41,13 @@ class EmotionType:
     NEUTRAL = "neutral"   # 中性
 
 
-# 情绪关键词库
-EMOTION_KEYWORDS = {
-    EmotionType.JOY: [
-        "开心", "快乐", "高兴", "愉快", "兴奋", "满足", "幸福", "欣喜",
-        "happy", "joy", "glad", "pleased", "delighted", "cheerful"
-    ],
-    EmotionType.SADNESS: [
-        "难过", "悲伤", "伤心", "沮丧", "失落", "郁闷", "心情不好",
-        "sad", "sorrow", "grief", "melancholy", "down", "blue"
-    ],
-    EmotionType.ANGER: [
-        "愤怒", "生气", "恼火", "气愤", "暴躁", "愤恨", "恼怒",
-        "angry", "mad", "furious", "rage", "irritated", "annoyed"
-    ],
-    EmotionType.FEAR: [
-        "害怕", "恐惧", "担心", "忧虑", "紧张", "不安", "惊慌",
-        "afraid", "scared", "fearful", "terrified", "worried", "nervous"
-    ],
-    EmotionType.ANXIETY: [
-        "焦虑", "焦急", "不安", "紧张", "担忧", "忐忑", "心慌",
-        "anxious", "anxiety", "restless", "uneasy", "apprehensive"
-    ],
-    EmotionType.DEPRESSION: [
-        "抑郁", "绝望", "无助", "空虚", "麻木", "消沉", "低落",
-        "depressed", "hopeless", "helpless", "empty", "numb", "despair"
-    ],
-    EmotionType.STRESS: [
-        "压力", "紧张", "疲惫", "累", "疲劳", "负担", "重压",
-        "stress", "stressed", "pressure", "overwhelmed", "exhausted", "tired"
-    ],
-    EmotionType.LONELINESS: [
-        "孤独", "寂寞", "孤单", "独自", "无人理解", "被遗忘",
-        "lonely", "alone", "isolated", "solitary", "abandoned"
-    ],
-    EmotionType.HOPE: [
-        "希望", "期待", "憧憬", "向往", "乐观", "信心", "期望",
-        "hope", "hopeful", "optimistic", "confident", "expectant"
-    ],
-    EmotionType.CALM: [
-        "平静", "冷静", "安静", "宁静", "放松", "舒缓", "淡定",
-        "calm", "peaceful", "relaxed", "serene", "tranquil", "composed"
-    ]
-}
-
-
 def _analyze_emotion_keywords(message: str) -> Dict[str, float]:
     """基于关键词分析情绪"""
-    message_lower = message.lower()
-    emotion_scores = {emotion: 0.0 for emotion in EMOTION_KEYWORDS.keys()}
-    
-    for emotion, keywords in EMOTION_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword.lower() in message_lower:
-                emotion_scores[emotion] += 1.0
+    keyword_hits = scan_keywords(message)
+    emotion_scores = {
+        emotion: float(keyword_hits.count(f"emotion.{emotion}"))
+        for emotion in EMOTION_KEYWORDS.keys()
+    }
     
     # 归一化分数
     total_score = sum(emotion_scores.values())
@@ -102,7 +59,6 @@ def _analyze_emotion_keywords(message: str) -> Dict[str, float]:
 
 def _analyze_emotion_patterns(message: str) -> Dict[str, float]:
     """基于语言模式分析情绪"""
-    message_lower = message.lower()
     pattern_scores = {}
     
     # 问号模式（可能表示困惑或寻求帮助）
@@ -122,8 +78,7 @@ def _analyze_emotion_patterns(message: str) -> Dict[str, float]:
         pattern_scores['emphasis'] = min(len(repeated_chars) * 0.2, 1.0)
     
     # 否定词模式
-    negative_words = ['不', '没', '无', '非', 'not', 'no', 'never', 'nothing']
-    negative_count = sum(1 for word in negative_words if word in message_lower)
+    negative_count = scan_keywords(message).count("emotion.negation")
     if negative_count > 0:
         pattern_scores['negativity'] = min(negative_count * 0.3, 1.0)
     
@@ -0,0 +1,144 @@
+"""多模式关键词匹配 - 基于Aho-Corasick自动机的一次扫描匹配
+
+所有词库在导入时编译成一个自动机，对一段文本只需扫描一遍，
+即可得到全部词库的命中关键词及其位置。
+"""
+
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from app.core.tools.lexicons import LEXICONS
+
+
+class KeywordScanResult:
+    """一次扫描的结果，按词库名称查询命中情况"""
+
+    __slots__ = ("text", "_matches", "_hits")
+
+    def __init__(self, text: str, matches: List[Tuple[str, str, int]], lexicons: Mapping[str, List[str]]):
+        """
+        Args:
+            text: 被扫描的原始文本
+            matches: (词库名称, 关键词, 起始位置) 列表，按结束位置排序
+            lexicons: 词库定义，用于按词库原有顺序返回关键词
+        """
+        self.text = text
+        self._matches = matches
+        # 词库名称 -> {关键词: 首次出现位置}
+        hits: Dict[str, Dict[str, int]] = {}
+        for lexicon, keyword, start in matches:
+            positions = hits.setdefault(lexicon, {})
+            if keyword not in positions or start < positions[keyword]:
+                positions[keyword] = start
+        # 按词库中的定义顺序排列关键词，与原先遍历列表的结果顺序一致
+        self._hits: Dict[str, Dict[str, int]] = {
+            lexicon: {
+                keyword: found[keyword.lower()]
+                for keyword in dict.fromkeys(lexicons[lexicon])
+                if keyword.lower() in found
+            }
+            for lexicon, found in hits.items()
+        }
+
+    def has(self, lexicon: str) -> bool:
+        """词库中是否有关键词出现"""
+        return lexicon in self._hits
+
+    def count(self, lexicon: str) -> int:
+        """词库中出现的不同关键词数量"""
+        return len(self._hits.get(lexicon, ()))
+
+    def keywords(self, lexicon: str) -> List[str]:
+        """词库中出现的关键词（按词库定义顺序，不重复）"""
+        return list(self._hits.get(lexicon, ()))
+
+    def positions(self, lexicon: Optional[str] = None) -> List[Tuple[str, str, int, int]]:
+        """全部命中位置 (词库名称, 关键词, 起始位置, 结束位置)"""
+        return [
+            (name, keyword, start, start + len(keyword))
+            for name, keyword, start in self._matches
+            if lexicon is None or name == lexicon
+        ]
+
+    @property
+    def lexicons(self) -> List[str]:
+        """有命中的词库名称"""
+        return list(self._hits)
+
+
+class KeywordAutomaton:
+    """Aho-Corasick多模式匹配自动机（不区分大小写）"""
+
+    def __init__(self, lexicons: Mapping[str, Iterable[str]]):
+        self.lexicons: Dict[str, List[str]] = {name: list(keywords) for name, keywords in lexicons.items()}
+        # 状态转移表、失败指针、每个状态的输出 (词库名称, 关键词)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[Tuple[str, str], ...]] = [()]
+        self._build()
+
+    def _build(self) -> None:
+        outputs: List[List[Tuple[str, str]]] = [[]]
+        for lexicon, keywords in self.lexicons.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if not keyword:
+                    continue
+                state = 0
+                for char in keyword:
+                    next_state = self._goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto[state][char] = next_state
+                        self._goto.append({})
+                        self._fail.append(0)
+                        outputs.append([])
+                    state = next_state
+                if (lexicon, keyword) not in outputs[state]:
+                    outputs[state].append((lexicon, keyword))
+
+        # 广度优先计算失败指针，并把失败链上的输出合并到当前状态
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                outputs[next_state].extend(
+                    item for item in outputs[self._fail[next_state]] if item not in outputs[next_state]
+                )
+
+        self._output = [tuple(items) for items in outputs]
+
+    def scan(self, text: str) -> KeywordScanResult:
+        """扫描文本一次，返回所有词库的命中结果"""
+        goto, fail, output = self._goto, self._fail, self._output
+        matches: List[Tuple[str, str, int]] = []
+        state = 0
+        for index, char in enumerate(text.lower()):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                for lexicon, keyword in output[state]:
+                    matches.append((lexicon, keyword, index - len(keyword) + 1))
+        return KeywordScanResult(text, matches, self.lexicons)
+
+
+# 导入时编译全部词库
+KEYWORD_AUTOMATON = KeywordAutomaton(LEXICONS)
+
+
+@lru_cache(maxsize=1024)
+def scan_keywords(text: str) -> KeywordScanResult:
+    """扫描文本中所有词库的关键词
+
+    同一条消息会被意图分析、安全检查、情绪标签等多个检测器使用，
+    结果按文本缓存，一条消息只扫描一次。
+    """
+    return KEYWORD_AUTOMATON.scan(text or "")
@@ -1,10 +1,17 @@
 """知识检索工具 - 从向量数据库检索相关心理健康知识"""
 
 import logging
-from typing import Dict, Any, List, Optional
+import math
+import re
+from typing import Dict, Any, List, Optional, Tuple
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
 
+from app.configs.settings import config
+from app.core.category_index import get_category_index
+from app.core.tools.keyword_matcher import scan_keywords
+from app.core.vector_store import get_vector_store, get_embedding_model_cached
+
 logger = logging.getLogger(__name__)
 
 
@@ -15,7 +22,7 @@ class KnowledgeRetrievalInput(BaseModel):
     emotion_context: Optional[Dict[str, Any]] = Field(default=None, description="情绪上下文")
     conversation_context: Optional[List[Dict[str, str]]] = Field(default=None, description="对话上下文")
     max_results: int = Field(default=5, description="最大返回结果数")
-    similarity_threshold: float = Field(default=0.7, description="相似度阈值")
+    similarity_threshold: float = Field(default=0.5, description="相似度阈值（余弦相似度，含分类加分）")
 
 
 class KnowledgeCategory:
@@ -46,39 +53,24 @@ EMOTION_TO_KNOWLEDGE_MAP = {
 }
 
 
-# 查询增强关键词
-QUERY_ENHANCEMENT_KEYWORDS = {
-    KnowledgeCategory.ANXIETY_HELP: ["焦虑", "担心", "紧张", "不安", "恐慌", "anxiety", "worry", "nervous"],
-    KnowledgeCategory.DEPRESSION_SUPPORT: ["抑郁", "沮丧", "绝望", "无助", "低落", "depression", "hopeless", "sad"],
-    KnowledgeCategory.STRESS_MANAGEMENT: ["压力", "紧张", "疲劳", "负担", "overwhelmed", "stress", "pressure"],
-    KnowledgeCategory.EMOTIONAL_REGULATION: ["情绪", "感受", "调节", "控制", "管理", "emotion", "feeling", "regulation"],
-    KnowledgeCategory.COPING_STRATEGIES: ["应对", "处理", "解决", "策略", "方法", "coping", "strategy", "handle"],
-    KnowledgeCategory.MINDFULNESS: ["正念", "冥想", "专注", "当下", "觉察", "mindfulness", "meditation", "awareness"],
-    KnowledgeCategory.SELF_CARE: ["自我关怀", "照顾自己", "休息", "放松", "self-care", "wellness", "relax"]
+# 意图到知识分类的映射（未列出的意图不按分类过滤）
+INTENT_TO_KNOWLEDGE_MAP = {
+    "crisis": [KnowledgeCategory.CRISIS_INTERVENTION, KnowledgeCategory.PROFESSIONAL_HELP, KnowledgeCategory.COPING_STRATEGIES],
 }
 
 
-def _enhance_query_with_emotion(query: str, emotion_context: Optional[Dict[str, Any]]) -> str:
-    """基于情绪上下文增强查询"""
+def _enhance_query_with_emotion(emotion_context: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """基于情绪上下文确定相关知识分类及其加分（越相关的分类加分越多）"""
     if not emotion_context:
-        return query
+        return {}
     
     dominant_emotion = emotion_context.get("dominant_emotion", "")
-    
-    # 根据主导情绪添加相关关键词
-    if dominant_emotion in EMOTION_TO_KNOWLEDGE_MAP:
-        relevant_categories = EMOTION_TO_KNOWLEDGE_MAP[dominant_emotion]
-        enhancement_keywords = []
-        
-        for category in relevant_categories[:2]:  # 只取前两个最相关的分类
-            if category in QUERY_ENHANCEMENT_KEYWORDS:
-                enhancement_keywords.extend(QUERY_ENHANCEMENT_KEYWORDS[category][:3])
-        
-        if enhancement_keywords:
-            enhanced_query = f"{query} {' '.join(enhancement_keywords[:5])}"
-            return enhanced_query
-    
-    return query
+    boosts = config.retrieval_filter.category_boosts
+    relevant_categories = EMOTION_TO_KNOWLEDGE_MAP.get(dominant_emotion, [])
+    return {
+        category: boosts[min(i, len(boosts) - 1)] if boosts else 0.0
+        for i, category in enumerate(relevant_categories)
+    }
 
 
 def _extract_conversation_keywords(conversation_context: Optional[List[Dict[str, str]]]) -> List[str]:
@@ -94,114 +86,98 @@ def _extract_conversation_keywords(conversation_context: Optional[List[Dict[str,
         content = message.get("content", "")
         
         # 简单的关键词提取（实际应用中可以使用更复杂的NLP技术）
-        important_words = [
-            "工作", "家庭", "朋友", "学习", "健康", "睡眠", "关系", "未来",
-            "压力", "焦虑", "抑郁", "愤怒", "悲伤", "孤独", "恐惧",
-            "work", "family", "friend", "study", "health", "sleep", "relationship"
-        ]
-        
-        for word in important_words:
-            if word in content and word not in keywords:
+        for word in scan_keywords(content).keywords("conversation.topic"):
+            if word not in keywords:
                 keywords.append(word)
     
     return keywords[:10]  # 限制关键词数量
 
 
-def _simulate_vector_search(enhanced_query: str, max_results: int, similarity_threshold: float) -> List[Dict[str, Any]]:
-    """模拟向量数据库搜索（实际应用中应该连接真实的向量数据库）"""
+def _distance_to_similarity(distance: float, space: str) -> float:
+    """把Chroma返回的距离换算为余弦相似度（嵌入向量已归一化）"""
+    # cosine距离为 1 - cos，ip距离为 1 - 内积，对单位向量二者相同
+    if space in ("cosine", "ip"):
+        return 1.0 - distance
+    # l2为平方欧氏距离：对单位向量有 d = 2 - 2cos
+    return 1.0 - distance / 2
+
+
+def _parse_tags(metadata: Dict[str, Any]) -> List[str]:
+    tags = metadata.get("tags") or metadata.get("tag") or []
+    if isinstance(tags, str):
+        tags = [tag for tag in re.split(r"[,，、;\s]+", tags) if tag]
+    return list(tags)
+
+
+def _query_collection(collection, query_embedding: List[float], n_results: int, where: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    result = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=n_results,
+        where=where,
+        include=["documents", "metadatas", "distances"]
+    )
+    hits = []
+    for doc_id, content, metadata, distance in zip(
+        result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+    ):
+        metadata = metadata or {}
+        hits.append({
+            "id": doc_id,
+            "title": metadata.get("title") or content[:20],
+            "content": content,
+            "category": metadata.get(config.retrieval_filter.category_field) or KnowledgeCategory.GENERAL_WELLNESS,
+            "tags": _parse_tags(metadata),
+            "similarity_score": _distance_to_similarity(distance, space)
+        })
+    return hits
+
+
+def _search_knowledge_base(
+    search_text: str,
+    category_boosts: Dict[str, float],
+    max_results: int,
+    similarity_threshold: float
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    在Chroma知识库中检索。
     
-    # 模拟知识库数据
-    mock_knowledge_base = [
-        {
-            "id": "kb_001",
-            "title": "焦虑情绪的应对策略",
-            "content": "当感到焦虑时，可以尝试深呼吸练习、渐进性肌肉放松、正念冥想等技巧。重要的是要接受焦虑是正常的情绪反应。",
-            "category": KnowledgeCategory.ANXIETY_HELP,
-            "tags": ["焦虑", "应对", "放松", "正念"],
-            "similarity_score": 0.85
-        },
-        {
-            "id": "kb_002",
-            "title": "压力管理的有效方法",
-            "content": "有效的压力管理包括：时间管理、设定优先级、适当休息、运动锻炼、寻求社会支持等。",
-            "category": KnowledgeCategory.STRESS_MANAGEMENT,
-            "tags": ["压力", "管理", "时间", "运动"],
-            "similarity_score": 0.82
-        },
-        {
-            "id": "kb_003",
-            "title": "情绪调节技巧",
-            "content": "情绪调节的关键是认识和接受自己的情绪，然后选择合适的应对方式。可以尝试情绪标记、重新评估、分散注意力等技巧。",
-            "category": KnowledgeCategory.EMOTIONAL_REGULATION,
-            "tags": ["情绪", "调节", "认识", "接受"],
-            "similarity_score": 0.78
-        },
-        {
-            "id": "kb_004",
-            "title": "抑郁情绪的自我关怀",
-            "content": "面对抑郁情绪时，自我关怀非常重要。包括保持规律作息、适度运动、营养均衡、寻求专业帮助等。",
-            "category": KnowledgeCategory.DEPRESSION_SUPPORT,
-            "tags": ["抑郁", "自我关怀", "作息", "专业帮助"],
-            "similarity_score": 0.75
-        },
-        {
-            "id": "kb_005",
-            "title": "正念冥想入门指南",
-            "content": "正念冥想是一种专注于当下的练习。从简单的呼吸觉察开始，每天5-10分钟，逐渐增加练习时间。",
-            "category": KnowledgeCategory.MINDFULNESS,
-            "tags": ["正念", "冥想", "呼吸", "专注"],
-            "similarity_score": 0.72
-        },
-        {
-            "id": "kb_006",
-            "title": "建立健康的人际关系",
-            "content": "健康的人际关系需要相互尊重、有效沟通、设定边界。学会表达自己的需求，同时也要倾听他人。",
-            "category": KnowledgeCategory.RELATIONSHIP_ADVICE,
-            "tags": ["人际关系", "沟通", "边界", "尊重"],
-            "similarity_score": 0.70
-        },
-        {
-            "id": "kb_007",
-            "title": "何时寻求专业心理帮助",
-            "content": "当情绪问题持续影响日常生活、工作或人际关系时，建议寻求专业心理咨询师或心理医生的帮助。",
-            "category": KnowledgeCategory.PROFESSIONAL_HELP,
-            "tags": ["专业帮助", "心理咨询", "心理医生"],
-            "similarity_score": 0.68
-        }
-    ]
+    先用分类质心索引在O(分类数)内选出与查询最接近的分类，与情绪映射的分类一起作为
+    where过滤条件缩小ANN检索范围；结果稀疏时补充不过滤的检索结果。
+    情绪映射的分类在相似度上加分后再按阈值过滤。
     
-    # 基于查询内容和相似度阈值过滤结果
-    query_lower = enhanced_query.lower()
-    filtered_results = []
+    Returns:
+        Tuple[List[Dict[str, Any]], List[str]]: (检索结果, 参与过滤的分类)
+    """
+    filter_config = config.retrieval_filter
+    collection = get_vector_store()._collection
+    query_embedding = get_embedding_model_cached().embed_query(search_text)
     
-    for item in mock_knowledge_base:
-        # 简单的相似度计算（实际应用中使用向量相似度）
-        content_lower = item["content"].lower()
-        title_lower = item["title"].lower()
-        
-        # 检查查询词是否在标题或内容中
-        relevance_score = 0.0
-        query_words = query_lower.split()
-        
-        for word in query_words:
-            if word in title_lower:
-                relevance_score += 0.3
-            if word in content_lower:
-                relevance_score += 0.2
-            if any(word in tag.lower() for tag in item["tags"]):
-                relevance_score += 0.1
-        
-        # 调整相似度分数
-        adjusted_score = min(item["similarity_score"] + relevance_score * 0.1, 1.0)
-        
-        if adjusted_score >= similarity_threshold:
-            item_copy = item.copy()
-            item_copy["similarity_score"] = adjusted_score
-            filtered_results.append(item_copy)
+    categories = list(category_boosts)
+    category_index = get_category_index()
+    if category_index is not None:
+        for category, _ in category_index.select(
+            query_embedding, top_n=filter_config.centroid_top_n, min_similarity=filter_config.centroid_min_similarity
+        ):
+            if category not in categories:
+                categories.append(category)
+    
+    n_results = max_results * 2
+    where = {filter_config.category_field: {"$in": categories}} if categories else None
+    hits = _query_collection(collection, query_embedding, n_results, where)
+    if where is not None and len(hits) < max(1, math.ceil(max_results * filter_config.min_results_ratio)):
+        seen = {hit["id"] for hit in hits}
+        hits.extend(hit for hit in _query_collection(collection, query_embedding, n_results, None) if hit["id"] not in seen)
+    
+    results = []
+    for hit in hits:
+        hit["similarity_score"] = min(hit["similarity_score"] + category_boosts.get(hit["category"], 0.0), 1.0)
+        if hit["similarity_score"] >= similarity_threshold:
+            results.append(hit)
     
     # 按相似度排序并返回指定数量的结果
-    filtered_results.sort(key=lambda x: x["similarity_score"], reverse=True)
-    return filtered_results[:max_results]
+    results.sort(key=lambda x: x["similarity_score"], reverse=True)
+    return results[:max_results], categories
 
 
 def _format_knowledge_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -280,7 +256,7 @@ def retrieve_knowledge(
     emotion_context: Optional[Dict[str, Any]] = None,
     conversation_context: Optional[List[Dict[str, str]]] = None,
     max_results: int = 5,
-    similarity_threshold: float = 0.7
+    similarity_threshold: float = 0.5
 ) -> Dict[str, Any]:
     """
     从知识库中检索相关的心理健康知识。
@@ -291,18 +267,21 @@ def retrieve_knowledge(
     print(f"--- 执行知识检索工具，用户ID: {user_id} ---")
     
     try:
-        # 基于情绪上下文增强查询
-        enhanced_query = _enhance_query_with_emotion(query, emotion_context)
+        # 基于情绪上下文确定相关分类，作为检索过滤条件和相似度加分
+        category_boosts = _enhance_query_with_emotion(emotion_context)
         
         # 从对话上下文提取关键词
+        enhanced_query = query
         conversation_keywords = _extract_conversation_keywords(conversation_context)
         if conversation_keywords:
             enhanced_query += f" {' '.join(conversation_keywords[:3])}"
         
         print(f"增强后的查询: {enhanced_query}")
         
-        # 执行向量搜索（这里使用模拟数据）
-        search_results = _simulate_vector_search(enhanced_query, max_results, similarity_threshold)
+        # 在向量数据库中按分类过滤检索
+        search_results, selected_categories = _search_knowledge_base(
+            enhanced_query, category_boosts, max_results, similarity_threshold
+        )
         
         # 格式化结果
         formatted_results = _format_knowledge_results(search_results)
@@ -315,7 +294,8 @@ def retrieve_knowledge(
             "total_found": len(formatted_results),
             "avg_relevance": round(sum(r["relevance_score"] for r in formatted_results) / len(formatted_results), 2) if formatted_results else 0.0,
             "categories_covered": len(set(r["category"] for r in formatted_results)),
-            "query_enhancement_applied": enhanced_query != query
+            "query_enhancement_applied": enhanced_query != query or bool(category_boosts),
+            "categories_selected": selected_categories
         }
         
         result = {
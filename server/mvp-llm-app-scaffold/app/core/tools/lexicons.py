@@ -0,0 +1,127 @@
+"""关键词词库 - 所有基于关键词的检测器共用的词表
+
+词表统一在这里定义，由 keyword_matcher 在导入时编译成一个多模式匹配自动机。
+各检测器通过 LEXICONS 中的词库名称读取扫描结果，不再各自遍历关键词列表。
+"""
+
+from typing import Dict, List
+
+# ==================== 意图分析 ====================
+INTENT_CRISIS_KEYWORDS = ["想死", "自杀", "结束生命", "不想活", "死了算了", "自残", "自伤"]
+INTENT_CONSULTATION_KEYWORDS = ["焦虑", "抑郁", "压力", "困扰", "帮助", "难过", "痛苦"]
+INTENT_KNOWLEDGE_KEYWORDS = ["什么是", "如何", "为什么", "解释", "了解", "我是谁", "我是", "关于我", "个人信息", "我的", "介绍一下", "告诉我"]
+
+# ==================== 安全检查 ====================
+SAFETY_HIGH_RISK_KEYWORDS = ["自杀", "想死", "结束生命", "不想活", "死了算了", "自残", "自伤", "割腕", "跳楼"]
+SAFETY_MEDIUM_RISK_KEYWORDS = ["绝望", "无助", "没有意义", "活着没意思", "痛苦", "折磨"]
+
+# ==================== 回复情绪标签 ====================
+ANSWER_EMOTION_KEYWORDS = {
+    "anxious": ["焦虑", "担心", "紧张", "不安", "恐惧"],
+    "sad": ["难过", "伤心", "沮丧", "失落", "痛苦", "绝望"],
+    "angry": ["愤怒", "生气", "恼火", "烦躁", "愤恨"],
+    "confused": ["困惑", "迷茫", "不知道", "不明白", "疑惑"],
+    "hopeful": ["希望", "期待", "乐观", "积极", "向上"]
+}
+
+# ==================== 危机检测 ====================
+CRITICAL_KEYWORDS = [
+    "自杀", "想死", "不想活", "结束生命", "了结自己", "自我了断",
+    "跳楼", "上吊", "割腕", "服毒", "安眠药", "煤气",
+    "死了算了", "活着没意思", "解脱", "一了百了",
+    "suicide", "kill myself", "end my life", "want to die"
+]
+
+HIGH_RISK_KEYWORDS = [
+    "绝望", "无助", "痛苦", "折磨", "煎熬", "崩溃",
+    "看不到希望", "没有未来", "活着痛苦", "生不如死",
+    "自残", "自伤", "伤害自己", "惩罚自己",
+    "hopeless", "helpless", "can't go on", "no point"
+]
+
+MEDIUM_RISK_KEYWORDS = [
+    "抑郁", "沮丧", "难过", "悲伤", "孤独", "空虚",
+    "失眠", "噩梦", "焦虑", "恐慌", "害怕",
+    "没有价值", "没用", "失败者", "废物",
+    "depression", "sad", "lonely", "anxious", "worthless"
+]
+
+LOW_RISK_KEYWORDS = [
+    "烦躁", "郁闷", "不开心", "心情不好", "压力大",
+    "疲惫", "累", "困扰", "担心", "紧张",
+    "upset", "tired", "stressed", "worried", "nervous"
+]
+
+# ==================== 情绪分析 ====================
+EMOTION_KEYWORDS = {
+    "joy": [
+        "开心", "快乐", "高兴", "愉快", "兴奋", "满足", "幸福", "欣喜",
+        "happy", "joy", "glad", "pleased", "delighted", "cheerful"
+    ],
+    "sadness": [
+        "难过", "悲伤", "伤心", "沮丧", "失落", "郁闷", "心情不好",
+        "sad", "sorrow", "grief", "melancholy", "down", "blue"
+    ],
+    "anger": [
+        "愤怒", "生气", "恼火", "气愤", "暴躁", "愤恨", "恼怒",
+        "angry", "mad", "furious", "rage", "irritated", "annoyed"
+    ],
+    "fear": [
+        "害怕", "恐惧", "担心", "忧虑", "紧张", "不安", "惊慌",
+        "afraid", "scared", "fearful", "terrified", "worried", "nervous"
+    ],
+    "anxiety": [
+        "焦虑", "焦急", "不安", "紧张", "担忧", "忐忑", "心慌",
+        "anxious", "anxiety", "restless", "uneasy", "apprehensive"
+    ],
+    "depression": [
+        "抑郁", "绝望", "无助", "空虚", "麻木", "消沉", "低落",
+        "depressed", "hopeless", "helpless", "empty", "numb", "despair"
+    ],
+    "stress": [
+        "压力", "紧张", "疲惫", "累", "疲劳", "负担", "重压",
+        "stress", "stressed", "pressure", "overwhelmed", "exhausted", "tired"
+    ],
+    "loneliness": [
+        "孤独", "寂寞", "孤单", "独自", "无人理解", "被遗忘",
+        "lonely", "alone", "isolated", "solitary", "abandoned"
+    ],
+    "hope": [
+        "希望", "期待", "憧憬", "向往", "乐观", "信心", "期望",
+        "hope", "hopeful", "optimistic", "confident", "expectant"
+    ],
+    "calm": [
+        "平静", "冷静", "安静", "宁静", "放松", "舒缓", "淡定",
+        "calm", "peaceful", "relaxed", "serene", "tranquil", "composed"
+    ]
+}
+
+# 否定词
+NEGATIVE_WORDS = ['不', '没', '无', '非', 'not', 'no', 'never', 'nothing']
+
+# ==================== 知识检索 ====================
+# 对话上下文中的话题关键词
+CONVERSATION_TOPIC_KEYWORDS = [
+    "工作", "家庭", "朋友", "学习", "健康", "睡眠", "关系", "未来",
+    "压力", "焦虑", "抑郁", "愤怒", "悲伤", "孤独", "恐惧",
+    "work", "family", "friend", "study", "health", "sleep", "relationship"
+]
+
+
+# ==================== 词库注册表 ====================
+# 词库名称 -> 关键词列表，匹配时统一转为小写
+LEXICONS: Dict[str, List[str]] = {
+    "intent.crisis": INTENT_CRISIS_KEYWORDS,
+    "intent.consultation": INTENT_CONSULTATION_KEYWORDS,
+    "intent.knowledge": INTENT_KNOWLEDGE_KEYWORDS,
+    "safety.high": SAFETY_HIGH_RISK_KEYWORDS,
+    "safety.medium": SAFETY_MEDIUM_RISK_KEYWORDS,
+    **{f"answer_emotion.{name}": keywords for name, keywords in ANSWER_EMOTION_KEYWORDS.items()},
+    "crisis.critical": CRITICAL_KEYWORDS,
+    "crisis.high": HIGH_RISK_KEYWORDS,
+    "crisis.medium": MEDIUM_RISK_KEYWORDS,
+    "crisis.low": LOW_RISK_KEYWORDS,
+    **{f"emotion.{name}": keywords for name, keywords in EMOTION_KEYWORDS.items()},
+    "emotion.negation": NEGATIVE_WORDS,
+    "conversation.topic": CONVERSATION_TOPIC_KEYWORDS,
+}
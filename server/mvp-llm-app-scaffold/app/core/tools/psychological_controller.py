@@ -10,8 +10,15 @@ from app.core.tools.psychological_tools import (
     check_safety,
     retrieve_documents,
     rerank_documents,
-    generate_answer
+    generate_answer,
+    stream_answer,
+    get_retrieval_k,
+    SPECULATIVE_RETRIEVAL_K
 )
+from app.core.tools.crisis_detection_tool import detect_crisis
+from app.core.tools.dag_executor import DAGExecutor, DAGNode
+from app.core.hybrid_search import fuse_documents
+from app.configs.settings import config
 
 logger = logging.getLogger(__name__)
 
@@ -27,34 +34,29 @@ class PsychologicalChatController:
         self, 
         user_input: str, 
         chat_history: Optional[List[Dict[str, Any]]] = None,
-        timeout: int = 30
+        timeout: int = 30,
+        crisis_scope: Optional[Dict[str, str]] = None
     ) -> Dict[str, Any]:
-        """处理用户消息的主要方法"""
+        """处理用户消息的主要方法
+        
+        crisis_scope包含conversation_id、user_id和message_id时，同时用对话累积的风险状态做危机检测。
+        """
         start_time = datetime.now()
         chat_history = chat_history or []
         
         try:
             logger.info(f"[PsychologicalChatController] 开始处理消息: {user_input[:100]}...")
             
-            # 步骤1: 意图分析
-            logger.info("[PsychologicalChatController] 步骤1: 执行意图分析")
-            intent_result = await asyncio.wait_for(
-                asyncio.to_thread(analyze_intent, {"args": {"user_input": user_input, "chat_history": chat_history}}),
-                timeout=timeout
-            )
+            # 意图分析、安全检查与文档预检索互不依赖，并发执行；安全检查触发时取消其余步骤
+            executor = DAGExecutor(self._build_graph(user_input, chat_history, timeout, include_answer=True, crisis_scope=crisis_scope))
+            results = await executor.run()
             
+            intent_result = results["intent"]
+            safety_result = results["safety"]
             intent = intent_result.get('intent', 'consultation')
             confidence = intent_result.get('confidence', 0.5)
-            
-            # 步骤2: 安全检查
-            logger.info("[PsychologicalChatController] 步骤2: 执行安全检查")
-            safety_result = await asyncio.wait_for(
-                asyncio.to_thread(check_safety, {"args": {"user_input": user_input, "chat_history": chat_history}}),
-                timeout=timeout
-            )
-            
             risk_level = safety_result.get('risk_level', 'none')
-            safety_triggered = risk_level in ['high', 'medium'] or safety_result.get('immediate_action_required', False)
+            safety_triggered = self._is_safety_triggered(safety_result)
             
             # 如果触发安全机制，直接返回安全回复
             if safety_triggered:
@@ -70,48 +72,19 @@ class PsychologicalChatController:
                     "safety_triggered": True,
                     "documents_count": 0,
                     "execution_time": execution_time,
+                    "crisis_assessment": results.get("crisis"),
                     "metadata": {
                         "intent_analysis": intent_result,
                         "safety_check": safety_result,
-                        "workflow_path": "intent -> safety -> end"
+                        "workflow_path": "intent -> safety -> end",
+                        **self._get_execution_metadata(executor)
                     }
                 }
             
-            # 步骤3: 文档检索（默认开启知识库检索增强）
-            documents = []
-            logger.info("[PsychologicalChatController] 步骤3: 执行文档检索（默认开启）")
-            retrieval_result = await asyncio.wait_for(
-                asyncio.to_thread(retrieve_documents, {"args": {"user_input": user_input, "intent": intent, "chat_history": chat_history}}),
-                timeout=timeout
-            )
-            documents = retrieval_result.get('retrieved_documents', [])
-            
-            # 步骤4: 文档重排序（如果有文档）
-            if documents:
-                logger.info(f"[PsychologicalChatController] 步骤4: 执行文档重排序，文档数量: {len(documents)}")
-                rerank_result = await asyncio.wait_for(
-                    asyncio.to_thread(rerank_documents, {"args": {"user_input": user_input, "documents": documents}}),
-                    timeout=timeout
-                )
-                documents = rerank_result.get('reranked_documents', documents)
-            
-            # 步骤5: 生成最终回复
-            logger.info("[PsychologicalChatController] 步骤5: 生成最终回复")
-            answer_result = await asyncio.wait_for(
-                asyncio.to_thread(
-                    generate_answer,
-                    {
-                        "args": {
-                            "user_input": user_input,
-                            "intent": intent,
-                            "documents": documents,
-                            "chat_history": chat_history,
-                            "safety_triggered": safety_triggered
-                        }
-                    }
-                ),
-                timeout=timeout
-            )
+            retrieval_result = results["retrieval"]
+            rerank_result = results["rerank"]
+            documents = rerank_result["documents"]
+            answer_result = results["answer"]
             
             execution_time = (datetime.now() - start_time).total_seconds()
             
@@ -125,13 +98,15 @@ class PsychologicalChatController:
                 "safety_triggered": safety_triggered,
                 "documents_count": len(documents),
                 "execution_time": execution_time,
+                "crisis_assessment": results.get("crisis"),
                 "metadata": {
                     "intent_analysis": intent_result,
                     "safety_check": safety_result,
-                    "document_retrieval": retrieval_result if 'retrieval_result' in locals() else None,
-                    "document_rerank": rerank_result if 'rerank_result' in locals() else None,
+                    "document_retrieval": {k: v for k, v in retrieval_result.items() if k != "query_embedding"},
+                    "document_rerank": rerank_result["rerank_result"],
                     "answer_generation": answer_result,
-                    "workflow_path": self._get_workflow_path(intent, len(documents), safety_triggered)
+                    "workflow_path": self._get_workflow_path(intent, len(documents), safety_triggered),
+                    **self._get_execution_metadata(executor)
                 }
             }
             
@@ -152,9 +127,15 @@ class PsychologicalChatController:
         self, 
         user_input: str, 
         chat_history: Optional[List[Dict[str, Any]]] = None,
-        timeout: int = 30
+        timeout: int = 30,
+        crisis_scope: Optional[Dict[str, str]] = None
     ) -> AsyncGenerator[Dict[str, Any], None]:
-        """流式处理用户消息"""
+        """流式处理用户消息
+        
+        依次产出 start / progress 事件、答案生成阶段的 token 事件（LLM真实的增量输出），
+        最后产出 final_response 事件（包含完整回复和分析结果）。
+        crisis_scope 的含义与 process_message 相同。
+        """
         start_time = datetime.now()
         chat_history = chat_history or []
         
@@ -168,49 +149,26 @@ class PsychologicalChatController:
                 "timestamp": start_time.isoformat()
             }
             
-            # 步骤1: 意图分析
-            yield {
-                "type": "progress",
-                "step": "intent_analysis",
-                "message": "正在分析您的意图..."
-            }
-            
-            intent_result = await asyncio.wait_for(
-                asyncio.to_thread(analyze_intent, {"args": {"user_input": user_input, "chat_history": chat_history}}),
-                timeout=timeout
-            )
-            
-            intent = intent_result.get('intent', 'consultation')
-            confidence = intent_result.get('confidence', 0.5)
-            
-            yield {
-                "type": "progress",
-                "step": "intent_analysis_complete",
-                "message": f"意图分析完成: {intent} (置信度: {confidence:.2f})",
-                "data": {"intent": intent, "confidence": confidence}
-            }
-            
-            # 步骤2: 安全检查
-            yield {
-                "type": "progress",
-                "step": "safety_check",
-                "message": "正在进行安全检查..."
-            }
-            
-            safety_result = await asyncio.wait_for(
-                asyncio.to_thread(check_safety, {"args": {"user_input": user_input, "chat_history": chat_history}}),
-                timeout=timeout
-            )
-            
+            # 意图分析、安全检查与文档预检索并发执行，按完成顺序推送进度
+            for step, message in (
+                ("intent_analysis", "正在分析您的意图..."),
+                ("safety_check", "正在进行安全检查..."),
+                ("document_retrieval", "正在检索相关文档...")
+            ):
+                yield {"type": "progress", "step": step, "message": message}
+            
+            executor = DAGExecutor(self._build_graph(user_input, chat_history, timeout, include_answer=False, crisis_scope=crisis_scope))
+            async for node_name, node_result in executor.iterate():
+                progress = self._get_progress_event(node_name, node_result)
+                if progress:
+                    yield progress
+            results = executor.results
+            
+            intent = results["intent"].get('intent', 'consultation')
+            confidence = results["intent"].get('confidence', 0.5)
+            safety_result = results["safety"]
             risk_level = safety_result.get('risk_level', 'none')
-            safety_triggered = risk_level in ['high', 'medium'] or safety_result.get('immediate_action_required', False)
-            
-            yield {
-                "type": "progress",
-                "step": "safety_check_complete",
-                "message": f"安全检查完成: 风险等级={risk_level}",
-                "data": {"risk_level": risk_level, "safety_triggered": safety_triggered}
-            }
+            safety_triggered = self._is_safety_triggered(safety_result)
             
             # 如果触发安全机制，直接返回安全回复
             if safety_triggered:
@@ -226,73 +184,43 @@ class PsychologicalChatController:
                     "crisis_level": risk_level,
                     "safety_triggered": True,
                     "documents_count": 0,
-                    "execution_time": execution_time
+                    "execution_time": execution_time,
+                    "crisis_assessment": results.get("crisis"),
+                    **self._get_execution_metadata(executor)
                 }
                 return
             
-            # 步骤3: 文档检索（默认开启知识库检索增强）
-            documents = []
-            yield {
-                "type": "progress",
-                "step": "document_retrieval",
-                "message": "正在检索相关文档..."
-            }
-            
-            retrieval_result = await asyncio.wait_for(
-                asyncio.to_thread(retrieve_documents, {"args": {"user_input": user_input, "intent": intent, "chat_history": chat_history}}),
-                timeout=timeout
-            )
-            documents = retrieval_result.get('retrieved_documents', [])
+            documents = results["rerank"]["documents"]
             
-            yield {
-                "type": "progress",
-                "step": "document_retrieval_complete",
-                "message": f"文档检索完成: 找到{len(documents)}个相关文档",
-                "data": {"documents_count": len(documents)}
-            }
-            
-            # 步骤4: 文档重排序（如果有文档）
-            if documents:
-                yield {
-                    "type": "progress",
-                    "step": "document_rerank",
-                    "message": "正在优化文档相关性..."
-                }
-                
-                rerank_result = await asyncio.wait_for(
-                    asyncio.to_thread(rerank_documents, {"args": {"user_input": user_input, "documents": documents}}),
-                    timeout=timeout
-                )
-                documents = rerank_result.get('reranked_documents', documents)
-                
-                yield {
-                    "type": "progress",
-                    "step": "document_rerank_complete",
-                    "message": "文档优化完成"
-                }
-            
-            # 步骤5: 生成最终回复
+            # 生成最终回复
             yield {
                 "type": "progress",
                 "step": "answer_generation",
                 "message": "正在生成回复..."
             }
             
-            answer_result = await asyncio.wait_for(
-                asyncio.to_thread(
-                    generate_answer,
-                    {
-                        "args": {
-                            "user_input": user_input,
-                            "intent": intent,
-                            "documents": documents,
-                            "chat_history": chat_history,
-                            "safety_triggered": safety_triggered
-                        }
-                    }
-                ),
-                timeout=timeout
-            )
+            # 逐个转发LLM的token增量；timeout作为相邻两个token之间的最长等待时间
+            answer_result: Dict[str, Any] = {}
+            answer_stream = stream_answer({
+                "user_input": user_input,
+                "intent": intent,
+                "documents": documents,
+                "chat_history": chat_history,
+                "safety_triggered": safety_triggered,
+                "query_embedding": results["retrieval"].get("query_embedding")
+            })
+            try:
+                while True:
+                    try:
+                        event = await asyncio.wait_for(answer_stream.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        break
+                    if event["type"] == "token":
+                        yield event
+                    elif event["type"] == "answer_complete":
+                        answer_result = event
+            finally:
+                await answer_stream.aclose()
             
             execution_time = (datetime.now() - start_time).total_seconds()
             
@@ -306,7 +234,10 @@ class PsychologicalChatController:
                 "crisis_level": risk_level,
                 "safety_triggered": safety_triggered,
                 "documents_count": len(documents),
-                "execution_time": execution_time
+                "execution_time": execution_time,
+                "cache_hit": answer_result.get("cache_hit", False),
+                "crisis_assessment": results.get("crisis"),
+                **self._get_execution_metadata(executor)
             }
             
             logger.info(f"[PsychologicalChatController] 流式处理完成，耗时: {execution_time:.2f}秒")
@@ -321,6 +252,135 @@ class PsychologicalChatController:
             logger.error(f"[PsychologicalChatController] 流式处理错误堆栈: {traceback.format_exc()}")
             raise  # Remove friendly response, raise exception
     
+    def _build_graph(
+        self,
+        user_input: str,
+        chat_history: List[Dict[str, Any]],
+        timeout: int,
+        include_answer: bool,
+        crisis_scope: Optional[Dict[str, str]] = None
+    ) -> List[DAGNode]:
+        """构建工具依赖图
+        
+        intent / safety / retrieval 只依赖用户输入和对话历史，可以并发执行。
+        提供crisis_scope时增加crisis节点，用对话累积的风险状态做危机检测，安全检查短路时也会执行完毕。
+        检索在意图确定前以最大k值预检索，意图确定后在rerank节点中按该意图的混合检索权重
+        重新融合，并截断到该意图对应的数量。
+        """
+        base_args = {"user_input": user_input, "chat_history": chat_history}
+        
+        async def run_tool(tool_func, args: Dict[str, Any]) -> Dict[str, Any]:
+            return await asyncio.wait_for(asyncio.to_thread(tool_func, {"args": args}), timeout=timeout)
+        
+        async def intent_node(results: Dict[str, Any]) -> Dict[str, Any]:
+            return await run_tool(analyze_intent, base_args)
+        
+        async def safety_node(results: Dict[str, Any]) -> Dict[str, Any]:
+            return await run_tool(check_safety, base_args)
+        
+        async def retrieval_node(results: Dict[str, Any]) -> Dict[str, Any]:
+            return await run_tool(retrieve_documents, {**base_args, "k": SPECULATIVE_RETRIEVAL_K})
+        
+        async def rerank_node(results: Dict[str, Any]) -> Dict[str, Any]:
+            intent = results["intent"].get('intent', 'consultation')
+            documents = fuse_documents(results["retrieval"].get('retrieved_documents', []), intent)[:get_retrieval_k(intent)]
+            rerank_result = None
+            # 重排序后端由 model_config.yaml 的 reranker.backend 选择，none表示跳过重排序
+            backend = config.reranker.backend
+            if documents and backend != "none":
+                logger.info(f"[PsychologicalChatController] 执行文档重排序({backend})，文档数量: {len(documents)}")
+                rerank_result = await run_tool(rerank_documents, {
+                    "user_input": user_input,
+                    "documents": documents,
+                    "backend": backend
+                })
+                documents = rerank_result.get('reranked_documents', documents)
+            return {"documents": documents, "rerank_result": rerank_result}
+        
+        nodes = [
+            DAGNode("intent", intent_node, cancel_on_short_circuit=False),
+            DAGNode("safety", safety_node, short_circuit=self._is_safety_triggered),
+            DAGNode("retrieval", retrieval_node),
+            DAGNode("rerank", rerank_node, depends_on=["intent", "retrieval"]),
+        ]
+        
+        if crisis_scope:
+            async def crisis_node(results: Dict[str, Any]) -> Dict[str, Any]:
+                return await asyncio.wait_for(asyncio.to_thread(detect_crisis.invoke, {
+                    "message": user_input,
+                    "user_id": crisis_scope["user_id"],
+                    "conversation_history": [m["content"] for m in chat_history if m.get("role") == "human"],
+                    "conversation_id": crisis_scope["conversation_id"],
+                    "message_id": crisis_scope.get("message_id")
+                }), timeout=timeout)
+            
+            nodes.append(DAGNode("crisis", crisis_node, cancel_on_short_circuit=False))
+        
+        if include_answer:
+            async def answer_node(results: Dict[str, Any]) -> Dict[str, Any]:
+                logger.info("[PsychologicalChatController] 生成最终回复")
+                return await run_tool(generate_answer, {
+                    **base_args,
+                    "intent": results["intent"].get('intent', 'consultation'),
+                    "documents": results["rerank"]["documents"],
+                    "safety_triggered": False,
+                    "query_embedding": results["retrieval"].get("query_embedding")
+                })
+            
+            nodes.append(DAGNode("answer", answer_node, depends_on=["intent", "safety", "rerank"]))
+        
+        return nodes
+    
+    @staticmethod
+    def _is_safety_triggered(safety_result: Dict[str, Any]) -> bool:
+        """安全检查结果是否需要中止后续流程"""
+        risk_level = safety_result.get('risk_level', 'none')
+        return risk_level in ['high', 'medium'] or safety_result.get('immediate_action_required', False)
+    
+    @staticmethod
+    def _get_execution_metadata(executor: DAGExecutor) -> Dict[str, Any]:
+        """获取依赖图执行的耗时和状态信息"""
+        return {
+            "node_timings": dict(executor.node_timings),
+            "node_status": dict(executor.node_status),
+            "cancelled_nodes": executor.cancelled_nodes
+        }
+    
+    def _get_progress_event(self, node_name: str, node_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """将依赖图节点完成事件转换为流式进度消息"""
+        if node_name == "intent":
+            intent = node_result.get('intent', 'consultation')
+            confidence = node_result.get('confidence', 0.5)
+            return {
+                "type": "progress",
+                "step": "intent_analysis_complete",
+                "message": f"意图分析完成: {intent} (置信度: {confidence:.2f})",
+                "data": {"intent": intent, "confidence": confidence}
+            }
+        if node_name == "safety":
+            risk_level = node_result.get('risk_level', 'none')
+            return {
+                "type": "progress",
+                "step": "safety_check_complete",
+                "message": f"安全检查完成: 风险等级={risk_level}",
+                "data": {"risk_level": risk_level, "safety_triggered": self._is_safety_triggered(node_result)}
+            }
+        if node_name == "retrieval":
+            documents_count = node_result.get('document_count', 0)
+            return {
+                "type": "progress",
+                "step": "document_retrieval_complete",
+                "message": f"文档检索完成: 找到{documents_count}个相关文档",
+                "data": {"documents_count": documents_count}
+            }
+        if node_name == "rerank" and node_result.get("rerank_result") is not None:
+            return {
+                "type": "progress",
+                "step": "document_rerank_complete",
+                "message": "文档优化完成"
+            }
+        return None
+    
     def _get_workflow_path(self, intent: str, doc_count: int, safety_triggered: bool) -> str:
         """获取工作流路径描述"""
         if safety_triggered:
@@ -1,20 +1,42 @@
 """心理健康聊天机器人的工具集合 - 基于LangChain Tools的独立实现"""
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncGenerator, Tuple
 from langchain_core.tools import tool
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 import logging
-from app.core.factories import create_llm_instance
-from app.core.vector_store import get_vector_store
+from app.core.factories import get_shared_llm
+from app.core.vector_store import get_vector_store, get_embedding_model_cached, get_bm25_index, get_collection_version
+from app.core.retrieval_cache import retrieval_cache
+from app.core.hybrid_search import hybrid_search
+from app.core.rerankers import get_reranker
+from app.core.retrieval_filters import MetadataFilter, build_metadata_filter, min_filtered_results
+from app.configs.settings import config
+from app.core.semantic_cache import semantic_cache
+from app.core.tools.keyword_matcher import scan_keywords
+from app.core.tools.lexicons import (
+    ANSWER_EMOTION_KEYWORDS,
+    SAFETY_HIGH_RISK_KEYWORDS,
+    SAFETY_MEDIUM_RISK_KEYWORDS
+)
 from langchain_core.documents import Document
-import jieba
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# 不同意图对应的检索文档数量
+RETRIEVAL_K_BY_INTENT = {
+    "crisis": 3,      # 危机情况下检索较少文档，快速响应
+    "knowledge": 8,   # 知识查询需要更多相关文档
+}
+DEFAULT_RETRIEVAL_K = 5  # 默认检索数量
+# 意图未知时的预检索数量，取各意图所需数量的最大值，意图确定后再截断
+SPECULATIVE_RETRIEVAL_K = max([DEFAULT_RETRIEVAL_K, *RETRIEVAL_K_BY_INTENT.values()])
+
+
+def get_retrieval_k(intent: str) -> int:
+    """根据意图获取检索文档数量"""
+    return RETRIEVAL_K_BY_INTENT.get(intent, DEFAULT_RETRIEVAL_K)
+
 
 class IntentAnalysisInput(BaseModel):
     """意图分析工具输入模型"""
@@ -41,6 +63,45 @@ class AnswerGenerationInput(BaseModel):
     args: Dict[str, Any] = Field(description="包含user_input、intent、documents、chat_history和safety_triggered的参数字典")
 
 
+def classify_intent(user_input: str) -> Tuple[str, float]:
+    """基于关键词判断意图，返回 (意图, 置信度)"""
+    keyword_hits = scan_keywords(user_input)
+    
+    if keyword_hits.has("intent.crisis"):
+        return "crisis", 0.9
+    elif keyword_hits.has("intent.consultation"):
+        return "consultation", 0.8
+    elif keyword_hits.has("intent.knowledge"):
+        return "knowledge", 0.7
+    return "chat", 0.6
+
+
+def classify_safety(user_input: str) -> Dict[str, Any]:
+    """基于关键词判断安全风险等级
+    
+    Returns:
+        包含risk_level、immediate_action_required、confidence、高/中风险关键词数量的字典
+    """
+    keyword_hits = scan_keywords(user_input)
+    high_risk_count = keyword_hits.count("safety.high")
+    medium_risk_count = keyword_hits.count("safety.medium")
+    
+    if high_risk_count > 0:
+        risk_level, immediate_action, confidence = "high", True, 0.9
+    elif medium_risk_count > 0:
+        risk_level, immediate_action, confidence = "medium", True, 0.7
+    else:
+        risk_level, immediate_action, confidence = "low", False, 0.8
+    
+    return {
+        "risk_level": risk_level,
+        "immediate_action_required": immediate_action,
+        "confidence": confidence,
+        "high_risk_count": high_risk_count,
+        "medium_risk_count": medium_risk_count
+    }
+
+
 @tool(args_schema=IntentAnalysisInput)
 def analyze_intent(args: Dict[str, Any]) -> Dict[str, Any]:
     """分析用户输入的意图和情绪状态"""
@@ -50,23 +111,8 @@ def analyze_intent(args: Dict[str, Any]) -> Dict[str, Any]:
         
         logger.info(f"[IntentAnalysisTool] 开始意图分析: {user_input[:50]}...")
         
-        # 简单的意图分析逻辑
-        crisis_keywords = ["想死", "自杀", "结束生命", "不想活", "死了算了", "自残", "自伤"]
-        consultation_keywords = ["焦虑", "抑郁", "压力", "困扰", "帮助", "难过", "痛苦"]
-        knowledge_keywords = ["什么是", "如何", "为什么", "解释", "了解", "我是谁", "我是", "关于我", "个人信息", "我的", "介绍一下", "告诉我"]
-        
-        if any(keyword in user_input for keyword in crisis_keywords):
-            intent = "crisis"
-            confidence = 0.9
-        elif any(keyword in user_input for keyword in consultation_keywords):
-            intent = "consultation"
-            confidence = 0.8
-        elif any(keyword in user_input for keyword in knowledge_keywords):
-            intent = "knowledge"
-            confidence = 0.7
-        else:
-            intent = "chat"
-            confidence = 0.6
+        # 简单的意图分析逻辑（关键词命中来自共享的一次扫描结果）
+        intent, confidence = classify_intent(user_input)
         
         result = {
             "intent": intent,
@@ -112,31 +158,23 @@ def check_safety(args: Dict[str, Any]) -> Dict[str, Any]:
         }
         
         # 高风险关键词检测
-        high_risk_keywords = ["自杀", "想死", "结束生命", "不想活", "死了算了", "自残", "自伤", "割腕", "跳楼"]
-        medium_risk_keywords = ["绝望", "无助", "没有意义", "活着没意思", "痛苦", "折磨"]
-        
-        high_risk_count = sum(1 for keyword in high_risk_keywords if keyword in user_input)
-        medium_risk_count = sum(1 for keyword in medium_risk_keywords if keyword in user_input)
-        
-        if high_risk_count > 0:
-            risk_level = "high"
-            immediate_action = True
-            confidence = 0.9
+        safety = classify_safety(user_input)
+        risk_level = safety["risk_level"]
+        immediate_action = safety["immediate_action_required"]
+        confidence = safety["confidence"]
+        high_risk_count = safety["high_risk_count"]
+        medium_risk_count = safety["medium_risk_count"]
+        
+        if risk_level == "high":
             response = f"我非常关心您的安全。请立即联系专业帮助：\n\n{crisis_resources['emergency']}\n\n心理危机干预热线：\n" + "\n".join(crisis_resources['hotlines'])
-        elif medium_risk_count > 0:
-            risk_level = "medium"
-            immediate_action = True
-            confidence = 0.7
+        elif risk_level == "medium":
             response = "我注意到您可能正在经历困难时期。建议您寻求专业心理健康支持。如需紧急帮助，请联系心理危机干预热线：400-161-9995"
         else:
-            risk_level = "low"
-            immediate_action = False
-            confidence = 0.8
             response = None
         
         result = {
             "risk_level": risk_level,
-            "risk_factors": high_risk_keywords + medium_risk_keywords if high_risk_count + medium_risk_count > 0 else [],
+            "risk_factors": SAFETY_HIGH_RISK_KEYWORDS + SAFETY_MEDIUM_RISK_KEYWORDS if high_risk_count + medium_risk_count > 0 else [],
             "immediate_action_required": immediate_action,
             "confidence": confidence,
             "reasoning": f"检测到{high_risk_count}个高风险关键词，{medium_risk_count}个中风险关键词",
@@ -162,46 +200,109 @@ def check_safety(args: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
+def _search_documents(
+    vector_store,
+    user_input: str,
+    query_embedding: List[float],
+    k: int,
+    intent: str,
+    metadata_filter: Optional[MetadataFilter] = None
+) -> Tuple[List[Dict[str, Any]], str]:
+    """执行一次检索，返回 (文档列表, 检索方式)"""
+    # 混合检索：BM25与向量检索并行，按意图权重做RRF融合；索引不可用时退回纯向量检索
+    bm25_index = get_bm25_index() if config.hybrid_search.enabled else None
+    if bm25_index is not None:
+        documents = hybrid_search(vector_store, bm25_index, user_input, query_embedding, k, intent, metadata_filter)
+        return documents, "hybrid_rrf"
+    
+    where = metadata_filter.to_where() if metadata_filter else None
+    docs = vector_store.similarity_search_by_vector(query_embedding, k=k, filter=where)
+    
+    # 转换为字典格式
+    documents = []
+    for i, doc in enumerate(docs):
+        documents.append({
+            "content": doc.page_content,
+            "metadata": doc.metadata,
+            "score": getattr(doc, "score", 0.0),
+            "rank": i + 1,
+            "source": "vector_search"
+        })
+    return documents, "vector_search"
+
+
+def _merge_documents(primary: List[Dict[str, Any]], supplement: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+    """过滤检索结果在前，用不过滤的结果补足k个（按文档id或内容去重）"""
+    merged = list(primary)
+    seen = {doc.get("id") or doc["content"] for doc in primary}
+    for doc in supplement:
+        if len(merged) >= k:
+            break
+        key = doc.get("id") or doc["content"]
+        if key not in seen:
+            seen.add(key)
+            merged.append(doc)
+    for rank, doc in enumerate(merged, start=1):
+        doc["rank"] = rank
+    return merged
+
+
 @tool(args_schema=DocumentRetrievalInput)
 def retrieve_documents(args: Dict[str, Any]) -> Dict[str, Any]:
     """根据用户输入和意图检索相关的心理健康知识文档"""
     try:
         user_input = args.get("user_input", "")
-        intent = args.get("intent", "consultation")
+        # 并发预检索时意图分析尚未完成，用同样的关键词规则先判断意图
+        intent = args.get("intent") or classify_intent(user_input)[0]
         chat_history = args.get("chat_history", [])
         
         logger.info(f"[DocumentRetrievalTool] 开始文档检索: 意图={intent}, 查询={user_input[:50]}...")
         
         vector_store = get_vector_store()
         
-        # 根据意图调整检索策略
-        if intent == "crisis":
-            k = 3  # 危机情况下检索较少文档，快速响应
-        elif intent == "knowledge":
-            k = 8  # 知识查询需要更多相关文档
-        else:
-            k = 5  # 默认检索数量
-        
-        # 执行向量检索
-        docs = vector_store.similarity_search(user_input, k=k)
-        
-        # 转换为字典格式
-        retrieved_documents = []
-        for i, doc in enumerate(docs):
-            retrieved_documents.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "score": getattr(doc, "score", 0.0),
-                "rank": i + 1,
-                "source": "vector_search"
-            })
+        # 根据意图调整检索策略，调用方也可以显式指定k（如并发预检索）
+        k = args.get("k") or get_retrieval_k(intent)
+        
+        # 按意图和情绪映射的知识分类过滤检索范围，过滤结果稀疏时补充不过滤的结果
+        metadata_filter = build_metadata_filter(intent, user_input) if config.retrieval_filter.enabled else None
+        
+        # 相同查询的检索结果直接复用；版本号在检索前读取，检索期间有新导入时缓存会按旧版本失效
+        cache_key = retrieval_cache.make_key(user_input, intent, k, metadata_filter.to_dict() if metadata_filter else None)
+        collection_version = get_collection_version()
+        cached_result = retrieval_cache.get(cache_key)
+        if cached_result is not None:
+            logger.info(f"[DocumentRetrievalTool] 命中检索缓存: {cached_result['document_count']}个文档")
+            return {**cached_result, "retrieval_cache_hit": True}
+        
+        # 先计算查询向量再按向量检索，向量同时提供给答案生成阶段的语义缓存复用
+        query_embedding = get_embedding_model_cached().embed_query(user_input)
+        
+        retrieved_documents, retrieval_method = _search_documents(
+            vector_store, user_input, query_embedding, k, intent, metadata_filter
+        )
+        filter_fallback = False
+        if metadata_filter is not None and len(retrieved_documents) < min_filtered_results(k):
+            filter_fallback = True
+            unfiltered_documents, retrieval_method = _search_documents(
+                vector_store, user_input, query_embedding, k, intent
+            )
+            logger.info(
+                f"[DocumentRetrievalTool] 过滤结果稀疏({len(retrieved_documents)}个)，补充不过滤的检索结果"
+            )
+            retrieved_documents = _merge_documents(retrieved_documents, unfiltered_documents, k)
         
         result = {
             "retrieved_documents": retrieved_documents,
             "next_step": "document_rerank" if len(retrieved_documents) > 3 else "answer_generation",
-            "retrieval_method": "vector_search",
-            "document_count": len(retrieved_documents)
+            "retrieval_method": retrieval_method,
+            "document_count": len(retrieved_documents),
+            "metadata_filter": metadata_filter.to_dict() if metadata_filter else None,
+            "filter_fallback": filter_fallback,
+            "retrieval_cache_hit": False
         }
+        if semantic_cache.enabled:
+            result["query_embedding"] = query_embedding
+        retrieval_cache.put(cache_key, result, version=collection_version)
         
         logger.info(f"[DocumentRetrievalTool] 文档检索完成: 检索到{len(retrieved_documents)}个文档")
         return result
@@ -232,25 +333,21 @@ def rerank_documents(args: Dict[str, Any]) -> Dict[str, Any]:
                  "rerank_method": "none"
              }
         
-        tfidf_vectorizer = TfidfVectorizer(max_features=1000, ngram_range=(1, 2))
-        
-        # 预处理查询和文档
-        query_tokens = list(jieba.cut(user_input))
-        query_text = " ".join(query_tokens)
-        
-        doc_texts = []
-        for doc in documents:
-            content = doc.get("content", "")
-            tokens = list(jieba.cut(content))
-            doc_texts.append(" ".join(tokens))
+        # 重排序后端可插拔（见 model_config.yaml 的 reranker.backend），调用方也可以显式指定
+        reranker = get_reranker(args.get("backend"))
+        top_n = config.reranker.top_n
+        similarities = reranker.score(user_input, documents)
         
-        # 使用TF-IDF计算相似度
-        all_texts = [query_text] + doc_texts
-        tfidf_matrix = tfidf_vectorizer.fit_transform(all_texts)
-        
-        query_vector = tfidf_matrix[0:1]
-        doc_vectors = tfidf_matrix[1:]
-        similarities = cosine_similarity(query_vector, doc_vectors)[0]
+        # 超出时间预算等情况下后端不给出分数，保持检索顺序
+        if similarities is None:
+            logger.info(f"[DocumentRerankTool] {reranker.name}未在预算内完成，保持原有顺序")
+            return {
+                "reranked_documents": documents[:top_n],
+                "next_step": "answer_generation",
+                "rerank_method": f"{reranker.name}_fallback",
+                "original_count": len(documents),
+                "reranked_count": len(documents[:top_n])
+            }
         
         # 重新排序文档
         scored_docs = []
@@ -270,14 +367,14 @@ def rerank_documents(args: Dict[str, Any]) -> Dict[str, Any]:
             doc["rank"] = i + 1
         
         result = {
-             "reranked_documents": scored_docs[:5],  # 返回前5个最相关的文档
+             "reranked_documents": scored_docs[:top_n],  # 返回前top_n个最相关的文档
              "next_step": "answer_generation",
-             "rerank_method": "tfidf_cosine",
+             "rerank_method": reranker.name,
              "original_count": len(documents),
-             "reranked_count": len(scored_docs[:5])
+             "reranked_count": len(scored_docs[:top_n])
          }
         
-        logger.info(f"[DocumentRerankTool] 文档重排序完成: {len(scored_docs[:5])}个文档")
+        logger.info(f"[DocumentRerankTool] 文档重排序完成: {len(scored_docs[:top_n])}个文档")
         return result
         
     except Exception as e:
@@ -290,30 +387,11 @@ def rerank_documents(args: Dict[str, Any]) -> Dict[str, Any]:
          }
 
 
-@tool(args_schema=AnswerGenerationInput)
-def generate_answer(args: Dict[str, Any]) -> Dict[str, Any]:
-    """基于用户输入、意图和相关文档生成最终回复"""
-    try:
-        user_input = args.get("user_input", "")
-        intent = args.get("intent", "consultation")
-        documents = args.get("documents", [])
-        chat_history = args.get("chat_history", [])
-        safety_triggered = args.get("safety_triggered", False)
-        
-        logger.info(f"[AnswerGenerationTool] 开始生成答案: 意图={intent}, 文档数={len(documents or [])}, 安全触发={safety_triggered}")
-        
-        # 如果安全机制已触发，直接返回安全回复
-        if safety_triggered:
-            return {
-                 "final_response": "我非常关心您的安全和福祉。请考虑联系专业的心理健康服务或危机干预热线。您的生命很宝贵，总有人愿意帮助您。",
-                 "response_type": "safety_intervention",
-                 "confidence": 1.0,
-                 "next_step": "end"
-             }
-        
-        llm = create_llm_instance()
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """你是一位专业、温暖、有同理心的AI心理健康助手。请根据用户的输入、意图和相关文档生成一个包含思考过程的专业回复。
+SAFETY_INTERVENTION_RESPONSE = "我非常关心您的安全和福祉。请考虑联系专业的心理健康服务或危机干预热线。您的生命很宝贵，总有人愿意帮助您。"
+ANSWER_FALLBACK_RESPONSE = "抱歉，我现在无法为您提供详细的回复。建议您稍后再试，或直接联系专业的心理健康服务。"
+
+ANSWER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """你是一位专业、温暖、有同理心的AI心理健康助手。请根据用户的输入、意图和相关文档生成一个包含思考过程的专业回复。
 
 回复结构要求：
 1. 首先表达对用户的理解和共情
@@ -338,32 +416,120 @@ def generate_answer(args: Dict[str, Any]) -> Dict[str, Any]:
 - 安全状态：{safety_triggered}
 
 请生成一个既专业又温暖的回复，让用户感受到被理解和支持。"""),
-            ("human", "用户输入：{user_input}")
-        ])
+    ("human", "用户输入：{user_input}")
+])
+
+def _format_answer_messages(user_input: str, intent: str, documents: List[Dict[str, Any]],
+                            chat_history: List[Dict[str, Any]], safety_triggered: bool):
+    """构建答案生成的LLM输入消息"""
+    # 准备文档内容
+    doc_content = ""
+    if documents:
+        doc_content = "\n\n".join([doc.get("content", "")[:500] for doc in documents[:3]])
+    
+    # 准备对话历史
+    history_text = ""
+    if chat_history:
+        recent_history = chat_history[-3:]  # 只使用最近3轮对话
+        history_text = "\n".join([f"{msg.get('role', 'user')}: {msg.get('content', '')}" for msg in recent_history])
+    
+    logger.info(f"[AnswerGenerationTool] 准备调用LLM，用户输入: {user_input[:100]}...")
+    logger.info(f"[AnswerGenerationTool] 文档内容长度: {len(doc_content)}")
+    
+    return ANSWER_PROMPT.format_messages(
+        user_input=user_input,
+        intent=intent,
+        documents=doc_content or "无相关文档",
+        chat_history=history_text or "无对话历史",
+        safety_triggered=safety_triggered
+    )
+
+
+def _detect_answer_emotion(user_input: str) -> str:
+    """分析用户情绪，用于回复结尾和情绪画像"""
+    keyword_hits = scan_keywords(user_input)
+    for emotion_type in ANSWER_EMOTION_KEYWORDS:
+        if keyword_hits.has(f"answer_emotion.{emotion_type}"):
+            return emotion_type
+    return "neutral"
+
+
+def _get_answer_suffix(intent: str, emotion: str) -> str:
+    """根据意图和情绪获取回复结尾"""
+    if intent == "consultation":
+        if emotion in ["sad", "anxious"]:
+            return "\n\n💙 请记住，您并不孤单。如果需要更专业的帮助，建议咨询专业的心理健康专家。"
+        return "\n\n如果您需要更专业的帮助，建议咨询专业的心理健康专家。"
+    elif intent == "knowledge":
+        return "\n\n📚 希望这些信息对您有帮助。如有更多疑问，欢迎继续询问。"
+    elif intent == "crisis":
+        return "\n\n🆘 您的安全是最重要的。请立即寻求专业帮助或联系危机干预热线。"
+    return ""
+
+
+def _build_answer_result(final_response: str, intent: str, emotion: str, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """构建答案生成结果"""
+    return {
+        "final_response": final_response,
+        "response_type": intent,
+        "emotion": emotion,
+        "confidence": 0.8,
+        "used_documents": len(documents or []),
+        "next_step": "end"
+    }
+
+
+def _lookup_cached_answer(intent: str, chat_history: List[Dict[str, Any]],
+                         query_embedding: Optional[List[float]]) -> Optional[str]:
+    """查询语义缓存；回复依赖对话上下文，因此只对没有历史的首轮提问使用缓存"""
+    if chat_history:
+        return None
+    return semantic_cache.lookup(intent, query_embedding)
+
+
+def _store_cached_answer(intent: str, user_input: str, chat_history: List[Dict[str, Any]],
+                         query_embedding: Optional[List[float]], response: str) -> None:
+    """写入语义缓存（缓存不含结尾提示的LLM原始回复）"""
+    if chat_history:
+        return
+    semantic_cache.store(intent, user_input, query_embedding, response)
+
+
+@tool(args_schema=AnswerGenerationInput)
+def generate_answer(args: Dict[str, Any]) -> Dict[str, Any]:
+    """基于用户输入、意图和相关文档生成最终回复"""
+    try:
+        user_input = args.get("user_input", "")
+        intent = args.get("intent", "consultation")
+        documents = args.get("documents", [])
+        chat_history = args.get("chat_history", [])
+        safety_triggered = args.get("safety_triggered", False)
+        query_embedding = args.get("query_embedding")
+        
+        logger.info(f"[AnswerGenerationTool] 开始生成答案: 意图={intent}, 文档数={len(documents or [])}, 安全触发={safety_triggered}")
         
-        # 准备文档内容
-        doc_content = ""
-        if documents:
-            doc_content = "\n\n".join([doc.get("content", "")[:500] for doc in documents[:3]])
+        # 如果安全机制已触发，直接返回安全回复
+        if safety_triggered:
+            return {
+                 "final_response": SAFETY_INTERVENTION_RESPONSE,
+                 "response_type": "safety_intervention",
+                 "confidence": 1.0,
+                 "next_step": "end"
+             }
         
-        # 准备对话历史
-        history_text = ""
-        if chat_history:
-            recent_history = chat_history[-3:]  # 只使用最近3轮对话
-            history_text = "\n".join([f"{msg.get('role', 'user')}: {msg.get('content', '')}" for msg in recent_history])
+        # 相似的首轮提问直接复用缓存的回复
+        cached_response = _lookup_cached_answer(intent, chat_history, query_embedding)
+        if cached_response is not None:
+            emotion = _detect_answer_emotion(user_input)
+            result = _build_answer_result(cached_response + _get_answer_suffix(intent, emotion), intent, emotion, documents)
+            result["cache_hit"] = True
+            return result
         
-        # 生成回复
-        logger.info(f"[AnswerGenerationTool] 准备调用LLM，用户输入: {user_input[:100]}...")
-        logger.info(f"[AnswerGenerationTool] 文档内容长度: {len(doc_content)}")
+        llm = get_shared_llm()
         
+        # 生成回复
         try:
-            formatted_messages = prompt.format_messages(
-                user_input=user_input,
-                intent=intent,
-                documents=doc_content or "无相关文档",
-                chat_history=history_text or "无对话历史",
-                safety_triggered=safety_triggered
-            )
+            formatted_messages = _format_answer_messages(user_input, intent, documents, chat_history, safety_triggered)
             logger.info(f"[AnswerGenerationTool] 消息格式化完成，开始调用LLM")
             
             response = llm.invoke(formatted_messages)
@@ -371,6 +537,7 @@ def generate_answer(args: Dict[str, Any]) -> Dict[str, Any]:
             
             final_response = response.content if hasattr(response, 'content') else str(response)
             logger.info(f"[AnswerGenerationTool] 最终回复长度: {len(final_response)}")
+            _store_cached_answer(intent, user_input, chat_history, query_embedding, final_response)
             
         except Exception as llm_error:
             logger.error(f"[AnswerGenerationTool] LLM调用失败: {llm_error}")
@@ -379,43 +546,14 @@ def generate_answer(args: Dict[str, Any]) -> Dict[str, Any]:
             logger.error(f"[AnswerGenerationTool] LLM错误堆栈: {traceback.format_exc()}")
             
             # LLM调用失败时的备用回复
-            final_response = "抱歉，我现在无法为您提供详细的回复。建议您稍后再试，或直接联系专业的心理健康服务。"
+            final_response = ANSWER_FALLBACK_RESPONSE
             logger.warning(f"[AnswerGenerationTool] 使用备用回复")
         
-        # 分析用户情绪
-        emotion = "neutral"
-        emotion_keywords = {
-            "anxious": ["焦虑", "担心", "紧张", "不安", "恐惧"],
-            "sad": ["难过", "伤心", "沮丧", "失落", "痛苦", "绝望"],
-            "angry": ["愤怒", "生气", "恼火", "烦躁", "愤恨"],
-            "confused": ["困惑", "迷茫", "不知道", "不明白", "疑惑"],
-            "hopeful": ["希望", "期待", "乐观", "积极", "向上"]
-        }
-        
-        for emotion_type, keywords in emotion_keywords.items():
-            if any(keyword in user_input for keyword in keywords):
-                emotion = emotion_type
-                break
-        
-        # 根据意图和情绪添加适当的结尾
-        if intent == "consultation":
-            if emotion in ["sad", "anxious"]:
-                final_response += "\n\n💙 请记住，您并不孤单。如果需要更专业的帮助，建议咨询专业的心理健康专家。"
-            else:
-                final_response += "\n\n如果您需要更专业的帮助，建议咨询专业的心理健康专家。"
-        elif intent == "knowledge":
-            final_response += "\n\n📚 希望这些信息对您有帮助。如有更多疑问，欢迎继续询问。"
-        elif intent == "crisis":
-            final_response += "\n\n🆘 您的安全是最重要的。请立即寻求专业帮助或联系危机干预热线。"
+        # 分析用户情绪，根据意图和情绪添加适当的结尾
+        emotion = _detect_answer_emotion(user_input)
+        final_response += _get_answer_suffix(intent, emotion)
         
-        result = {
-             "final_response": final_response,
-             "response_type": intent,
-             "emotion": emotion,
-             "confidence": 0.8,
-             "used_documents": len(documents or []),
-             "next_step": "end"
-         }
+        result = _build_answer_result(final_response, intent, emotion, documents)
         
         logger.info(f"[AnswerGenerationTool] 答案生成完成: 回复长度={len(final_response)}")
         return result
@@ -428,4 +566,72 @@ def generate_answer(args: Dict[str, Any]) -> Dict[str, Any]:
              "confidence": 0.0,
              "error": str(e),
              "next_step": "end"
-         }
\ No newline at end of file
+         }
+
+
+async def stream_answer(args: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
+    """流式生成最终回复，逐个产出LLM的token增量
+    
+    与generate_answer使用相同的提示词、情绪标签和结尾规则。
+    产出 {"type": "token", "content": ...} 事件，最后产出
+    {"type": "answer_complete", **generate_answer的结果字段}。
+    """
+    user_input = args.get("user_input", "")
+    intent = args.get("intent", "consultation")
+    documents = args.get("documents", [])
+    chat_history = args.get("chat_history", [])
+    safety_triggered = args.get("safety_triggered", False)
+    query_embedding = args.get("query_embedding")
+    
+    logger.info(f"[AnswerGenerationTool] 开始流式生成答案: 意图={intent}, 文档数={len(documents or [])}, 安全触发={safety_triggered}")
+    
+    if safety_triggered:
+        yield {"type": "token", "content": SAFETY_INTERVENTION_RESPONSE}
+        yield {
+            "type": "answer_complete",
+            "final_response": SAFETY_INTERVENTION_RESPONSE,
+            "response_type": "safety_intervention",
+            "confidence": 1.0,
+            "next_step": "end"
+        }
+        return
+    
+    emotion = _detect_answer_emotion(user_input)
+    suffix = _get_answer_suffix(intent, emotion)
+    
+    # 相似的首轮提问直接复用缓存的回复
+    cached_response = _lookup_cached_answer(intent, chat_history, query_embedding)
+    if cached_response is not None:
+        final_response = cached_response + suffix
+        yield {"type": "token", "content": final_response}
+        yield {"type": "answer_complete", **_build_answer_result(final_response, intent, emotion, documents), "cache_hit": True}
+        return
+    
+    chunks: List[str] = []
+    try:
+        llm = get_shared_llm()
+        formatted_messages = _format_answer_messages(user_input, intent, documents, chat_history, safety_triggered)
+        logger.info(f"[AnswerGenerationTool] 消息格式化完成，开始流式调用LLM")
+        
+        async for chunk in llm.astream(formatted_messages):
+            delta = chunk.content if hasattr(chunk, 'content') else str(chunk)
+            if delta:
+                chunks.append(delta)
+                yield {"type": "token", "content": delta}
+        
+        logger.info(f"[AnswerGenerationTool] LLM流式调用完成，回复长度: {sum(len(c) for c in chunks)}")
+        _store_cached_answer(intent, user_input, chat_history, query_embedding, "".join(chunks))
+        
+    except Exception as llm_error:
+        logger.error(f"[AnswerGenerationTool] LLM流式调用失败: {type(llm_error).__name__}: {str(llm_error)}")
+        # 尚未输出任何内容时使用备用回复，已输出部分内容时保留已生成的部分
+        if not chunks:
+            logger.warning(f"[AnswerGenerationTool] 使用备用回复")
+            chunks.append(ANSWER_FALLBACK_RESPONSE)
+            yield {"type": "token", "content": ANSWER_FALLBACK_RESPONSE}
+    
+    if suffix:
+        chunks.append(suffix)
+        yield {"type": "token", "content": suffix}
+    
+    yield {"type": "answer_complete", **_build_answer_result("".join(chunks), intent, emotion, documents)}
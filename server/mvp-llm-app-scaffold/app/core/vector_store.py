@@ -1,15 +1,26 @@
-# 导入Chroma向量数据库
-from langchain_community.vectorstores import Chroma
-# 导入OpenAI嵌入模型
-from langchain_openai import OpenAIEmbeddings
-# 导入HuggingFace 嵌入模型（新版本）
-from langchain_huggingface import HuggingFaceEmbeddings
+# 导入类型检查标记（Chroma、torch等重量级依赖在首次使用时才导入）
+from typing import TYPE_CHECKING
 # 导入嵌入模型基础类
 from langchain_core.embeddings import Embeddings
 # 导入应用配置和根目录
 from app.configs.settings import config, ROOT
-# 导入PyTorch深度学习框架
-import torch
+# 导入查询向量缓存
+from app.core.embedding_cache import CachedEmbeddings
+# 导入查询向量微批处理
+from app.core.embedding_batcher import BatchedEmbeddings
+# 导入BM25倒排索引
+from app.core.bm25_index import BM25Index, get_bm25_index_path
+# 导入集合版本号读取器
+from app.core.collection_version import CollectionVersionReader
+# 导入后台刷新工具
+from app.core.background_refresh import BackgroundRefresher
+# 导入线程锁
+import threading
+# 导入路径处理模块
+from pathlib import Path
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import Chroma
 
 
 # 动态加载嵌入模型的函数
@@ -24,17 +35,22 @@ def get_embedding_model() -> Embeddings:
 
     # 如果使用OpenAI提供商
     if embedding_provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        
         print("Loading OpenAI embedding model...")
         # 返回OpenAI嵌入模型实例
         return OpenAIEmbeddings(model=embedding_model_name)
 
     # 如果使用本地提供商
     elif embedding_provider == "local":
+        # torch和sentence-transformers导入耗时数秒，只在真正加载本地模型时导入
+        import os
+        import torch
+        from langchain_huggingface import HuggingFaceEmbeddings
+        
         print(f"Loading local embedding model: {embedding_model_name}")
         
         # 检查模型路径是否存在
-        from pathlib import Path
-        import os
         model_path = Path(embedding_model_name)
         # 修复Windows路径兼容性问题 - 使用更安全的路径检查方法
         try:
@@ -78,6 +94,24 @@ def get_embedding_model() -> Embeddings:
                 model_kwargs={"device": device},
                 encode_kwargs={"normalize_embeddings": True},
             )
+    # 如果使用ONNX Runtime运行本地模型
+    elif embedding_provider == "onnx":
+        from app.core.onnx_embeddings import OnnxEmbeddings
+        
+        model_path = Path(embedding_model_name)
+        if not model_path.is_absolute():
+            model_path = ROOT / model_path
+        onnx_path = config.embedding.onnx_path
+        if onnx_path and not Path(onnx_path).is_absolute():
+            onnx_path = str(ROOT / onnx_path)
+        
+        print(f"Loading ONNX embedding model: {model_path} (quantized={config.embedding.onnx_quantized})")
+        return OnnxEmbeddings(
+            model_dir=str(model_path),
+            quantized=config.embedding.onnx_quantized,
+            onnx_path=onnx_path,
+            intra_op_threads=config.embedding.onnx_threads
+        )
     else:
         # 如果是不支持的提供商，抛出异常
         raise ValueError(f"Unsupported embedding provider: {embedding_provider}")
@@ -85,16 +119,59 @@ def get_embedding_model() -> Embeddings:
 _embeddings = None
 _vector_store = None
 
+def get_embedding_cache_model_name(embeddings: Embeddings) -> str:
+    """查询向量缓存的模型键：提供商、实际加载的模型和ONNX量化方式不同，向量不能混用"""
+    settings = config.embedding
+    # 本地模型路径不存在时会回退到在线模型，以实际加载的模型为准
+    name = getattr(embeddings, "model_name", None) or settings.name
+    if settings.provider == "onnx":
+        variant = settings.onnx_path or ("int8" if settings.onnx_quantized else "fp32")
+        return f"{settings.provider}:{name}:{variant}"
+    return f"{settings.provider}:{name}"
+
+
 def get_embedding_model_cached() -> Embeddings:
-    """获取缓存的嵌入模型实例"""
+    """获取缓存的嵌入模型实例（查询向量依次经过LRU缓存和微批处理）"""
     global _embeddings
     if _embeddings is None:
-        _embeddings = get_embedding_model()
+        embeddings = get_embedding_model()
+        cache_model_name = get_embedding_cache_model_name(embeddings)
+        if config.embedding.batching_enabled:
+            embeddings = BatchedEmbeddings(
+                embeddings,
+                max_batch_size=config.embedding.batch_max_size,
+                max_wait_ms=config.embedding.batch_max_wait_ms,
+                max_queue_size=config.embedding.batch_max_queue_size
+            )
+        if config.embedding.query_cache_max_bytes > 0:
+            disk_path = config.embedding.query_cache_disk_path
+            embeddings = CachedEmbeddings(
+                embeddings,
+                model_name=cache_model_name,
+                max_bytes=config.embedding.query_cache_max_bytes,
+                disk_path=str(ROOT / disk_path) if disk_path else None
+            )
+        _embeddings = embeddings
     return _embeddings
 
 
+def get_embedding_cache_stats() -> dict:
+    """获取查询向量缓存的统计信息"""
+    if isinstance(_embeddings, CachedEmbeddings):
+        return _embeddings.get_stats()
+    return {"enabled": False}
+
+
+def get_embedding_batcher_stats() -> dict:
+    """获取查询向量微批处理的统计信息"""
+    embeddings = _embeddings.embeddings if isinstance(_embeddings, CachedEmbeddings) else _embeddings
+    if isinstance(embeddings, BatchedEmbeddings):
+        return embeddings.get_stats()
+    return {"enabled": False}
+
+
 # 初始化并返回Chroma向量数据库的函数
-def get_vector_store() -> Chroma:
+def get_vector_store() -> "Chroma":
     """
     初始化并返回Chroma向量数据库（使用缓存）。
     """
@@ -104,6 +181,8 @@ def get_vector_store() -> Chroma:
     if _vector_store is not None:
         return _vector_store
     
+    from langchain_community.vectorstores import Chroma
+    
     # 构建向量数据库持久化目录的完整路径
     persist_directory = str(ROOT / config.vector_store.persist_directory)
 
@@ -112,11 +191,22 @@ def get_vector_store() -> Chroma:
 
     try:
         # 创建Chroma向量数据库实例
-        _vector_store = Chroma(
-            collection_name=config.vector_store.collection_name,  # 集合名称
-            embedding_function=get_embedding_model_cached(),  # 使用缓存的嵌入函数
-            persist_directory=persist_directory,  # 持久化目录
-        )
+        try:
+            _vector_store = Chroma(
+                collection_name=config.vector_store.collection_name,  # 集合名称
+                embedding_function=get_embedding_model_cached(),  # 使用缓存的嵌入函数
+                persist_directory=persist_directory,  # 持久化目录
+                collection_metadata=get_hnsw_metadata(),  # HNSW索引参数（新建集合时生效）
+            )
+        except Exception as e:
+            # 已有集合不接受修改创建参数时，按原参数打开
+            print(f"Opening existing collection without HNSW metadata: {e}")
+            _vector_store = Chroma(
+                collection_name=config.vector_store.collection_name,
+                embedding_function=get_embedding_model_cached(),
+                persist_directory=persist_directory,
+            )
+        _apply_hnsw_search_ef(_vector_store)
         print("Vector store initialized successfully")
         # 返回向量数据库实例
         return _vector_store
@@ -127,6 +217,214 @@ def get_vector_store() -> Chroma:
         _vector_store = Chroma(
             collection_name=config.vector_store.collection_name,
             embedding_function=get_embedding_model_cached(),
+            collection_metadata=get_hnsw_metadata(),
             # 不设置persist_directory，使用内存存储
         )
-        return _vector_store
\ No newline at end of file
+        return _vector_store
+
+
+def get_hnsw_metadata() -> dict:
+    """从配置构建Chroma集合的HNSW参数"""
+    return {
+        "hnsw:M": config.vector_store.hnsw_m,
+        "hnsw:construction_ef": config.vector_store.hnsw_construction_ef,
+        "hnsw:search_ef": config.vector_store.hnsw_search_ef,
+    }
+
+
+def _apply_hnsw_search_ef(vector_store: "Chroma") -> None:
+    """已有集合的创建参数无法修改，这里只同步查询时的search_ef"""
+    try:
+        collection = vector_store._collection
+        metadata = dict(collection.metadata or {})
+        if metadata.get("hnsw:search_ef") != config.vector_store.hnsw_search_ef:
+            metadata["hnsw:search_ef"] = config.vector_store.hnsw_search_ef
+            # 距离函数不能修改，更新时不传
+            metadata.pop("hnsw:space", None)
+            collection.modify(metadata=metadata)
+            print(f"Updated HNSW search_ef to {config.vector_store.hnsw_search_ef}")
+    except Exception as e:
+        print(f"Failed to update HNSW search_ef: {e}")
+
+
+# 集合版本号（导入脚本每次写入后递增）
+_collection_version = CollectionVersionReader(ROOT / config.vector_store.persist_directory)
+
+
+def get_collection_version() -> int:
+    """获取向量集合当前的版本号"""
+    return _collection_version.get()
+
+
+# BM25索引缓存及其对应的索引文件修改时间
+_bm25_index = None
+_bm25_index_mtime = None
+_bm25_lock = threading.Lock()
+
+
+def _file_mtime(path: Path):
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return None
+
+
+def refresh_bm25_index():
+    """
+    加载与向量集合同步的BM25索引并替换缓存。
+    
+    文件缺失或文档数与集合不一致时从集合重建（需要遍历整个集合），
+    只在预热和后台线程中调用，不在请求路径上执行。
+    """
+    global _bm25_index, _bm25_index_mtime
+    
+    path = get_bm25_index_path(ROOT / config.vector_store.persist_directory)
+    mtime = _file_mtime(path)
+    index = BM25Index.load(path)
+    collection = get_vector_store()._collection
+    document_count = collection.count()
+    if index is None or len(index) != document_count:
+        print(f"Rebuilding BM25 index from collection ({document_count} documents)")
+        index = BM25Index.build_from_collection(collection)
+        index.save(path)
+        mtime = _file_mtime(path)
+    index.k1 = config.hybrid_search.bm25_k1
+    index.b = config.hybrid_search.bm25_b
+    with _bm25_lock:
+        _bm25_index, _bm25_index_mtime = index, mtime
+    return index
+
+
+_bm25_refresher = BackgroundRefresher("bm25_index", refresh_bm25_index)
+
+
+def get_bm25_index():
+    """
+    获取与向量集合同步的BM25索引（使用缓存）。
+    
+    导入脚本更新索引文件后在后台线程重新加载，完成前继续返回旧索引；
+    首次加载完成前返回None，调用方退回纯向量检索。
+    """
+    path = get_bm25_index_path(ROOT / config.vector_store.persist_directory)
+    index = _bm25_index
+    if index is None or _file_mtime(path) != _bm25_index_mtime:
+        _bm25_refresher.trigger()
+    return index
+
+
+def get_bm25_index_stats() -> dict:
+    """获取BM25索引的统计信息"""
+    if _bm25_index is None:
+        return {"enabled": config.hybrid_search.enabled, "loaded": False, "refreshing": _bm25_refresher.running}
+    return {
+        "enabled": config.hybrid_search.enabled,
+        "loaded": True,
+        "refreshing": _bm25_refresher.running,
+        **_bm25_index.get_stats()
+    }
+
+
+# 向量数据库预热状态，就绪检查依赖该状态
+_warmup_status = {
+    "ready": False,
+    "started": False,
+    "error": None,
+    "attempts": 0,
+    "duration_seconds": None,
+    "document_count": None,
+    "probe_queries": 0,
+    "bm25_documents": None,
+    "knowledge_categories": None,
+}
+# 应用关闭时设置，打断预热重试的等待
+_warmup_stop = threading.Event()
+
+
+def _warmup_once() -> None:
+    """执行一次预热：加载嵌入模型、打开集合，并执行探测查询，失败时抛出异常"""
+    embeddings = get_embedding_model_cached()
+    vector_store = get_vector_store()
+    
+    try:
+        _warmup_status["document_count"] = vector_store._collection.count()
+    except Exception:
+        _warmup_status["document_count"] = None
+    
+    # BM25索引同时为混合检索和TF-IDF重排序提供语料统计（需要时在预热线程中重建）
+    try:
+        bm25_index = _bm25_refresher.run()
+    except Exception as e:
+        print(f"Failed to load BM25 index: {e}")
+        bm25_index = None
+    _warmup_status["bm25_documents"] = len(bm25_index) if bm25_index is not None else None
+    
+    # 知识检索使用的分类质心索引（缺失或过期时需要遍历整个集合构建）
+    from app.core.category_index import warmup_category_index
+    category_index = warmup_category_index()
+    _warmup_status["knowledge_categories"] = len(category_index) if category_index is not None else None
+    
+    probe_count = 0
+    for query in config.vector_store.warmup_queries:
+        vector_store.similarity_search_by_vector(embeddings.embed_query(query), k=1)
+        probe_count += 1
+    _warmup_status["probe_queries"] = probe_count
+
+
+def warmup_vector_store() -> dict:
+    """
+    预热向量数据库：加载嵌入模型、打开集合，并执行探测查询把HNSW索引加载进内存。
+    
+    失败时按指数退避重试，直到成功、达到 warmup_max_attempts 或应用关闭，
+    避免一次暂时性故障让 /ready 永久返回503。
+    
+    Returns:
+        dict: 预热状态
+    """
+    import time
+    
+    settings = config.vector_store
+    _warmup_stop.clear()
+    _warmup_status.update(started=True, ready=False, error=None, attempts=0)
+    start = time.perf_counter()
+    backoff = settings.warmup_retry_backoff_seconds
+    while True:
+        _warmup_status["attempts"] += 1
+        try:
+            _warmup_once()
+            _warmup_status.update(
+                ready=True,
+                error=None,
+                duration_seconds=round(time.perf_counter() - start, 3)
+            )
+            print(f"Vector store warm-up finished in {_warmup_status['duration_seconds']}s "
+                  f"({_warmup_status['probe_queries']} probe queries, {_warmup_status['document_count']} documents)")
+            break
+        except Exception as e:
+            _warmup_status.update(
+                error=str(e),
+                duration_seconds=round(time.perf_counter() - start, 3)
+            )
+            attempts = _warmup_status["attempts"]
+            if settings.warmup_max_attempts and attempts >= settings.warmup_max_attempts:
+                print(f"Vector store warm-up failed after {attempts} attempts: {e}")
+                break
+            print(f"Vector store warm-up failed (attempt {attempts}), retrying in {backoff}s: {e}")
+            if _warmup_stop.wait(backoff):
+                break
+            backoff = min(backoff * 2, settings.warmup_retry_max_backoff_seconds)
+    return dict(_warmup_status)
+
+
+def stop_vector_store_warmup() -> None:
+    """停止预热重试（应用关闭时调用）"""
+    _warmup_stop.set()
+
+
+def get_vector_store_warmup_status() -> dict:
+    """获取向量数据库预热状态"""
+    return dict(_warmup_status)
+
+
+def is_vector_store_ready() -> bool:
+    """向量数据库是否已完成预热"""
+    return _warmup_status["ready"]
\ No newline at end of file
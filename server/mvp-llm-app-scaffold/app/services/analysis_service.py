@@ -0,0 +1,135 @@
+"""批量消息分析服务 - 对大量历史消息执行关键词类分析"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from app.configs.settings import config
+from app.core.tools.keyword_matcher import scan_keywords
+from app.core.tools.psychological_tools import classify_intent, classify_safety
+from app.core.tools.crisis_detection_tool import CrisisLevel, CRISIS_LEVEL_NAMES, _analyze_message
+from app.core.tools.emotion_analysis_tool import _analyze_emotion_keywords, _get_dominant_emotion
+
+logger = logging.getLogger(__name__)
+
+# 超过该数量的批次拆分到进程池并行分析
+PROCESS_POOL_MIN_BATCH = 256
+# 每个分片的消息数量
+SHARD_SIZE = 128
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start_process_pool() -> None:
+    """创建全局进程池，由应用lifespan在启动时调用
+
+    服务进程里已有多个线程，fork出的子进程可能继承被其他线程持有的锁，
+    因此用forkserver（平台不支持时用spawn）启动子进程。
+    """
+    global _process_pool
+    if _process_pool is not None:
+        return
+    settings = config.analysis
+    start_method = settings.process_pool_start_method
+    if start_method not in multiprocessing.get_all_start_methods():
+        start_method = "spawn"
+    max_workers = settings.process_pool_max_workers or max((os.cpu_count() or 2) - 1, 1)
+    _process_pool = ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context(start_method)
+    )
+    logger.info(f"[AnalysisService] 进程池已创建: max_workers={max_workers}, start_method={start_method}")
+
+
+def shutdown_process_pool() -> None:
+    """关闭全局进程池，取消尚未开始的分片"""
+    global _process_pool
+    pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+        logger.info("[AnalysisService] 进程池已关闭")
+
+
+def analyze_text(message: str) -> Dict[str, Any]:
+    """对单条消息执行意图、安全、危机和情绪分析
+
+    四个分析器共用同一次关键词扫描结果。
+    """
+    # 先扫描一次，后续分析器命中scan_keywords的缓存
+    scan_keywords(message)
+
+    intent, intent_confidence = classify_intent(message)
+    safety = classify_safety(message)
+    crisis_level = _analyze_message(message)
+    emotion_scores = _analyze_emotion_keywords(message)
+
+    return {
+        "intent": intent,
+        "intent_confidence": intent_confidence,
+        "risk_level": safety["risk_level"],
+        "risk_confidence": safety["confidence"],
+        "requires_intervention": safety["immediate_action_required"] or crisis_level >= CrisisLevel.HIGH,
+        "crisis_level": crisis_level,
+        "crisis_level_name": CRISIS_LEVEL_NAMES[crisis_level],
+        "dominant_emotion": _get_dominant_emotion(emotion_scores),
+        "emotion_scores": {emotion: round(score, 4) for emotion, score in emotion_scores.items() if score > 0}
+    }
+
+
+def analyze_messages(messages: List[str]) -> List[Dict[str, Any]]:
+    """分析一批消息，重复的消息只分析一次（可在子进程中执行）"""
+    results: Dict[str, Dict[str, Any]] = {}
+    for message in messages:
+        if message not in results:
+            results[message] = analyze_text(message)
+    return [results[message] for message in messages]
+
+
+class AnalysisService:
+    """批量分析服务类"""
+
+    def __init__(self, shard_size: int = SHARD_SIZE, process_pool_min_batch: int = PROCESS_POOL_MIN_BATCH):
+        self.shard_size = shard_size
+        self.process_pool_min_batch = process_pool_min_batch
+
+    async def analyze_batch(self, messages: List[str]) -> AsyncGenerator[Dict[str, Any], None]:
+        """分析一批消息，按输入顺序逐条产出结果
+
+        大批次按分片提交到进程池并行执行，前面的分片完成后即可开始输出，
+        不必等待整批分析结束。进程池未启动时（如脚本中直接调用）使用线程执行。
+        """
+        loop = asyncio.get_running_loop()
+        shards = [messages[i:i + self.shard_size] for i in range(0, len(messages), self.shard_size)]
+
+        pool = _process_pool
+        if pool is not None and len(messages) >= self.process_pool_min_batch:
+            futures = [loop.run_in_executor(pool, analyze_messages, shard) for shard in shards]
+        else:
+            futures = [asyncio.ensure_future(asyncio.to_thread(analyze_messages, shard)) for shard in shards]
+
+        logger.info(f"[AnalysisService] 开始批量分析: {len(messages)} 条消息, {len(shards)} 个分片")
+
+        index = 0
+        try:
+            for future in futures:
+                for result in await future:
+                    yield {"index": index, **result}
+                    index += 1
+        finally:
+            for future in futures:
+                future.cancel()
+
+        logger.info(f"[AnalysisService] 批量分析完成: {index} 条消息")
+
+    async def stream_ndjson(self, messages: List[str]) -> AsyncGenerator[str, None]:
+        """以NDJSON格式输出批量分析结果"""
+        async for result in self.analyze_batch(messages):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+
+# 全局批量分析服务实例
+analysis_service = AnalysisService()
@@ -1,10 +1,12 @@
 # 对话服务层
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy import and_, desc, func, insert, or_, select, update, column as sa_column, inspect as sa_inspect, table as sa_table
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from app.models.user import User
 from app.models.conversation import Conversation, Message
 from app.configs.database import get_db
+from app.utils.pagination import CONVERSATION_CURSOR, MESSAGE_CURSOR, decode_cursor, encode_cursor
 from datetime import datetime
 import json
 import uuid
@@ -12,6 +14,70 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+def build_emotion_profile(user: User) -> Dict[str, Any]:
+    """把用户的情绪字段整理为情绪画像字典"""
+    # 解析情绪历史
+    emotion_history = []
+    if user.emotion_history:
+        try:
+            emotion_history = json.loads(user.emotion_history)
+            if not isinstance(emotion_history, list):
+                emotion_history = []
+        except (json.JSONDecodeError, TypeError):
+            emotion_history = []
+    
+    return {
+        "user_id": user.user_id,
+        "current_emotion": user.current_emotion,
+        "emotion_updated_at": user.emotion_updated_at.isoformat() if user.emotion_updated_at else None,
+        "emotion_history": emotion_history,
+        "emotion_history_count": len(emotion_history)
+    }
+
+def message_cursor(message: Message) -> str:
+    """消息列表按 (created_at, id) 升序分页的游标"""
+    return encode_cursor(MESSAGE_CURSOR, message.created_at, message.id)
+
+def conversation_cursor(conversation: Conversation) -> str:
+    """对话列表按 (last_message_at, id) 降序分页的游标"""
+    return encode_cursor(CONVERSATION_CURSOR, conversation.last_message_at, conversation.id)
+
+def messages_after(cursor: Optional[str]) -> list:
+    """游标之后的消息条件，配合 (conversation_id, created_at, id) 索引，深页与首页代价相同"""
+    if not cursor:
+        return []
+    created_at, row_id = decode_cursor(cursor, MESSAGE_CURSOR)
+    return [or_(
+        Message.created_at > created_at,
+        and_(Message.created_at == created_at, Message.id > row_id)
+    )]
+
+def conversations_before(cursor: Optional[str]) -> list:
+    """游标之后（按最后消息时间降序）的对话条件；降序时last_message_at为NULL的对话排在最后"""
+    if not cursor:
+        return []
+    last_message_at, row_id = decode_cursor(cursor, CONVERSATION_CURSOR)
+    if last_message_at is None:
+        return [Conversation.last_message_at == None, Conversation.id < row_id]
+    return [or_(
+        Conversation.last_message_at < last_message_at,
+        and_(Conversation.last_message_at == last_message_at, Conversation.id < row_id),
+        Conversation.last_message_at == None
+    )]
+
+# 消息角色到统计字段的映射（聊天接口保存的用户消息角色为human，旧数据中可能为user）
+ROLE_STATS_KEYS = {
+    "human": "user_messages",
+    "user": "user_messages",
+    "assistant": "assistant_messages",
+}
+
+# 对话行上的危机风险状态列（JSON，由init_db.py添加），只通过这个轻量表对象读写
+conversation_crisis_state = sa_table("conversations", sa_column("conversation_id"), sa_column("crisis_state"))
+
+# 对话列表的排序，与conversation_cursor一致（列表查询用raiseload禁止加载消息集合）
+CONVERSATION_ORDER = (desc(Conversation.last_message_at), desc(Conversation.id))
+
 class ConversationService:
     """对话服务类"""
     
@@ -120,36 +186,186 @@ class ConversationService:
         self.db.refresh(message)
         return message
     
-    def get_conversation_messages(self, conversation_id: str, limit: int = 50, offset: int = 0) -> List[Message]:
-        """获取对话的消息列表"""
+    @staticmethod
+    def _to_row(instance) -> Dict[str, Any]:
+        """把未持久化的ORM对象转换为按列名组织的插入行，未赋值的列交给列默认值"""
+        row = {}
+        for prop in sa_inspect(type(instance)).column_attrs:
+            value = getattr(instance, prop.key)
+            if value is not None:
+                row[prop.columns[0].key] = value
+        return row
+    
+    @staticmethod
+    def _fill_missing_columns(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """executemany要求每行的列一致，缺少的可选列补None"""
+        columns = {column for row in rows for column in row}
+        for row in rows:
+            for column in columns:
+                row.setdefault(column, None)
+        return rows
+    
+    def append_turn(self, conversation_id: str, user_id: Optional[str],
+                    messages: List[Dict[str, Any]], title: Optional[str] = None) -> List[str]:
+        """
+        在一个事务内保存一轮对话：对话不存在则创建，消息批量插入，计数原子递增。
+        
+        与 get_conversation + create_conversation + 两次 add_message 相比，
+        不再先查询对话、不再refresh，每轮固定两条语句加一次提交。
+        
+        Args:
+            conversation_id: 对话ID
+            user_id: 用户ID（字符串），仅在新建对话时写入
+            messages: 消息列表，每项包含role、content，可选message_id、model_name、temperature、metadata
+            title: 新建对话时的标题，默认取第一条消息内容
+        
+        Returns:
+            List[str]: 新消息的message_id，顺序与messages一致
+        """
+        return self.append_turns([{
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "title": title,
+            "messages": messages
+        }])
+    
+    def append_turns(self, turns: List[Dict[str, Any]]) -> List[str]:
+        """
+        批量保存多个对话轮次（可跨对话），同样只有两条语句加一次提交：
+        一条多行 INSERT ... ON DUPLICATE KEY UPDATE 创建或更新所有涉及的对话，
+        一条多行 INSERT 写入所有消息。
+        
+        Args:
+            turns: 轮次列表，每项包含conversation_id、user_id、title、messages（格式同append_turn）
+        
+        Returns:
+            List[str]: 所有新消息的message_id，按轮次和消息顺序排列
+        """
+        statements = self.build_turn_statements(turns)
+        if statements is None:
+            return []
+        upsert, message_insert, message_rows = statements
+        
+        try:
+            self.db.execute(upsert)
+            # 多行参数由驱动合并为一条 INSERT ... VALUES (...), (...)
+            self.db.execute(message_insert, message_rows)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        
+        logger.info(f"[ConversationService] 保存对话轮次: turns={len(turns)}, messages={len(message_rows)}")
+        return [row["message_id"] for row in message_rows]
+    
+    @staticmethod
+    def build_turn_statements(turns: List[Dict[str, Any]]):
+        """
+        构建保存对话轮次的两条语句（同步和异步服务共用）。
+        
+        Returns:
+            (对话upsert语句, 消息INSERT语句, 消息参数行)；没有消息时返回None
+        """
+        now = datetime.now()
+        message_rows = []
+        # 每个对话本批次新增的消息数，以及新建对话时使用的用户和标题
+        conversation_updates: Dict[str, Dict[str, Any]] = {}
+        for turn in turns:
+            messages = turn["messages"]
+            if not messages:
+                continue
+            conversation_id = turn["conversation_id"]
+            for item in messages:
+                metadata = item.get("metadata")
+                message_rows.append(ConversationService._to_row(Message(
+                    message_id=item.get("message_id") or str(uuid.uuid4()),
+                    conversation_id=conversation_id,
+                    role=item["role"],
+                    content=item["content"],
+                    model_name=item.get("model_name"),
+                    temperature=item.get("temperature"),
+                    metadata=json.dumps(metadata) if metadata else None
+                )))
+            
+            pending = conversation_updates.get(conversation_id)
+            if pending is None:
+                title = turn.get("title")
+                if not title:
+                    first_content = messages[0]["content"]
+                    title = first_content[:50] + "..." if len(first_content) > 50 else first_content
+                conversation_updates[conversation_id] = {"user_id": turn.get("user_id"), "title": title, "count": len(messages)}
+            else:
+                pending["count"] += len(messages)
+        
+        if not message_rows:
+            return None
+        
+        conversation_rows = ConversationService._fill_missing_columns([
+            ConversationService._to_row(Conversation(
+                conversation_id=conversation_id,
+                user_id=pending["user_id"],
+                title=pending["title"],
+                message_count=pending["count"],
+                last_message_at=now
+            ))
+            for conversation_id, pending in conversation_updates.items()
+        ])
+        
+        conversations = Conversation.__table__
+        upsert = mysql_insert(conversations).values(conversation_rows)
+        upsert = upsert.on_duplicate_key_update({
+            "message_count": func.coalesce(conversations.c.message_count, 0) + upsert.inserted.message_count,
+            "last_message_at": upsert.inserted.last_message_at
+        })
+        
+        return upsert, insert(Message.__table__), ConversationService._fill_missing_columns(message_rows)
+    
+    def get_existing_message_ids(self, message_ids: List[str]) -> set:
+        """返回已存在于数据库中的message_id（用于重放日志时去重）"""
+        if not message_ids:
+            return set()
+        rows = self.db.query(Message.message_id).filter(Message.message_id.in_(message_ids)).all()
+        return {row[0] for row in rows}
+    
+    def get_conversation_messages(self, conversation_id: str, limit: Optional[int] = 50, cursor: Optional[str] = None) -> List[Message]:
+        """
+        获取对话的消息列表（按时间升序，游标分页）
+        
+        Args:
+            limit: 返回条数，None表示不限
+            cursor: 上一页最后一条消息的游标（message_cursor），None表示第一页
+        
+        Raises:
+            ValueError: 游标无效
+        """
         conversation = self.get_conversation(conversation_id)
         if not conversation:
             return []
         
-        return self.db.query(Message).filter(
-            Message.conversation_id == conversation.conversation_id
-        ).order_by(Message.created_at).offset(offset).limit(limit).all()
+        query = self.db.query(Message).filter(
+            Message.conversation_id == conversation.conversation_id,
+            *messages_after(cursor)
+        ).order_by(Message.created_at, Message.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
     
-    def get_user_conversations(self, user_id: Optional[str] = None, limit: int = 20, offset: int = 0) -> List[Conversation]:
-        """获取用户的对话列表"""
-        if user_id is None:
-            # 查询user_id为None的对话（匿名用户对话）
-            return self.db.query(Conversation).filter(
-                Conversation.user_id == None,
-                Conversation.is_active == "true"
-            ).order_by(desc(Conversation.last_message_at)).offset(offset).limit(limit).all()
-        
+    def get_user_conversations(self, user_id: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None) -> List[Conversation]:
+        """获取用户的对话列表（按最后消息时间降序，游标分页），user_id为None时查询匿名对话"""
         # 直接使用传入的user_id（字符串类型）
+        user_filter = Conversation.user_id == None if user_id is None else Conversation.user_id == user_id
         return self.db.query(Conversation).filter(
-            Conversation.user_id == user_id,
-            Conversation.is_active == "true"
-        ).order_by(desc(Conversation.last_message_at)).offset(offset).limit(limit).all()
+            user_filter,
+            Conversation.is_active == "true",
+            *conversations_before(cursor)
+        ).options(raiseload(Conversation.messages)).order_by(*CONVERSATION_ORDER).limit(limit).all()
     
-    def get_all_conversations(self, limit: int = 20, offset: int = 0) -> List[Conversation]:
+    def get_all_conversations(self, limit: int = 20, cursor: Optional[str] = None) -> List[Conversation]:
         """获取所有对话列表（用于匿名用户）"""
         return self.db.query(Conversation).filter(
-            Conversation.is_active == "true"
-        ).order_by(desc(Conversation.last_message_at)).offset(offset).limit(limit).all()
+            Conversation.is_active == "true",
+            *conversations_before(cursor)
+        ).options(raiseload(Conversation.messages)).order_by(*CONVERSATION_ORDER).limit(limit).all()
     
     def update_conversation_title(self, conversation_id: str, title: str) -> bool:
         """更新对话标题"""
@@ -173,22 +389,71 @@ class ConversationService:
         self.db.commit()
         return True
     
+    def update_crisis_state(
+        self,
+        conversation_id: str,
+        update_state: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]]
+    ) -> bool:
+        """
+        在同一事务中锁定对话行，读取危机风险状态、交给 update_state 更新后写回。
+
+        多个worker同时处理同一对话时按行锁串行执行，每次都基于库中最新的状态折叠，
+        不会用旧副本覆盖其他进程的更新。update_state 返回None时不写回。
+
+        Returns:
+            bool: 对话尚未创建时返回False（update_state 仍以None调用一次）
+        """
+        try:
+            row = self.db.execute(
+                select(conversation_crisis_state.c.crisis_state).where(
+                    conversation_crisis_state.c.conversation_id == conversation_id
+                ).with_for_update()
+            ).first()
+            value = row[0] if row is not None else None
+            if isinstance(value, (str, bytes)):
+                value = json.loads(value)
+            state = update_state(value)
+            if row is None:
+                self.db.rollback()
+                return False
+            if state is not None:
+                self.db.execute(
+                    update(conversation_crisis_state).where(
+                        conversation_crisis_state.c.conversation_id == conversation_id
+                    ).values(crisis_state=json.dumps(state, ensure_ascii=False))
+                )
+            self.db.commit()
+            return True
+        except Exception:
+            self.db.rollback()
+            raise
+    
+    def get_role_counts(self, conversation_id: str) -> Dict[str, int]:
+        """用一条 GROUP BY 查询获取对话按角色的消息数，不加载消息内容"""
+        rows = self.db.query(Message.role, func.count(Message.id)).filter(
+            Message.conversation_id == conversation_id
+        ).group_by(Message.role).all()
+        counts: Dict[str, int] = {}
+        for role, count in rows:
+            key = ROLE_STATS_KEYS.get(role)
+            if key:
+                counts[key] = counts.get(key, 0) + count
+        return counts
+    
     def get_conversation_stats(self, conversation_id: str) -> Dict[str, Any]:
-        """获取对话统计信息"""
-        conversation = self.get_conversation_with_messages(conversation_id)
+        """获取对话统计信息（总数取维护的message_count，按角色计数用GROUP BY，不加载消息集合）"""
+        conversation = self.get_conversation(conversation_id)
         if not conversation:
             return {}
         
-        total_messages = len(conversation.messages)
-        user_messages = len([m for m in conversation.messages if m.role == "user"])
-        assistant_messages = len([m for m in conversation.messages if m.role == "assistant"])
+        role_counts = self.get_role_counts(conversation.conversation_id)
         
         return {
             "conversation_id": str(conversation.conversation_id),
             "title": str(conversation.title) if conversation.title else None,
-            "total_messages": total_messages,
-            "user_messages": user_messages,
-            "assistant_messages": assistant_messages,
+            "total_messages": conversation.message_count or 0,
+            "user_messages": role_counts.get("user_messages", 0),
+            "assistant_messages": role_counts.get("assistant_messages", 0),
             "created_at": conversation.created_at.isoformat(),
             "updated_at": conversation.updated_at.isoformat(),
             "last_message_at": conversation.last_message_at.isoformat() if conversation.last_message_at else None
@@ -257,24 +522,7 @@ class ConversationService:
             user = self.db.query(User).filter(User.user_id == user_id).first()
             if not user:
                 return None
-            
-            # 解析情绪历史
-            emotion_history = []
-            if user.emotion_history:
-                try:
-                    emotion_history = json.loads(user.emotion_history)
-                    if not isinstance(emotion_history, list):
-                        emotion_history = []
-                except (json.JSONDecodeError, TypeError):
-                    emotion_history = []
-            
-            return {
-                "user_id": user.user_id,
-                "current_emotion": user.current_emotion,
-                "emotion_updated_at": user.emotion_updated_at.isoformat() if user.emotion_updated_at else None,
-                "emotion_history": emotion_history,
-                "emotion_history_count": len(emotion_history)
-            }
+            return build_emotion_profile(user)
             
         except Exception as e:
             logger.error(f"[ConversationService] 获取用户情绪画像失败: user_id={user_id}, error={e}")
@@ -304,8 +552,8 @@ class ConversationService:
             if exclude_conversation_id:
                 query = query.filter(Message.conversation_id != exclude_conversation_id)
             
-            # 按时间倒序排列，获取最近的消息
-            messages = query.order_by(desc(Message.created_at)).limit(limit).all()
+            # 按时间倒序排列，获取最近的消息（同一轮的消息时间相同，用自增id区分先后）
+            messages = query.order_by(desc(Message.created_at), desc(Message.id)).limit(limit).all()
             
             logger.info(f"[ConversationService] 获取到 {len(messages)} 条历史消息")
             return messages
@@ -314,6 +562,146 @@ class ConversationService:
             logger.error(f"[ConversationService] 获取用户历史消息失败: user_id={user_id}, error={e}")
             return []
 
+class AsyncConversationService:
+    """对话服务类（异步版本）
+    
+    使用AsyncSession，供async端点直接await，不在事件循环线程上执行阻塞的数据库调用。
+    语句构建与同步版本共用，返回结果格式一致。
+    """
+    
+    def __init__(self, db):
+        self.db = db
+    
+    async def get_user(self, user_id: str) -> Optional[User]:
+        """根据user_id获取用户"""
+        result = await self.db.execute(select(User).where(User.user_id == user_id).limit(1))
+        return result.scalars().first()
+    
+    async def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """根据conversation_id获取对话"""
+        result = await self.db.execute(
+            select(Conversation).where(
+                Conversation.conversation_id == conversation_id,
+                Conversation.is_active == "true"
+            ).limit(1)
+        )
+        return result.scalars().first()
+    
+    async def append_turn(self, conversation_id: str, user_id: Optional[str],
+                          messages: List[Dict[str, Any]], title: Optional[str] = None) -> List[str]:
+        """在一个事务内保存一轮对话（参数同ConversationService.append_turn）"""
+        return await self.append_turns([{
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "title": title,
+            "messages": messages
+        }])
+    
+    async def append_turns(self, turns: List[Dict[str, Any]]) -> List[str]:
+        """批量保存多个对话轮次（参数同ConversationService.append_turns）"""
+        statements = ConversationService.build_turn_statements(turns)
+        if statements is None:
+            return []
+        upsert, message_insert, message_rows = statements
+        
+        try:
+            await self.db.execute(upsert)
+            await self.db.execute(message_insert, message_rows)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        
+        logger.info(f"[AsyncConversationService] 保存对话轮次: turns={len(turns)}, messages={len(message_rows)}")
+        return [row["message_id"] for row in message_rows]
+    
+    async def get_conversation_messages(self, conversation_id: str, limit: Optional[int] = 50, cursor: Optional[str] = None) -> List[Message]:
+        """获取对话的消息列表（参数同ConversationService.get_conversation_messages）"""
+        conversation = await self.get_conversation(conversation_id)
+        if not conversation:
+            return []
+        
+        query = select(Message).where(
+            Message.conversation_id == conversation.conversation_id,
+            *messages_after(cursor)
+        ).order_by(Message.created_at, Message.id)
+        if limit is not None:
+            query = query.limit(limit)
+        result = await self.db.execute(query)
+        return list(result.scalars().all())
+    
+    async def get_user_conversations(self, user_id: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None) -> List[Conversation]:
+        """获取用户的对话列表（参数同ConversationService.get_user_conversations）"""
+        user_filter = Conversation.user_id == None if user_id is None else Conversation.user_id == user_id
+        result = await self.db.execute(
+            select(Conversation).where(
+                user_filter,
+                Conversation.is_active == "true",
+                *conversations_before(cursor)
+            ).options(raiseload(Conversation.messages)).order_by(*CONVERSATION_ORDER).limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def _update_active_conversation(self, conversation_id: str, values: Dict[str, Any]) -> bool:
+        """直接UPDATE有效对话，不先查询"""
+        result = await self.db.execute(
+            update(Conversation).where(
+                Conversation.conversation_id == conversation_id,
+                Conversation.is_active == "true"
+            ).values(**values, updated_at=datetime.now())
+        )
+        await self.db.commit()
+        return result.rowcount > 0
+    
+    async def update_conversation_title(self, conversation_id: str, title: str) -> bool:
+        """更新对话标题"""
+        return await self._update_active_conversation(conversation_id, {"title": title})
+    
+    async def delete_conversation(self, conversation_id: str) -> bool:
+        """删除对话（软删除）"""
+        return await self._update_active_conversation(conversation_id, {"is_active": "false"})
+    
+    async def get_user_emotion_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """获取用户情绪画像"""
+        try:
+            user = await self.get_user(user_id)
+            if not user:
+                return None
+            return build_emotion_profile(user)
+        except Exception as e:
+            logger.error(f"[AsyncConversationService] 获取用户情绪画像失败: user_id={user_id}, error={e}")
+            return None
+    
+    async def clear_user_emotion_profile(self, user_id: str) -> bool:
+        """清空用户情绪画像，用户不存在时返回False"""
+        result = await self.db.execute(
+            update(User).where(User.user_id == user_id).values(
+                current_emotion=None,
+                emotion_history=None,
+                emotion_updated_at=None
+            )
+        )
+        await self.db.commit()
+        return result.rowcount > 0
+    
+    async def get_user_historical_messages(self, user_id: str, limit: int = 20, exclude_conversation_id: Optional[str] = None) -> List[Message]:
+        """获取用户的历史消息（参数同ConversationService.get_user_historical_messages）"""
+        try:
+            query = select(Message).join(Conversation).where(
+                Conversation.user_id == user_id,
+                Conversation.is_active == "true"
+            )
+            if exclude_conversation_id:
+                query = query.where(Message.conversation_id != exclude_conversation_id)
+            
+            result = await self.db.execute(
+                query.order_by(desc(Message.created_at), desc(Message.id)).limit(limit)
+            )
+            return list(result.scalars().all())
+        except Exception as e:
+            logger.error(f"[AsyncConversationService] 获取用户历史消息失败: user_id={user_id}, error={e}")
+            return []
+
 # 便捷函数
 def get_conversation_service(db: Session = None) -> ConversationService:
     """获取对话服务实例"""
@@ -0,0 +1,604 @@
+"""对话轮次异步落库 - 有界队列 + 后台线程跨对话批量写入，本地日志保证进程崩溃后可恢复"""
+
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from app.configs.settings import config, ROOT
+from app.configs.database import SessionLocal
+from app.services.conversation_service import ConversationService
+
+logger = logging.getLogger(__name__)
+
+# 通知后台线程退出的哨兵
+_STOP = object()
+
+
+@dataclass
+class ChatTurn:
+    """一轮待保存的对话：消息 + 可选的情绪画像更新"""
+    conversation_id: str
+    user_id: Optional[str]
+    messages: List[Dict[str, Any]]
+    title: Optional[str] = None
+    # 情绪画像更新参数：emotion、confidence、emotion_context
+    emotion: Optional[Dict[str, Any]] = None
+    turn_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    enqueued_at: float = field(default_factory=time.time)
+
+    def __post_init__(self):
+        # 入队时就确定message_id，重放日志时可以据此判断是否已经写入
+        for message in self.messages:
+            message.setdefault("message_id", str(uuid.uuid4()))
+
+    @property
+    def message_ids(self) -> List[str]:
+        return [message["message_id"] for message in self.messages]
+
+    def to_service_turn(self) -> Dict[str, Any]:
+        return {
+            "conversation_id": self.conversation_id,
+            "user_id": self.user_id,
+            "title": self.title,
+            "messages": self.messages
+        }
+
+
+class TurnJournal:
+    """追加写的JSONL日志
+
+    提交时写入 {"op": "turn"} 记录，批次提交到数据库后写入 {"op": "ack"} 记录。
+    重启时未确认的轮次即为崩溃时尚未落库的数据。文件超过 compact_bytes 时
+    只保留未确认轮次重写文件，个别轮次长期写不进数据库也不会让日志无限增长。
+    重放只读取打开日志时已有的内容，
+    不会把本次进程新提交的轮次当成待恢复数据。打开时文件非空则先禁止压缩，
+    直到 finish_recovery() 把上次遗留的轮次计入未确认集合为止。
+    lock_handle 为 open_journal() 持有的排他锁文件，close() 时一并释放。
+    """
+
+    def __init__(self, path: Path, fsync: bool = True, compact_bytes: int = 1024 * 1024,
+                 lock_handle: Optional[IO] = None):
+        self.path = Path(path)
+        self.fsync = fsync
+        self.compact_bytes = compact_bytes
+        self._lock_handle = lock_handle
+        # 未确认轮次的日志记录，压缩时重写进新文件
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._recovery_bytes = self._file.tell()
+        # 上次运行的内容尚未读取前不能压缩文件
+        self._recovering = self._recovery_bytes > 0
+        # 上次压缩后的文件大小，未确认轮次本身超过阈值时避免每次确认都重写
+        self._compacted_bytes = 0
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        self._file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def append(self, turn: ChatTurn) -> None:
+        record = {"op": "turn", "turn": asdict(turn)}
+        with self._lock:
+            self._write([record])
+            self._pending[turn.turn_id] = record
+
+    def track(self, turns: List[ChatTurn]) -> None:
+        """把重放中的轮次计入未确认集合，写入成功前压缩时保留它们"""
+        with self._lock:
+            for turn in turns:
+                self._pending[turn.turn_id] = {"op": "turn", "turn": asdict(turn)}
+
+    def ack(self, turn_ids: List[str]) -> None:
+        with self._lock:
+            self._write([{"op": "ack", "turn_ids": turn_ids}])
+            for turn_id in turn_ids:
+                self._pending.pop(turn_id, None)
+            size = self._file.tell()
+            if not self._recovering and size > self.compact_bytes and size > 2 * self._compacted_bytes:
+                self._compact()
+
+    def _compact(self) -> None:
+        """只保留未确认轮次重写日志，需持有锁"""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in self._pending.values()))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._compacted_bytes = self._file.tell()
+
+    def finish_recovery(self) -> None:
+        """上次遗留的轮次已经全部 track() 之后调用，恢复日志压缩"""
+        with self._lock:
+            self._recovering = False
+
+    def load_pending(self) -> List[ChatTurn]:
+        """读取上次运行遗留的未确认轮次（按提交顺序），忽略崩溃时写了一半的最后一行"""
+        turns: Dict[str, ChatTurn] = {}
+        with self._lock:
+            with open(self.path, "rb") as f:
+                content = f.read(self._recovery_bytes).decode("utf-8", errors="ignore")
+                for line in content.splitlines():
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if record.get("op") == "turn":
+                        turn = ChatTurn(**record["turn"])
+                        turns[turn.turn_id] = turn
+                    elif record.get("op") == "ack":
+                        for turn_id in record["turn_ids"]:
+                            turns.pop(turn_id, None)
+        return list(turns.values())
+
+    def close(self) -> None:
+        """关闭日志文件并释放排他锁"""
+        with self._lock:
+            self._file.close()
+            if self._lock_handle is not None:
+                # 关闭文件时操作系统释放锁
+                self._lock_handle.close()
+                self._lock_handle = None
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    @property
+    def size_bytes(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except OSError:
+            return 0
+
+
+class ChatTurnWriter:
+    """对话轮次写后落库（write-behind）
+
+    请求线程只负责写日志和入队，后台线程在 max_wait_ms 内最多收集
+    max_batch_size 轮对话，用一条多行upsert和一条多行INSERT写入。
+    队列已满时调用方最多等待 enqueue_timeout_ms，仍然满则在调用方线程同步写入，
+    把写入压力反压给请求方而不是丢数据。
+
+    一批重试后仍然失败时逐轮写入，只有单独写也失败的轮次（如外键或
+    message_id冲突）留在日志中，由后台线程每 failed_retry_interval_seconds
+    秒重试一次，不会拖住同批其他对话的消息。
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        max_queue_size: int = 1000,
+        max_batch_size: int = 50,
+        max_wait_ms: float = 50.0,
+        enqueue_timeout_ms: float = 200.0,
+        journal: Optional[TurnJournal] = None,
+        max_retries: int = 3,
+        retry_backoff_ms: float = 500.0,
+        failed_retry_interval_seconds: float = 30.0,
+        enabled: bool = True
+    ):
+        self.session_factory = session_factory
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max(max_wait_ms, 0) / 1000
+        self.enqueue_timeout = max(enqueue_timeout_ms, 0) / 1000
+        self.journal = journal
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff_ms / 1000
+        self.failed_retry_interval = max(failed_retry_interval_seconds, 0)
+        self.enabled = enabled
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # 已提交但尚未落库的轮次及其提交时间
+        self._in_flight: Dict[str, float] = {}
+        # 单独写入仍失败、等待后台线程定期重试的轮次
+        self._failed_turns: Dict[str, ChatTurn] = {}
+        self._next_retry_at: Optional[float] = None
+        # 统计信息
+        self.submitted = 0
+        self.persisted = 0
+        self.batches = 0
+        self.backpressure_waits = 0
+        self.sync_writes = 0
+        self.retries = 0
+        self.failed = 0
+        self.recovered = 0
+        self.total_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def start(self) -> None:
+        """先重放日志中上次未落库的轮次，再启动后台线程"""
+        if self.journal is not None:
+            self._recover()
+        if self.enabled:
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._run, name="chat-turn-writer", daemon=True)
+                    self._worker.start()
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """等待队列中的轮次写完后停止后台线程，返回后台线程是否已经退出"""
+        worker = self._worker
+        if worker is None or not worker.is_alive():
+            return True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("[ChatTurnWriter] 队列已满，停止时未能等待全部写入，剩余轮次保留在日志中")
+            return False
+        worker.join(timeout)
+        if worker.is_alive():
+            logger.warning(f"[ChatTurnWriter] {timeout}秒内未写完，剩余{self._queue.qsize()}轮保留在日志中")
+            return False
+        return True
+
+    def submit(self, turn: ChatTurn) -> str:
+        """
+        提交一轮对话。
+
+        Returns:
+            str: queued（已入队）、sync（同步写入）或failed（同步写入失败，仍保留在日志中）
+        """
+        if self.journal is not None:
+            self.journal.append(turn)
+        with self._stats_lock:
+            self.submitted += 1
+            self._in_flight[turn.turn_id] = turn.enqueued_at
+
+        worker = self._worker
+        if self.enabled and worker is not None and worker.is_alive():
+            try:
+                self._queue.put_nowait(turn)
+                return "queued"
+            except queue.Full:
+                with self._stats_lock:
+                    self.backpressure_waits += 1
+            try:
+                self._queue.put(turn, timeout=self.enqueue_timeout)
+                return "queued"
+            except queue.Full:
+                pass
+
+        with self._stats_lock:
+            self.sync_writes += 1
+        try:
+            self._write([turn])
+        except Exception as e:
+            logger.error(f"[ChatTurnWriter] 同步写入失败: conversation_id={turn.conversation_id}, error={e}")
+            self._defer_failed([turn])
+            return "failed"
+        return "sync"
+
+    def _write(self, turns: List[ChatTurn]) -> None:
+        """写入一批轮次并更新情绪画像，成功后在日志中确认"""
+        db = self.session_factory()
+        try:
+            service = ConversationService(db)
+            service.append_turns([turn.to_service_turn() for turn in turns])
+            for turn in turns:
+                if turn.emotion and turn.user_id:
+                    service.update_user_emotion_profile(user_id=turn.user_id, **turn.emotion)
+        finally:
+            db.close()
+
+        if self.journal is not None:
+            self.journal.ack([turn.turn_id for turn in turns])
+        now = time.time()
+        with self._stats_lock:
+            self.batches += 1
+            self.persisted += len(turns)
+            for turn in turns:
+                self._in_flight.pop(turn.turn_id, None)
+                lag = max(now - turn.enqueued_at, 0.0)
+                self.total_lag_seconds += lag
+                self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+    def _write_with_retries(self, turns: List[ChatTurn]) -> List[ChatTurn]:
+        """
+        写入一批轮次，失败时指数退避重试；最后一次仍失败则逐轮写入，隔离出错的轮次。
+
+        Returns:
+            List[ChatTurn]: 单独写入仍失败的轮次，已转入定期重试
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write(turns)
+                return []
+            except Exception as e:
+                error = e
+                if attempt == self.max_retries:
+                    break
+                logger.warning(f"[ChatTurnWriter] 批量写入失败，第{attempt + 1}次重试: {e}")
+                with self._stats_lock:
+                    self.retries += 1
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+        if len(turns) == 1:
+            logger.error(f"[ChatTurnWriter] 写入失败: conversation_id={turns[0].conversation_id}, error={error}")
+            failed = turns
+        else:
+            logger.warning(f"[ChatTurnWriter] 批量写入失败，逐轮写入{len(turns)}轮: {error}")
+            failed = [turn for turn in turns if not self._write_single(turn)]
+        self._defer_failed(failed)
+        return failed
+
+    def _write_single(self, turn: ChatTurn) -> bool:
+        try:
+            self._write([turn])
+            return True
+        except Exception as e:
+            logger.error(f"[ChatTurnWriter] 单独写入失败: conversation_id={turn.conversation_id}, "
+                         f"turn_id={turn.turn_id}, error={e}")
+            return False
+
+    def _defer_failed(self, turns: List[ChatTurn]) -> None:
+        """把写入失败的轮次转入定期重试，它们仍保留在日志中"""
+        if not turns:
+            return
+        with self._stats_lock:
+            self.failed += len(turns)
+            for turn in turns:
+                self._failed_turns[turn.turn_id] = turn
+            if self._next_retry_at is None:
+                self._next_retry_at = time.monotonic() + self.failed_retry_interval
+        logger.error(f"[ChatTurnWriter] {len(turns)}轮写入失败，保留在日志中，{self.failed_retry_interval}秒后重试")
+
+    def _split_written(self, turns: List[ChatTurn]) -> Tuple[List[str], List[ChatTurn]]:
+        """按message_id查询已经写入数据库的轮次，返回 (已写入的turn_id, 仍需写入的轮次)"""
+        db = self.session_factory()
+        try:
+            existing = ConversationService(db).get_existing_message_ids(
+                [message_id for turn in turns for message_id in turn.message_ids]
+            )
+        finally:
+            db.close()
+        written = [turn.turn_id for turn in turns if set(turn.message_ids) & existing]
+        remaining = [turn for turn in turns if not set(turn.message_ids) & existing]
+        return written, remaining
+
+    def _retry_failed(self) -> None:
+        """逐轮重试之前写入失败的轮次；已经写入的（如写入后更新情绪画像失败）直接确认"""
+        with self._stats_lock:
+            turns = list(self._failed_turns.values())
+            self._failed_turns.clear()
+            self._next_retry_at = None
+        if not turns:
+            return
+        try:
+            written, remaining = self._split_written(turns)
+        except Exception as e:
+            logger.warning(f"[ChatTurnWriter] 重试前检查已写入消息失败: {e}")
+            written, remaining = [], turns
+        if written and self.journal is not None:
+            self.journal.ack(written)
+        with self._stats_lock:
+            for turn_id in written:
+                self._in_flight.pop(turn_id, None)
+
+        still_failed = [turn for turn in remaining if not self._write_single(turn)]
+        logger.info(f"[ChatTurnWriter] 重试失败轮次: 已存在{len(written)}轮, "
+                    f"写入{len(remaining) - len(still_failed)}轮, 仍失败{len(still_failed)}轮")
+        if still_failed:
+            with self._stats_lock:
+                for turn in still_failed:
+                    self._failed_turns[turn.turn_id] = turn
+                self._next_retry_at = time.monotonic() + self.failed_retry_interval
+
+    def _retry_wait(self) -> Optional[float]:
+        """距离下次重试失败轮次的秒数，没有待重试的轮次时返回None"""
+        with self._stats_lock:
+            if self._next_retry_at is None:
+                return None
+            return max(self._next_retry_at - time.monotonic(), 0.0)
+
+    def _collect_batch(self) -> List[Any]:
+        """阻塞等待第一轮（有待重试的轮次时最多等到重试时间），然后在等待窗口内继续收集"""
+        try:
+            batch = [self._queue.get(timeout=self._retry_wait())]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            turns = [turn for turn in batch if turn is not _STOP]
+            if turns:
+                self._write_with_retries(turns)
+            if len(turns) < len(batch):
+                return
+            if self._retry_wait() == 0.0:
+                self._retry_failed()
+
+    def _recover(self) -> None:
+        """
+        重放日志中未确认的轮次；已经写入数据库的（提交后、确认前崩溃）直接确认。
+
+        所有遗留轮次先计入未确认集合再确认或重写，写入失败的轮次转入定期重试，
+        在成功之前一直保留在日志中。
+        """
+        try:
+            pending = self.journal.load_pending()
+        except Exception as e:
+            logger.error(f"[ChatTurnWriter] 读取日志失败，本次运行不压缩日志: {e}")
+            return
+        self.journal.track(pending)
+        self.journal.finish_recovery()
+        if not pending:
+            return
+
+        logger.info(f"[ChatTurnWriter] 日志中有{len(pending)}轮未确认，开始重放")
+        try:
+            already_written, remaining = self._split_written(pending)
+        except Exception as e:
+            logger.error(f"[ChatTurnWriter] 重放前检查已写入消息失败，保留日志: {e}")
+            return
+
+        with self._stats_lock:
+            for turn in remaining:
+                self._in_flight[turn.turn_id] = turn.enqueued_at
+        if already_written:
+            self.journal.ack(already_written)
+        recovered = 0
+        for start in range(0, len(remaining), self.max_batch_size):
+            batch = remaining[start:start + self.max_batch_size]
+            recovered += len(batch) - len(self._write_with_retries(batch))
+        with self._stats_lock:
+            self.recovered += recovered
+        logger.info(f"[ChatTurnWriter] 日志重放完成: 已存在{len(already_written)}轮, 重新写入{recovered}轮, "
+                    f"{len(remaining) - recovered}轮保留在日志中等待重试")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列深度、落库延迟和日志状态"""
+        now = time.time()
+        with self._stats_lock:
+            oldest = min(self._in_flight.values()) if self._in_flight else None
+            return {
+                "enabled": self.enabled,
+                "worker_alive": self._worker is not None and self._worker.is_alive(),
+                "queue_depth": self._queue.qsize(),
+                "max_queue_size": self.max_queue_size,
+                "in_flight": len(self._in_flight),
+                "oldest_in_flight_age_ms": round((now - oldest) * 1000, 1) if oldest is not None else 0.0,
+                "submitted": self.submitted,
+                "persisted": self.persisted,
+                "batches": self.batches,
+                "avg_batch_size": round(self.persisted / self.batches, 2) if self.batches else 0.0,
+                "avg_lag_ms": round(self.total_lag_seconds / self.persisted * 1000, 1) if self.persisted else 0.0,
+                "max_lag_ms": round(self.max_lag_seconds * 1000, 1),
+                "backpressure_waits": self.backpressure_waits,
+                "sync_writes": self.sync_writes,
+                "retries": self.retries,
+                "failed": self.failed,
+                "retry_pending": len(self._failed_turns),
+                "recovered": self.recovered,
+                "journal_pending": self.journal.pending_count if self.journal is not None else None,
+                "journal_bytes": self.journal.size_bytes if self.journal is not None else None
+            }
+
+
+# 同一路径最多尝试的日志槽位数
+JOURNAL_MAX_SLOTS = 64
+
+
+def _try_lock(path: Path) -> Optional[IO]:
+    """非阻塞地对锁文件加排他锁，成功时返回需要保持打开的文件，已被其他进程持有时返回None"""
+    handle = open(path, "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def open_journal(path: Path, **kwargs) -> Optional[TurnJournal]:
+    """
+    打开一个未被其他进程占用的日志槽位。
+
+    多个uvicorn worker共用同一个配置路径时，第一个进程使用 path，之后的进程依次
+    使用 path.1、path.2 ……，每个槽位由同名 .lock 文件的排他锁保护，
+    不会有两个进程同时追加、压缩或重放同一个日志。进程重启后取第一个空闲槽位并重放其内容；
+    减少worker数量后，编号较大的槽位要等到再次有进程使用时才会重放。
+
+    Returns:
+        Optional[TurnJournal]: 所有槽位都被占用时返回None
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for slot in range(JOURNAL_MAX_SLOTS):
+        slot_path = path if slot == 0 else path.with_name(f"{path.stem}.{slot}{path.suffix}")
+        lock_handle = _try_lock(slot_path.with_name(slot_path.name + ".lock"))
+        if lock_handle is not None:
+            return TurnJournal(slot_path, lock_handle=lock_handle, **kwargs)
+    return None
+
+
+def _create_chat_turn_writer(journal_enabled: bool) -> ChatTurnWriter:
+    settings = config.persistence_queue
+    journal = None
+    if journal_enabled:
+        journal = open_journal(
+            ROOT / settings.journal_path,
+            fsync=settings.journal_fsync,
+            compact_bytes=settings.journal_compact_bytes
+        )
+        if journal is None:
+            logger.error(f"[ChatTurnWriter] {JOURNAL_MAX_SLOTS}个日志槽位均被占用，本进程不写日志")
+        else:
+            logger.info(f"[ChatTurnWriter] 使用日志 {journal.path}")
+    return ChatTurnWriter(
+        max_queue_size=settings.max_queue_size,
+        max_batch_size=settings.max_batch_size,
+        max_wait_ms=settings.max_wait_ms,
+        enqueue_timeout_ms=settings.enqueue_timeout_ms,
+        journal=journal,
+        max_retries=settings.max_retries,
+        retry_backoff_ms=settings.retry_backoff_ms,
+        failed_retry_interval_seconds=settings.failed_retry_interval_seconds,
+        enabled=settings.enabled
+    )
+
+
+# 全局对话轮次写入器实例，由应用lifespan创建，导入模块时不打开日志
+_chat_turn_writer: Optional[ChatTurnWriter] = None
+_chat_turn_writer_lock = threading.Lock()
+
+
+def init_chat_turn_writer() -> ChatTurnWriter:
+    """创建全局写入器并打开本进程的日志，由应用lifespan在启动时调用，随后调用 start()"""
+    global _chat_turn_writer
+    with _chat_turn_writer_lock:
+        if _chat_turn_writer is None or _chat_turn_writer.journal is None:
+            _chat_turn_writer = _create_chat_turn_writer(config.persistence_queue.journal_enabled)
+        return _chat_turn_writer
+
+
+def get_chat_turn_writer() -> ChatTurnWriter:
+    """获取全局写入器；未经lifespan初始化时（脚本中）创建不写日志、不启动后台线程的写入器，直接同步写入"""
+    global _chat_turn_writer
+    with _chat_turn_writer_lock:
+        if _chat_turn_writer is None:
+            _chat_turn_writer = _create_chat_turn_writer(journal_enabled=False)
+        return _chat_turn_writer
+
+
+def shutdown_chat_turn_writer(timeout: float = 10.0) -> None:
+    """等待队列写完后停止后台线程，关闭日志并释放锁"""
+    global _chat_turn_writer
+    with _chat_turn_writer_lock:
+        writer, _chat_turn_writer = _chat_turn_writer, None
+    if writer is None:
+        return
+    # 后台线程仍在写入时不关闭日志，进程退出时由操作系统释放锁
+    if writer.stop(timeout) and writer.journal is not None:
+        writer.journal.close()
@@ -1,12 +1,16 @@
 """流式处理服务模块"""
 
+import asyncio
 import json
 import logging
-import requests
-from typing import AsyncGenerator, Dict, Any, Optional
+import time
+from typing import AsyncGenerator, AsyncIterator, Dict, Any, List, Optional
 from datetime import datetime
 
+import httpx
+
 from ..configs.settings import api_settings
+from ..core.factories import get_shared_async_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -41,82 +45,69 @@ class StreamingService:
         Yields:
             Dict: 包含流式响应数据的字典
         """
+        # 构建请求数据
+        request_data = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        
+        logger.info(f"[StreamingService] 开始流式请求，模型: {model}")
+        
+        full_response = ""
         try:
-            # 构建请求数据
-            request_data = {
-                "model": model,
-                "messages": messages,
-                "stream": True,
-                "temperature": temperature,
-                "max_tokens": max_tokens
-            }
-            
-            logger.info(f"[StreamingService] 开始流式请求，模型: {model}")
-            
-            # 发起流式请求
-            response = requests.post(
+            # 使用共享连接池发起异步流式请求，不阻塞事件循环
+            client = get_shared_async_http_client()
+            async with client.stream(
+                "POST",
                 f"{self.base_url}/chat/completions",
                 json=request_data,
                 headers=self.headers,
-                stream=True,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                error_msg = f"LLM API请求失败: {response.status_code} - {response.text}"
-                logger.error(f"[StreamingService] {error_msg}")
-                raise Exception(error_msg)
-            
-            # 流式处理响应
-            full_response = ""
-            for line in response.iter_lines(decode_unicode=True):
-                if line:
-                    # 处理SSE格式的数据
-                    if line.startswith('data: '):
-                        data_str = line[6:]  # 移除'data: '前缀
-                        
-                        # 检查是否为结束标志
-                        if data_str.strip() == '[DONE]':
-                            break
-                        
-                        try:
-                            # 解析JSON数据
-                            data = json.loads(data_str)
-                            
-                            # 提取内容
-                            if 'choices' in data and len(data['choices']) > 0:
-                                choice = data['choices'][0]
-                                if 'delta' in choice and 'content' in choice['delta']:
-                                    content = choice['delta']['content']
-                                    if content:
-                                        full_response += content
-                                        
-                                        # 构建响应数据
-                                        response_data = {
-                                            "type": "response",
-                                            "response": content,
-                                            "timestamp": datetime.now().isoformat()
-                                        }
-                                        
-                                        if conversation_id:
-                                            response_data["conversation_id"] = conversation_id
-                                        
-                                        yield response_data
-                                        
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"[StreamingService] JSON解析错误: {e}, 数据: {data_str}")
-                            continue
+                timeout=httpx.Timeout(30.0, connect=10.0)
+            ) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    error_msg = f"LLM API请求失败: {response.status_code} - {body}"
+                    logger.error(f"[StreamingService] {error_msg}")
+                    raise Exception(error_msg)
+                
+                # 逐块解析SSE数据；消费方取走上一条数据后才读取下一块，形成背压
+                async for data_str in self._iter_sse_data(response):
+                    # 检查是否为结束标志
+                    if data_str.strip() == '[DONE]':
+                        break
+                    
+                    try:
+                        # 解析JSON数据
+                        data = json.loads(data_str)
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"[StreamingService] JSON解析错误: {e}, 数据: {data_str}")
+                        continue
+                    
+                    # 提取内容
+                    choices = data.get('choices') or []
+                    if not choices:
+                        continue
+                    content = (choices[0].get('delta') or {}).get('content')
+                    if not content:
+                        continue
+                    full_response += content
+                    
+                    # 构建响应数据
+                    response_data = {
+                        "type": "response",
+                        "response": content,
+                        "timestamp": datetime.now().isoformat()
+                    }
+                    
+                    if conversation_id:
+                        response_data["conversation_id"] = conversation_id
+                    
+                    yield response_data
             
-            # 返回完整响应
-            yield {
-                "type": "complete",
-                "full_response": full_response,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            logger.info(f"[StreamingService] 流式请求完成，响应长度: {len(full_response)}")
-            
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"[StreamingService] 流式请求错误: {e}")
             # 直接抛出异常，不返回错误响应
             raise
@@ -125,6 +116,53 @@ class StreamingService:
             logger.error(f"[StreamingService] 流式处理错误: {e}")
             # 直接抛出异常，不返回错误响应
             raise
+        
+        # 返回完整响应
+        yield {
+            "type": "complete",
+            "full_response": full_response,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        logger.info(f"[StreamingService] 流式请求完成，响应长度: {len(full_response)}")
+    
+    @staticmethod
+    async def _iter_sse_data(response: httpx.Response) -> AsyncGenerator[str, None]:
+        """从字节流中增量解析SSE事件，产出每个事件的data字段
+        
+        数据按字节缓存，只在遇到完整的事件分隔符时才解码，
+        避免多字节字符被网络分块截断。
+        """
+        buffer = b""
+        async for chunk in response.aiter_bytes():
+            buffer += chunk
+            if b"\r" in buffer:
+                buffer = buffer.replace(b"\r\n", b"\n")
+            while True:
+                index = buffer.find(b"\n\n")
+                if index < 0:
+                    break
+                event, buffer = buffer[:index], buffer[index + 2:]
+                data = StreamingService._parse_sse_event(event)
+                if data is not None:
+                    yield data
+        
+        # 处理末尾没有空行结尾的事件
+        if buffer.strip():
+            data = StreamingService._parse_sse_event(buffer)
+            if data is not None:
+                yield data
+    
+    @staticmethod
+    def _parse_sse_event(event: bytes) -> Optional[str]:
+        """提取单个SSE事件中的data字段，多行data按换行拼接"""
+        data_lines = []
+        for line in event.decode("utf-8", errors="replace").split("\n"):
+            if line.startswith("data:"):
+                data_lines.append(line[5:].lstrip(" "))
+        if not data_lines:
+            return None
+        return "\n".join(data_lines)
     
     async def stream_psychological_chat(
         self, 
@@ -204,5 +242,137 @@ class StreamingService:
             return fallback_responses[1]
 
 
+# SSE帧合并默认参数
+DEFAULT_FLUSH_INTERVAL_MS = 30   # 缓冲区最长等待时间
+DEFAULT_MAX_FRAME_BYTES = 2048   # 单帧内容的最大字节数
+# 仅用于触发刷新的标记事件，不会输出给客户端
+FLUSH_EVENT = {"type": "flush"}
+
+
+class SSEFrameCoalescer:
+    """SSE帧合并器
+    
+    将连续的content事件按字节预算或刷新间隔合并成一帧输出，
+    conversation_id等每帧固定不变的字段在创建时只序列化一次。
+    其他类型的事件会先刷新缓冲区再原样输出，保证事件顺序不变。
+    """
+    
+    def __init__(
+        self,
+        conversation_id: Optional[str] = None,
+        flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+        max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES
+    ):
+        """
+        Args:
+            conversation_id: 对话ID，写入每个content帧
+            flush_interval_ms: 缓冲区中第一段内容的最长等待时间，为0时不合并
+            max_frame_bytes: 缓冲内容达到该字节数时立即输出
+        """
+        self.flush_interval = max(flush_interval_ms, 0) / 1000
+        self.max_frame_bytes = max(max_frame_bytes, 1)
+        # 预先序列化固定的帧头
+        self._content_prefix = (
+            'data: {"type": "content", "conversation_id": '
+            + json.dumps(conversation_id, ensure_ascii=False)
+            + ', "content": '
+        )
+        self._buffer: List[str] = []
+        self._buffer_bytes = 0
+        self.frames_sent = 0
+        self.deltas_received = 0
+    
+    def content_frame(self, content: str) -> str:
+        """使用预序列化的帧头构建content帧"""
+        self.frames_sent += 1
+        return (
+            f'{self._content_prefix}{json.dumps(content, ensure_ascii=False)}'
+            f', "timestamp": "{datetime.now().isoformat()}"}}\n\n'
+        )
+    
+    def event_frame(self, data: Dict[str, Any]) -> str:
+        """构建非content事件帧"""
+        self.frames_sent += 1
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    def _flush(self) -> Optional[str]:
+        """输出缓冲区中的内容"""
+        if not self._buffer:
+            return None
+        content = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffer_bytes = 0
+        return self.content_frame(content)
+    
+    async def coalesce(self, events: AsyncIterator[Dict[str, Any]]) -> AsyncGenerator[str, None]:
+        """将事件流转换为合并后的SSE帧流"""
+        iterator = events.__aiter__()
+        next_event: Optional[asyncio.Future] = None
+        deadline: Optional[float] = None
+        
+        try:
+            while True:
+                if next_event is None:
+                    next_event = asyncio.ensure_future(iterator.__anext__())
+                
+                # 缓冲区非空时最多等待到刷新时间点
+                timeout = None
+                if deadline is not None:
+                    timeout = max(deadline - time.monotonic(), 0)
+                done, _ = await asyncio.wait({next_event}, timeout=timeout)
+                if not done:
+                    frame = self._flush()
+                    deadline = None
+                    if frame:
+                        yield frame
+                    continue
+                
+                finished, next_event = next_event, None
+                try:
+                    event = finished.result()
+                except StopAsyncIteration:
+                    break
+                
+                if event.get("type") != "content":
+                    frame = self._flush()
+                    deadline = None
+                    if frame:
+                        yield frame
+                    if event.get("type") != FLUSH_EVENT["type"]:
+                        yield self.event_frame(event)
+                    continue
+                
+                content = event.get("content")
+                if not content:
+                    continue
+                self.deltas_received += 1
+                if self.flush_interval <= 0:
+                    yield self.content_frame(content)
+                    continue
+                
+                self._buffer.append(content)
+                self._buffer_bytes += len(content.encode("utf-8"))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if self._buffer_bytes >= self.max_frame_bytes:
+                    deadline = None
+                    yield self._flush()
+            
+            frame = self._flush()
+            if frame:
+                yield frame
+        finally:
+            # 客户端断开时：取消并等待进行中的读取，再关闭上游生成器，使其finally（日志、落库）立即执行
+            if next_event is not None:
+                next_event.cancel()
+                await asyncio.wait({next_event})
+                if not next_event.cancelled():
+                    next_event.exception()
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            logger.debug(f"[SSEFrameCoalescer] 收到 {self.deltas_received} 个内容增量，输出 {self.frames_sent} 帧")
+
+
 # 全局流式服务实例
 streaming_service = StreamingService()
\ No newline at end of file
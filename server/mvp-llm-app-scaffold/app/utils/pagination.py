@@ -0,0 +1,43 @@
+"""游标分页工具模块 - 把排序键 (时间, 自增id) 编码为不透明的游标字符串"""
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+import base64
+import binascii
+import json
+
+# 游标类型，防止把消息游标用于对话列表
+MESSAGE_CURSOR = "m"
+CONVERSATION_CURSOR = "c"
+
+def encode_cursor(kind: str, timestamp: Optional[datetime], row_id: int) -> str:
+    """把排序键编码为URL安全的游标"""
+    payload = json.dumps([kind, timestamp.isoformat() if timestamp else None, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, kind: str) -> Tuple[Optional[datetime], int]:
+    """
+    解析游标，返回 (时间, id)。
+
+    Raises:
+        ValueError: 游标格式错误或类型不匹配
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_kind, timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if cursor_kind != kind or not isinstance(row_id, int):
+            raise ValueError
+        return (datetime.fromisoformat(timestamp) if timestamp else None), row_id
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        raise ValueError("无效的分页游标")
+
+def paginate(rows: List[Any], limit: int, cursor_of: Callable[[Any], str]) -> Tuple[List[Any], Optional[str]]:
+    """
+    处理按 limit + 1 条查询的结果：多出的一条说明还有下一页。
+
+    Returns:
+        (本页数据, 下一页游标)，没有下一页时游标为None
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, cursor_of(page[-1])
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比async端点中同步Session（阻塞事件循环）与AsyncSession的并发吞吐
+
+每个模拟请求执行与聊天接口相同的读操作（查询当前用户、对话消息、对话列表），
+然后await一段模拟的LLM等待时间。同时运行一个探针协程测量事件循环的调度延迟。
+
+用法:
+    # 本地SQLite替代库（需要aiosqlite），自动建表并写入测试数据
+    python benchmark_db_async.py --sqlite /tmp/bench.db
+    # 已初始化的MySQL（只读，需要aiomysql），指定已有用户和对话
+    python benchmark_db_async.py --user-id <user_id> --conversation-id <conversation_id>
+
+SQLite替代库上的参考结果（1核，默认参数：500请求、并发50、模拟等待20ms）:
+    sync   throughput=445.6 req/s  p50= 65.63ms  loop_lag_p95=104.10ms
+    async  throughput=289.8 req/s  p50=164.32ms  loop_lag_p95=  7.23ms
+SQLite查询在进程内完成，没有网络等待可以重叠，aiosqlite的线程切换反而降低吞吐；
+AsyncSession的收益体现在事件循环延迟上。吞吐对比需要在有网络往返的MySQL上测量。
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.configs.database import Base, db_settings
+from app.models.user import User
+from app.models.conversation import Conversation, Message
+from app.services.conversation_service import ConversationService, AsyncConversationService
+
+
+def seed_sqlite(engine, messages: int):
+    """建表并写入一个用户、一个对话和若干消息，返回 (user_id, conversation_id)"""
+    Base.metadata.create_all(bind=engine)
+    user_id = str(uuid.uuid4())
+    conversation_id = str(uuid.uuid4())
+    db = sessionmaker(bind=engine)()
+    try:
+        db.add(User(user_id=user_id, username="bench", email=f"{user_id[:8]}@bench.local"))
+        db.add(Conversation(conversation_id=conversation_id, user_id=user_id, title="benchmark"))
+        for i in range(messages):
+            db.add(Message(
+                message_id=str(uuid.uuid4()),
+                conversation_id=conversation_id,
+                role="human" if i % 2 == 0 else "assistant",
+                content=f"第{i}条测试消息"
+            ))
+        db.commit()
+    finally:
+        db.close()
+    return user_id, conversation_id
+
+
+async def monitor_loop_lag(stop: asyncio.Event, interval: float, lags: list):
+    """每隔interval秒醒来一次，记录实际醒来时间与预期的差值"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(time.perf_counter() - expected, 0.0) * 1000)
+
+
+async def run(mode: str, handle, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_request():
+        async with semaphore:
+            start = time.perf_counter()
+            await handle()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    stop = asyncio.Event()
+    lags: list = []
+    monitor = asyncio.create_task(monitor_loop_lag(stop, 0.005, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    latencies.sort()
+    lags.sort()
+    print(f"{mode:<6} throughput={requests / elapsed:8.1f} req/s  "
+          f"p50={statistics.median(latencies):7.2f}ms  "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1]:7.2f}ms  "
+          f"loop_lag_p95={lags[int(len(lags) * 0.95) - 1] if lags else 0.0:6.2f}ms  "
+          f"loop_lag_max={lags[-1] if lags else 0.0:6.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同步Session与AsyncSession并发吞吐对比")
+    parser.add_argument("--sqlite", help="SQLite替代库文件路径；不指定时使用配置中的MySQL")
+    parser.add_argument("--user-id", help="MySQL模式下用于查询的已有用户ID")
+    parser.add_argument("--conversation-id", help="MySQL模式下用于查询的已有对话ID")
+    parser.add_argument("--messages", type=int, default=50, help="SQLite模式下写入的消息数")
+    parser.add_argument("--requests", type=int, default=500, help="每种模式的请求总数")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发请求数")
+    parser.add_argument("--io-ms", type=float, default=20.0, help="每个请求模拟的LLM等待时间（毫秒）")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        sync_engine = create_engine(f"sqlite:///{args.sqlite}")
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{args.sqlite}")
+        user_id, conversation_id = seed_sqlite(sync_engine, args.messages)
+    else:
+        if not args.user_id or not args.conversation_id:
+            parser.error("MySQL模式需要 --user-id 和 --conversation-id")
+        pool_size = max(args.concurrency, db_settings.pool_size)
+        sync_engine = create_engine(db_settings.database_url, pool_size=pool_size, pool_pre_ping=True)
+        async_engine = create_async_engine(db_settings.async_database_url, pool_size=pool_size, pool_pre_ping=True)
+        user_id, conversation_id = args.user_id, args.conversation_id
+
+    SyncSession = sessionmaker(bind=sync_engine, autoflush=False)
+    AsyncSessionFactory = sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    io_seconds = args.io_ms / 1000
+
+    async def handle_sync():
+        # 改造前：async端点里直接调用同步Session，查询期间事件循环被阻塞
+        db = SyncSession()
+        try:
+            service = ConversationService(db)
+            db.query(User).filter(User.user_id == user_id).first()
+            service.get_conversation_messages(conversation_id)
+            service.get_user_conversations(user_id)
+        finally:
+            db.close()
+        await asyncio.sleep(io_seconds)
+
+    async def handle_async():
+        # 改造后：AsyncSession，查询期间事件循环可以调度其他请求
+        async with AsyncSessionFactory() as db:
+            service = AsyncConversationService(db)
+            await service.get_user(user_id)
+            await service.get_conversation_messages(conversation_id)
+            await service.get_user_conversations(user_id)
+        await asyncio.sleep(io_seconds)
+
+    async def bench():
+        print(f"requests={args.requests} concurrency={args.concurrency} io={args.io_ms}ms "
+              f"backend={'sqlite' if args.sqlite else 'mysql'}")
+        # 预热连接池
+        await handle_sync()
+        await handle_async()
+        await run("sync", handle_sync, args.requests, args.concurrency)
+        await run("async", handle_async, args.requests, args.concurrency)
+        await async_engine.dispose()
+
+    asyncio.run(bench())
+    sync_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比PyTorch与ONNX Runtime（fp32 / int8）嵌入后端的速度和一致性
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.core.onnx_embeddings import OnnxEmbeddings, get_onnx_model_path
+
+SAMPLE_QUERIES = [
+    "我最近很焦虑怎么办",
+    "压力好大，晚上睡不着",
+    "和家人吵架以后心情很差",
+    "什么是正念冥想",
+    "工作上总是担心自己做不好",
+    "感觉很孤独，没有人理解我",
+    "如何调节自己的情绪",
+    "考试前特别紧张",
+]
+
+
+def load_torch_embeddings(model_dir: str, threads: int):
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    torch.set_num_threads(threads)
+    return HuggingFaceEmbeddings(
+        model_name=model_dir,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True},
+    )
+
+
+def benchmark(name: str, embeddings, queries, rounds: int, batch_size: int):
+    """测量单条查询延迟和批量吞吐"""
+    # 预热
+    embeddings.embed_query(queries[0])
+
+    latencies = []
+    for _ in range(rounds):
+        for query in queries:
+            start = time.perf_counter()
+            embeddings.embed_query(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    batch = (queries * (batch_size // len(queries) + 1))[:batch_size]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        embeddings.embed_documents(batch)
+    throughput = batch_size * rounds / (time.perf_counter() - start)
+
+    latencies.sort()
+    print(f"{name:<12} p50={statistics.median(latencies):7.2f}ms  "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1]:7.2f}ms  "
+          f"batch={throughput:8.1f} texts/s")
+
+
+def cosine_parity(reference, candidate, queries):
+    a = np.asarray(reference.embed_documents(queries))
+    b = np.asarray(candidate.embed_documents(queries))
+    return float(np.min(np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入后端性能对比")
+    parser.add_argument("--model-dir", default="./models/bge-small-zh", help="本地模型目录")
+    parser.add_argument("--threads", type=int, default=4, help="推理线程数")
+    parser.add_argument("--rounds", type=int, default=20, help="测试轮数")
+    parser.add_argument("--batch-size", type=int, default=32, help="批量测试的文本数")
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    backends = {"torch": load_torch_embeddings(str(model_dir), args.threads)}
+    for quantized, name in ((False, "onnx-fp32"), (True, "onnx-int8")):
+        if get_onnx_model_path(model_dir, quantized).exists():
+            backends[name] = OnnxEmbeddings(str(model_dir), quantized=quantized, intra_op_threads=args.threads)
+        else:
+            print(f"跳过 {name}: 未找到 {get_onnx_model_path(model_dir, quantized)}，请先运行 export_onnx_model.py")
+
+    print(f"\n线程数={args.threads}, 轮数={args.rounds}, 批量大小={args.batch_size}\n")
+    for name, embeddings in backends.items():
+        benchmark(name, embeddings, SAMPLE_QUERIES, args.rounds, args.batch_size)
+
+    print()
+    for name, embeddings in backends.items():
+        if name != "torch":
+            print(f"{name} 与 torch 的最小余弦相似度: {cosine_parity(backends['torch'], embeddings, SAMPLE_QUERIES):.5f}")
+
+
+if __name__ == "__main__":
+    main()
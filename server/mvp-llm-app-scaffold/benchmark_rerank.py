@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比TF-IDF重排序的旧实现（每次请求重新拟合TfidfVectorizer）与语料级IDF缓存实现的延迟和排序质量
+
+排序质量：提供 --qrels（每行 {"query": ..., "relevant_ids": [...]} 的JSONL）时计算MRR@5和Recall@5，
+否则只报告两种实现的一致性（Top1一致率、Kendall tau）。
+"""
+
+import argparse
+import json
+import statistics
+import time
+from itertools import combinations
+
+from app.core.tfidf_reranker import TfidfReranker
+from app.core.tools.psychological_tools import retrieve_documents
+from app.core.vector_store import get_bm25_index
+
+SAMPLE_QUERIES = [
+    "我最近很焦虑怎么办",
+    "压力好大，晚上睡不着",
+    "抑郁症的症状有哪些",
+    "舍曲林有什么副作用",
+    "心理危机干预热线电话是多少",
+    "和家人吵架以后心情很差",
+    "什么是正念冥想",
+    "惊恐发作的时候应该怎么做",
+]
+
+
+def legacy_rerank(query, documents):
+    """旧实现：对 查询+候选文档 重新分词并拟合TfidfVectorizer"""
+    import jieba
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    tfidf_vectorizer = TfidfVectorizer(max_features=1000, ngram_range=(1, 2))
+    query_text = " ".join(jieba.cut(query))
+    doc_texts = [" ".join(jieba.cut(doc.get("content", ""))) for doc in documents]
+    tfidf_matrix = tfidf_vectorizer.fit_transform([query_text] + doc_texts)
+    return [float(score) for score in cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:])[0]]
+
+
+def ranking(documents, scores):
+    order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+    return [documents[i].get("id") or str(i) for i in order]
+
+
+def kendall_tau(a, b):
+    position = {doc_id: i for i, doc_id in enumerate(b)}
+    pairs = list(combinations(a, 2))
+    if not pairs:
+        return 1.0
+    concordant = sum(1 if position[x] < position[y] else -1 for x, y in pairs)
+    return concordant / len(pairs)
+
+
+def mrr_and_recall(ranked_ids, relevant_ids, cutoff=5):
+    top = ranked_ids[:cutoff]
+    reciprocal_rank = next((1 / (i + 1) for i, doc_id in enumerate(top) if doc_id in relevant_ids), 0.0)
+    recall = len(set(top) & relevant_ids) / len(relevant_ids) if relevant_ids else 0.0
+    return reciprocal_rank, recall
+
+
+def time_calls(func, rounds):
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TF-IDF重排序性能对比")
+    parser.add_argument("--qrels", help="带相关文档id的JSONL评测文件")
+    parser.add_argument("--k", type=int, default=8, help="每个查询的候选文档数")
+    parser.add_argument("--rounds", type=int, default=50, help="每个查询的计时轮数")
+    args = parser.parse_args()
+
+    if args.qrels:
+        with open(args.qrels, "r", encoding="utf-8") as f:
+            cases = [json.loads(line) for line in f if line.strip()]
+    else:
+        cases = [{"query": query, "relevant_ids": []} for query in SAMPLE_QUERIES]
+
+    index = get_bm25_index()
+    print(f"语料文档数: {len(index) if index is not None else '无BM25索引（IDF退化为1）'}")
+
+    # 预热jieba词典和sklearn导入，避免计入第一条查询
+    legacy_rerank("预热", [{"content": "预热文本"}])
+
+    legacy_latencies, cold_latencies, warm_latencies = [], [], []
+    top1_agreement, taus = [], []
+    quality = {"legacy": [], "cached": []}
+
+    for case in cases:
+        query = case["query"]
+        documents = retrieve_documents.invoke({"args": {"user_input": query, "k": args.k}})["retrieved_documents"]
+        if not documents:
+            print(f"跳过（无候选文档）: {query}")
+            continue
+
+        reranker = TfidfReranker()
+        start = time.perf_counter()
+        cached_scores = reranker.score(query, documents, index)
+        cold_latencies.append((time.perf_counter() - start) * 1000)
+        warm_latencies.append(time_calls(lambda: reranker.score(query, documents, index), args.rounds)[0])
+        legacy_latencies.append(time_calls(lambda: legacy_rerank(query, documents), args.rounds)[0])
+
+        legacy_ranking = ranking(documents, legacy_rerank(query, documents))
+        cached_ranking = ranking(documents, cached_scores)
+        top1_agreement.append(legacy_ranking[0] == cached_ranking[0])
+        taus.append(kendall_tau(legacy_ranking, cached_ranking))
+
+        relevant_ids = set(case.get("relevant_ids") or [])
+        if relevant_ids:
+            quality["legacy"].append(mrr_and_recall(legacy_ranking, relevant_ids))
+            quality["cached"].append(mrr_and_recall(cached_ranking, relevant_ids))
+
+    if not legacy_latencies:
+        print("没有可评测的查询")
+        return
+
+    print(f"\n查询数={len(legacy_latencies)}, 候选数={args.k}, 轮数={args.rounds}\n")
+    print(f"{'实现':<22}{'p50(ms)':>10}{'max(ms)':>10}")
+    for name, latencies in (
+        ("旧实现（每次拟合）", legacy_latencies),
+        ("缓存实现（冷启动）", cold_latencies),
+        ("缓存实现（命中）", warm_latencies),
+    ):
+        print(f"{name:<22}{statistics.median(latencies):>10.3f}{max(latencies):>10.3f}")
+
+    print(f"\nTop1一致率: {sum(top1_agreement) / len(top1_agreement):.2%}")
+    print(f"平均Kendall tau: {statistics.mean(taus):.3f}")
+
+    if quality["legacy"]:
+        print(f"\n{'实现':<10}{'MRR@5':>10}{'Recall@5':>10}")
+        for name, values in quality.items():
+            print(f"{name:<10}{statistics.mean(v[0] for v in values):>10.3f}"
+                  f"{statistics.mean(v[1] for v in values):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
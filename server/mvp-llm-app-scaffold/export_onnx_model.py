@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+把本地BGE-small-zh嵌入模型导出为ONNX图（可选int8动态量化）
+"""
+
+import argparse
+
+from app.core.onnx_embeddings import export_onnx_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出ONNX嵌入模型")
+    parser.add_argument("--model-dir", default="./models/bge-small-zh", help="本地模型目录")
+    parser.add_argument("--no-quantize", action="store_true", help="不生成int8量化模型")
+    parser.add_argument("--opset", type=int, default=14, help="ONNX算子集版本")
+    args = parser.parse_args()
+
+    print(f"开始导出模型: {args.model_dir}")
+    output_path = export_onnx_model(args.model_dir, quantize=not args.no_quantize, opset=args.opset)
+    print(f"\n✅ 导出完成: {output_path}")
+    print("在 model_config.yaml 中设置 embedding.provider: onnx 即可启用")
+
+
+if __name__ == "__main__":
+    main()
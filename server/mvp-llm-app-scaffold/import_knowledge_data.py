@@ -259,7 +259,11 @@ def import_knowledge_to_chroma(
         
         logger.info(f"准备导入 {len(knowledge_data)} 条知识记录")
         
-        # 4. 批量处理和导入
+        # 4. 批量处理和导入（同时写入BM25倒排索引，保持混合检索与集合同步）
+        from app.core.bm25_index import BM25Index, get_bm25_index_path
+        bm25_index_path = get_bm25_index_path(persist_directory)
+        bm25_index = BM25Index.load(bm25_index_path) or BM25Index()
+        
         texts = []
         metadatas = []
         
@@ -274,7 +278,8 @@ def import_knowledge_to_chroma(
                     # 批量导入
                     if len(texts) >= batch_size:
                         logger.info(f"导入批次 {i//batch_size + 1}: {len(texts)} 条记录")
-                        vectorstore.add_texts(texts=texts, metadatas=metadatas)
+                        ids = vectorstore.add_texts(texts=texts, metadatas=metadatas)
+                        bm25_index.add_documents(ids, texts)
                         texts = []
                         metadatas = []
                         
@@ -285,11 +290,16 @@ def import_knowledge_to_chroma(
         # 导入剩余的记录
         if texts:
             logger.info(f"导入最后批次: {len(texts)} 条记录")
-            vectorstore.add_texts(texts=texts, metadatas=metadatas)
+            ids = vectorstore.add_texts(texts=texts, metadatas=metadatas)
+            bm25_index.add_documents(ids, texts)
         
         # 5. 持久化数据库
         vectorstore.persist()
-        logger.info("数据库持久化完成")
+        bm25_index.save(bm25_index_path)
+        # 递增集合版本号，服务端的检索缓存随之失效
+        from app.core.collection_version import bump_collection_version
+        collection_version = bump_collection_version(persist_directory)
+        logger.info(f"数据库持久化完成，BM25索引包含 {len(bm25_index)} 个文档，集合版本号 {collection_version}")
         
         # 6. 验证导入结果
         try:
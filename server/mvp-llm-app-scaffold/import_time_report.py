@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于 python -X importtime 的导入耗时报告，定位拖慢启动的模块
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+# 格式: "import time:       123 |       4567 |   package.module"
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def collect_import_times(module: str):
+    """在子进程中导入模块，解析 -X importtime 的输出"""
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-import-time-report")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(ROOT),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+    records = []
+    errors = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append({
+                "name": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": (len(indent) - 1) // 2,
+            })
+        elif not line.startswith("import time:"):
+            errors.append(line)
+    return records, result.returncode, errors
+
+
+def summarize_packages(records):
+    """按顶层包汇总自身耗时"""
+    totals = defaultdict(float)
+    for record in records:
+        totals[record["name"].split(".")[0]] += record["self_ms"]
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入耗时报告")
+    parser.add_argument("--module", default="app.api.main", help="要分析的模块")
+    parser.add_argument("--top", type=int, default=20, help="显示的条目数")
+    args = parser.parse_args()
+
+    records, returncode, errors = collect_import_times(args.module)
+    if returncode != 0:
+        print(f"❌ 导入 {args.module} 失败:")
+        print("\n".join(errors[-10:]))
+        sys.exit(returncode)
+
+    total_ms = sum(record["self_ms"] for record in records)
+    print(f"导入 {args.module} 共加载 {len(records)} 个模块，总耗时 {total_ms:.1f}ms\n")
+
+    print(f"按累计耗时排序（前{args.top}）:")
+    print(f"{'累计(ms)':>10} {'自身(ms)':>10}  模块")
+    for record in sorted(records, key=lambda r: r["cumulative_ms"], reverse=True)[:args.top]:
+        print(f"{record['cumulative_ms']:>10.1f} {record['self_ms']:>10.1f}  {'  ' * record['depth']}{record['name']}")
+
+    print(f"\n按顶层包汇总（前{args.top}）:")
+    print(f"{'自身(ms)':>10} {'占比':>7}  包")
+    for package, self_ms in summarize_packages(records)[:args.top]:
+        print(f"{self_ms:>10.1f} {self_ms / total_ms * 100 if total_ms else 0:>6.1f}%  {package}")
+
+
+if __name__ == "__main__":
+    main()
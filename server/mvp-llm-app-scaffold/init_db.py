@@ -87,6 +87,66 @@ def check_and_add_emotion_fields():
         logger.error(f"❌ 检查/添加情绪字段失败: {e}")
         raise
 
+def check_and_add_crisis_state_field():
+    """检查并添加对话表的危机风险状态字段"""
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(text("""
+                SELECT COLUMN_NAME 
+                FROM INFORMATION_SCHEMA.COLUMNS 
+                WHERE TABLE_SCHEMA = DATABASE() 
+                AND TABLE_NAME = 'conversations' 
+                AND COLUMN_NAME = 'crisis_state'
+            """))
+            
+            if result.fetchone():
+                logger.info("✅ 危机风险状态字段已存在")
+                return
+            
+            conn.execute(text("ALTER TABLE conversations ADD COLUMN crisis_state JSON NULL"))
+            conn.commit()
+            logger.info("✅ 添加 crisis_state 字段")
+                
+    except Exception as e:
+        logger.error(f"❌ 检查/添加危机风险状态字段失败: {e}")
+        raise
+
+# 游标分页使用的复合索引：(表名, 索引名, 列)
+PAGINATION_INDEXES = [
+    # 消息列表：WHERE conversation_id = ? AND (created_at, id) > 游标 ORDER BY created_at, id
+    ("messages", "idx_messages_conversation_created_id", "conversation_id, created_at, id"),
+    # 对话列表：WHERE user_id = ? AND is_active = ? AND (last_message_at, id) < 游标 ORDER BY last_message_at DESC, id DESC
+    ("conversations", "idx_conversations_user_active_last_message_id", "user_id, is_active, last_message_at, id"),
+]
+
+def check_and_add_pagination_indexes():
+    """检查并添加游标分页使用的复合索引"""
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(text("""
+                SELECT DISTINCT INDEX_NAME
+                FROM INFORMATION_SCHEMA.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME IN ('messages', 'conversations')
+            """))
+            
+            existing_indexes = {row[0] for row in result.fetchall()}
+            
+            for table_name, index_name, columns in PAGINATION_INDEXES:
+                if index_name in existing_indexes:
+                    continue
+                conn.execute(text(f"CREATE INDEX {index_name} ON {table_name} ({columns})"))
+                logger.info(f"✅ 添加索引 {table_name}.{index_name}")
+            
+            conn.commit()
+            
+            if all(index_name in existing_indexes for _, index_name, _ in PAGINATION_INDEXES):
+                logger.info("✅ 所有分页索引已存在")
+                
+    except Exception as e:
+        logger.error(f"❌ 检查/添加分页索引失败: {e}")
+        raise
+
 def main():
     """主函数"""
     try:
@@ -109,6 +169,14 @@ def main():
         logger.info("📝 步骤4: 检查/添加情绪相关字段")
         check_and_add_emotion_fields()
         
+        # 5. 检查并添加游标分页索引
+        logger.info("📝 步骤5: 检查/添加分页索引")
+        check_and_add_pagination_indexes()
+        
+        # 6. 检查并添加对话危机风险状态字段
+        logger.info("📝 步骤6: 检查/添加危机风险状态字段")
+        check_and_add_crisis_state_field()
+        
         logger.info("🎉 数据库初始化完成！")
         
     except Exception as e:
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具依赖图执行器测试
+
+用异步桩节点模拟对话控制器的依赖图，覆盖安全检查短路时取消检索、
+cancel_on_short_circuit=False 的节点继续执行、depends_on 的执行顺序，
+以及节点失败后的异常传播和 node_status。依赖未安装时跳过。
+"""
+
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("pydantic_settings")
+os.environ.setdefault("OPENAI_API_KEY", "sk-dag-executor-test")
+
+from app.core.tools.dag_executor import DAGExecutor, DAGNode
+
+
+def stub(name, events, delay=0.0, result=None, error=None):
+    """记录开始/结束事件的异步桩节点"""
+    async def func(results):
+        events.append(("start", name))
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            events.append(("cancelled", name))
+            raise
+        if error is not None:
+            raise error
+        events.append(("end", name))
+        return result if result is not None else name
+    return func
+
+
+def test_safety_short_circuit_cancels_retrieval_but_keeps_crisis_running():
+    events = []
+    executor = DAGExecutor([
+        DAGNode("safety", stub("safety", events, delay=0.01, result={"is_safe": False}),
+                short_circuit=lambda result: not result["is_safe"]),
+        DAGNode("retrieval", stub("retrieval", events, delay=1.0)),
+        DAGNode("crisis", stub("crisis", events, delay=0.05), cancel_on_short_circuit=False),
+        DAGNode("rerank", stub("rerank", events), depends_on=["retrieval"]),
+    ])
+
+    results = asyncio.run(executor.run())
+
+    assert executor.short_circuited_by == "safety"
+    assert set(results) == {"safety", "crisis"}
+    assert ("end", "crisis") in events
+    assert ("cancelled", "retrieval") in events
+    assert ("start", "rerank") not in events
+    assert executor.node_status == {
+        "safety": "completed",
+        "retrieval": "cancelled",
+        "crisis": "completed",
+        "rerank": "cancelled",
+    }
+    assert sorted(executor.cancelled_nodes) == ["rerank", "retrieval"]
+
+
+def test_nodes_start_only_after_their_dependencies():
+    events = []
+    seen = {}
+
+    async def combine(results):
+        seen.update(results)
+        events.append(("start", "combine"))
+        return results["a"] + results["b"]
+
+    executor = DAGExecutor([
+        DAGNode("combine", combine, depends_on=["a", "b"]),
+        DAGNode("b", stub("b", events, delay=0.02, result=2), depends_on=["a"]),
+        DAGNode("a", stub("a", events, delay=0.01, result=1)),
+        DAGNode("independent", stub("independent", events, delay=0.01, result=10)),
+    ])
+
+    async def collect():
+        return [name async for name, _ in executor.iterate()]
+
+    order = asyncio.run(collect())
+
+    assert executor.results["combine"] == 3
+    assert seen["a"] == 1 and seen["b"] == 2
+    assert events.index(("end", "a")) < events.index(("start", "b"))
+    assert events.index(("end", "b")) < events.index(("start", "combine"))
+    # 没有依赖的节点与a同时启动
+    assert events.index(("start", "independent")) < events.index(("end", "a"))
+    assert order.index("a") < order.index("b") < order.index("combine")
+    assert set(executor.node_status.values()) == {"completed"}
+
+
+def test_failing_node_propagates_and_records_status():
+    events = []
+    executor = DAGExecutor([
+        DAGNode("analysis", stub("analysis", events, delay=0.01, error=ValueError("llm down"))),
+        DAGNode("retrieval", stub("retrieval", events, delay=1.0)),
+        DAGNode("fast", stub("fast", events)),
+        DAGNode("response", stub("response", events), depends_on=["analysis"]),
+    ])
+
+    with pytest.raises(ValueError, match="llm down"):
+        asyncio.run(executor.run())
+
+    assert executor.node_status == {
+        "fast": "completed",
+        "analysis": "failed",
+        "retrieval": "cancelled",
+        "response": "cancelled",
+    }
+    assert ("cancelled", "retrieval") in events
+    assert ("start", "response") not in events
+    assert "analysis" in executor.node_timings
+
+
+def test_invalid_graphs_are_rejected():
+    async def noop(results):
+        return None
+
+    with pytest.raises(ValueError):
+        DAGExecutor([DAGNode("a", noop), DAGNode("a", noop)])
+    with pytest.raises(ValueError):
+        DAGExecutor([DAGNode("a", noop, depends_on=["missing"])])
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导入耗时预算测试
+
+在独立子进程中导入 app.api.main，断言耗时不超过预算，且torch、sklearn、jieba
+等重量级依赖没有在导入阶段被加载。预算可通过环境变量 IMPORT_TIME_BUDGET_SECONDS
+调整；依赖未安装时跳过。
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "3.0"))
+TARGET_MODULE = "app.api.main"
+# 只应在首次使用时加载的模块
+LAZY_MODULES = ["torch", "sentence_transformers", "sklearn", "jieba", "onnxruntime"]
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import {TARGET_MODULE}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "elapsed": elapsed,
+    "loaded": [name for name in {LAZY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+@pytest.fixture(scope="module")
+def import_probe():
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-import-time-test")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=str(ROOT),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if result.returncode != 0:
+        if "ModuleNotFoundError" in result.stderr or "ImportError" in result.stderr:
+            pytest.skip(f"导入 {TARGET_MODULE} 所需依赖不完整: {result.stderr.strip().splitlines()[-1]}")
+        pytest.fail(f"导入 {TARGET_MODULE} 失败:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_within_budget(import_probe):
+    assert import_probe["elapsed"] <= IMPORT_TIME_BUDGET_SECONDS, (
+        f"导入 {TARGET_MODULE} 耗时 {import_probe['elapsed']:.2f}s，超过预算 {IMPORT_TIME_BUDGET_SECONDS}s，"
+        f"可运行 import_time_report.py 定位耗时模块"
+    )
+
+
+def test_heavy_dependencies_are_lazy(import_probe):
+    assert import_probe["loaded"] == [], f"导入阶段加载了重量级依赖: {import_probe['loaded']}"
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+关键词自动机与逐词子串匹配的一致性测试
+
+意图、安全、危机、情绪、否定词和对话话题检测器原先逐个关键词做
+`kw in text.lower()` 判断，现在共用一次Aho-Corasick扫描。这里对每个词库
+比较两种方式的命中数量和关键词顺序，覆盖重叠、嵌套、大小写混合和中英混合的文本。
+依赖未安装时跳过。
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("pydantic_settings")
+os.environ.setdefault("OPENAI_API_KEY", "sk-keyword-matcher-test")
+
+from app.core.tools.keyword_matcher import KeywordAutomaton, scan_keywords
+from app.core.tools.lexicons import LEXICONS
+
+SAMPLE_TEXTS = [
+    "",
+    "今天天气不错",
+    # 嵌套：自杀/想自杀、不想活/想活、死了算了/死了
+    "我真的不想活了，想自杀，死了算了",
+    # 重叠：相邻关键词共用字符
+    "焦虑抑郁压力困扰帮助难过痛苦",
+    "活着没意思，没有意义，绝望又无助",
+    "我是谁？告诉我关于我的个人信息，介绍一下我的情况",
+    "什么是焦虑？为什么会这样，如何了解自己",
+    # 大小写与中英混合
+    "I feel NOT okay, Nothing works and I never sleep",
+    "Work压力大，family关系紧张，Sleep不好，Health也差",
+    "my FRIEND said no, but the Relationship is fine",
+    "我很开心也很难过，生气、害怕、孤独、悲伤都有",
+    "没事没事没事，无所谓，非常不好",
+    "割腕跳楼自残自伤结束生命",
+    "工作学习健康睡眠关系未来愤怒恐惧",
+]
+
+
+def naive_keywords(text: str, keywords):
+    """原先的逐词子串匹配：按词库顺序返回出现的关键词"""
+    lowered = text.lower()
+    return [kw for kw in dict.fromkeys(keywords) if kw.lower() in lowered]
+
+
+@pytest.mark.parametrize("text", SAMPLE_TEXTS)
+@pytest.mark.parametrize("lexicon", sorted(LEXICONS))
+def test_scan_matches_naive_substring_search(lexicon, text):
+    expected = naive_keywords(text, LEXICONS[lexicon])
+    result = scan_keywords(text)
+    assert result.keywords(lexicon) == expected
+    assert result.count(lexicon) == len(expected)
+    assert result.has(lexicon) == bool(expected)
+
+
+def test_every_keyword_is_found_in_isolation_and_in_context():
+    for lexicon, keywords in LEXICONS.items():
+        for keyword in keywords:
+            for text in (keyword, f"前文{keyword.upper()}后文", f"x{keyword}{keyword}y"):
+                assert keyword in scan_keywords(text).keywords(lexicon), (lexicon, keyword, text)
+
+
+def test_overlapping_and_nested_patterns():
+    automaton = KeywordAutomaton({
+        "a": ["he", "she", "his", "hers"],
+        "b": ["不想活", "想活", "活"],
+    })
+    text = "uSHErs 我不想活"
+    result = automaton.scan(text)
+    assert result.keywords("a") == naive_keywords(text, ["he", "she", "his", "hers"])
+    assert result.keywords("b") == ["不想活", "想活", "活"]
+    assert sorted(result.positions("a")) == [("a", "he", 2, 4), ("a", "hers", 2, 6), ("a", "she", 1, 4)]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ONNX嵌入后端与PyTorch嵌入后端的一致性测试
+
+需要本地模型 ./models/bge-small-zh 以及通过 export_onnx_model.py 导出的ONNX文件，
+缺少依赖或模型文件时跳过。
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("transformers")
+pytest.importorskip("langchain_huggingface")
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app.core.onnx_embeddings import OnnxEmbeddings, get_onnx_model_path  # noqa: E402
+
+MODEL_DIR = ROOT / "models" / "bge-small-zh"
+PARITY_THRESHOLD = 0.99
+
+SAMPLE_TEXTS = [
+    "我最近很焦虑怎么办",
+    "压力好大，晚上睡不着",
+    "什么是认知行为疗法？",
+    "和朋友闹矛盾了，心里很难受",
+    "I feel lonely and tired.",
+]
+
+
+@pytest.fixture(scope="module")
+def torch_embeddings():
+    if not MODEL_DIR.exists():
+        pytest.skip(f"本地模型不存在: {MODEL_DIR}")
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=str(MODEL_DIR),
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True},
+    )
+
+
+def _min_cosine(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    return float(np.min(np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))))
+
+
+@pytest.mark.parametrize("quantized", [False, True], ids=["fp32", "int8"])
+def test_onnx_matches_torch(torch_embeddings, quantized):
+    if not get_onnx_model_path(MODEL_DIR, quantized).exists():
+        pytest.skip("ONNX模型未导出，请先运行 export_onnx_model.py")
+
+    onnx_embeddings = OnnxEmbeddings(str(MODEL_DIR), quantized=quantized)
+
+    documents_cosine = _min_cosine(
+        torch_embeddings.embed_documents(SAMPLE_TEXTS),
+        onnx_embeddings.embed_documents(SAMPLE_TEXTS),
+    )
+    query_cosine = _min_cosine(
+        [torch_embeddings.embed_query(SAMPLE_TEXTS[0])],
+        [onnx_embeddings.embed_query(SAMPLE_TEXTS[0])],
+    )
+
+    assert documents_cosine >= PARITY_THRESHOLD
+    assert query_cosine >= PARITY_THRESHOLD
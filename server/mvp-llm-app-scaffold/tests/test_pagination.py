@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+游标分页工具测试
+
+覆盖游标编码/解码的往返、类型校验、非法游标的拒绝，以及按 limit + 1 条
+查询结果判断下一页的逻辑。
+"""
+
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from app.utils.pagination import (
+    CONVERSATION_CURSOR,
+    MESSAGE_CURSOR,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+)
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2025, 7, 26, 13, 42, 13, 123456)
+    cursor = encode_cursor(MESSAGE_CURSOR, timestamp, 42)
+    assert decode_cursor(cursor, MESSAGE_CURSOR) == (timestamp, 42)
+
+
+def test_cursor_round_trip_without_timestamp():
+    cursor = encode_cursor(CONVERSATION_CURSOR, None, 7)
+    assert decode_cursor(cursor, CONVERSATION_CURSOR) == (None, 7)
+
+
+def test_cursor_is_url_safe_without_padding():
+    cursor = encode_cursor(MESSAGE_CURSOR, datetime(2025, 1, 1), 1)
+    assert "=" not in cursor
+    assert all(c.isalnum() or c in "-_" for c in cursor)
+
+
+def test_cursor_kind_mismatch_is_rejected():
+    cursor = encode_cursor(MESSAGE_CURSOR, datetime(2025, 1, 1), 1)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, CONVERSATION_CURSOR)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not-a-cursor",
+    "!!!",
+    base64.urlsafe_b64encode(b"[1, 2]").decode("ascii"),
+    base64.urlsafe_b64encode(json.dumps(["m", None, "1"]).encode()).decode("ascii"),
+    base64.urlsafe_b64encode(json.dumps(["m", "yesterday", 1]).encode()).decode("ascii"),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, MESSAGE_CURSOR)
+
+
+def test_paginate_last_page_has_no_cursor():
+    page, next_cursor = paginate([1, 2, 3], 3, str)
+    assert page == [1, 2, 3]
+    assert next_cursor is None
+
+
+def test_paginate_extra_row_yields_cursor_of_last_item():
+    page, next_cursor = paginate([1, 2, 3, 4], 3, lambda row: f"after-{row}")
+    assert page == [1, 2, 3]
+    assert next_cursor == "after-3"
+
+
+def test_paginate_empty():
+    assert paginate([], 10, str) == ([], None)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对话轮次写后落库的崩溃恢复测试
+
+模拟：进程崩溃时日志中有两轮未确认，其中一轮已经提交到数据库；重启时数据库
+仍不可用。重放必须确认已写入的轮次，并把未写入的轮次保留在日志中，
+即使日志超过压缩阈值也不能被清空。另外覆盖一批中有一轮写不进数据库时
+只隔离这一轮，其余轮次照常落库，以及多个进程不会共用同一个日志。
+依赖未安装时跳过。
+"""
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("pydantic_settings")
+os.environ.setdefault("OPENAI_API_KEY", "sk-persistence-queue-test")
+
+from app.services import persistence_queue
+from app.services.persistence_queue import ChatTurn, ChatTurnWriter, TurnJournal, open_journal
+
+
+class FakeDatabase:
+    """按message_id记录已写入的消息，available为False时写入抛异常"""
+
+    def __init__(self):
+        self.message_ids = set()
+        self.available = True
+        # 写入时违反约束的对话（模拟外键或message_id冲突）
+        self.bad_conversations = set()
+
+    def session(self):
+        return FakeSession()
+
+
+class FakeSession:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+
+    class FakeConversationService:
+        def __init__(self, db):
+            pass
+
+        def append_turns(self, turns):
+            if not database.available:
+                raise ConnectionError("database is down")
+            if any(turn["conversation_id"] in database.bad_conversations for turn in turns):
+                raise ValueError("foreign key constraint fails")
+            for turn in turns:
+                database.message_ids.update(message["message_id"] for message in turn["messages"])
+
+        def get_existing_message_ids(self, message_ids):
+            return database.message_ids & set(message_ids)
+
+        def update_user_emotion_profile(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(persistence_queue, "ConversationService", FakeConversationService)
+    return database
+
+
+def make_turn(text: str, conversation_id: str = "c1") -> ChatTurn:
+    return ChatTurn(
+        conversation_id=conversation_id,
+        user_id="u1",
+        messages=[{"role": "human", "content": text}, {"role": "assistant", "content": text}]
+    )
+
+
+def make_writer(path, database, **kwargs) -> ChatTurnWriter:
+    journal = TurnJournal(path, fsync=False, compact_bytes=0)
+    options = dict(max_retries=1, retry_backoff_ms=1, max_wait_ms=1)
+    options.update(kwargs)
+    return ChatTurnWriter(session_factory=database.session, journal=journal, **options)
+
+
+def crash_with_partial_commit(path, database):
+    """两轮写入日志后崩溃，第一轮已提交到数据库但尚未确认"""
+    journal = TurnJournal(path, fsync=False, compact_bytes=0)
+    committed, lost = make_turn("已提交"), make_turn("未提交")
+    journal.append(committed)
+    journal.append(lost)
+    database.message_ids.update(committed.message_ids)
+    return committed, lost
+
+
+def test_restart_with_database_down_keeps_unwritten_turn(tmp_path, database):
+    path = tmp_path / "journal.jsonl"
+    committed, lost = crash_with_partial_commit(path, database)
+
+    database.available = False
+    writer = make_writer(path, database)
+    writer.start()
+    writer.stop()
+
+    assert writer.recovered == 0
+    assert writer.failed == 1
+    assert path.stat().st_size > 0
+    pending = TurnJournal(path, fsync=False).load_pending()
+    assert [turn.turn_id for turn in pending] == [lost.turn_id]
+
+    # 数据库恢复后再次重启，遗留的轮次被写入并确认
+    database.available = True
+    writer = make_writer(path, database)
+    writer.start()
+    writer.stop()
+
+    assert writer.recovered == 1
+    assert set(lost.message_ids) <= database.message_ids
+    assert TurnJournal(path, fsync=False).load_pending() == []
+
+
+def test_new_turns_do_not_compact_before_replay(tmp_path, database):
+    path = tmp_path / "journal.jsonl"
+    committed, lost = crash_with_partial_commit(path, database)
+
+    # 重放前就有新请求同步写入并确认，此时不能清空上次遗留的内容
+    writer = make_writer(path, database, enabled=False)
+    assert writer.submit(make_turn("新请求")) == "sync"
+    pending = TurnJournal(path, fsync=False).load_pending()
+    assert [turn.turn_id for turn in pending] == [committed.turn_id, lost.turn_id]
+
+    writer.start()
+    assert writer.recovered == 1
+    assert set(lost.message_ids) <= database.message_ids
+    assert TurnJournal(path, fsync=False).load_pending() == []
+
+
+def test_bad_turn_in_batch_does_not_block_the_others(tmp_path, database):
+    path = tmp_path / "journal.jsonl"
+    database.bad_conversations.add("bad")
+    writer = make_writer(path, database, max_wait_ms=200, failed_retry_interval_seconds=0.05)
+    writer.start()
+    good = [make_turn("你好", conversation_id=f"c{i}") for i in range(3)]
+    bad = make_turn("外键冲突", conversation_id="bad")
+    for turn in (good[0], bad, good[1], good[2]):
+        assert writer.submit(turn) == "queued"
+
+    deadline = time.monotonic() + 2
+    while writer.get_stats()["persisted"] < len(good) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert all(set(turn.message_ids) <= database.message_ids for turn in good)
+    assert writer.failed == 1
+    assert writer.journal.pending_count == 1
+
+    # 约束问题修复后，后台线程定期重试，无需重启
+    database.bad_conversations.clear()
+    while writer.get_stats()["retry_pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+
+    assert set(bad.message_ids) <= database.message_ids
+    assert writer.journal.pending_count == 0
+    assert TurnJournal(path, fsync=False).load_pending() == []
+
+
+def test_each_process_gets_its_own_journal_slot(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    first = open_journal(path, fsync=False)
+    second = open_journal(path, fsync=False)
+    assert first.path == path
+    assert second.path == tmp_path / "journal.1.jsonl"
+
+    # 释放锁后，重启的进程重新取得第一个槽位并能读到遗留的轮次
+    first.append(make_turn("未落库"))
+    first.close()
+    reopened = open_journal(path, fsync=False)
+    assert reopened.path == path
+    assert len(reopened.load_pending()) == 1
+    second.close()
+    reopened.close()